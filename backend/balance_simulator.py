@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo balance simulator for PvE and PvP fights.
+
+Runs the enhanced battle rules (EnhancedBattleService / EnhancedPvPService
+attack resolution and damage, GameFormulas crit, Monster.generate_random_monster
+scaling) as NumPy array operations over many seeded fights at once, and reports
+win rates, average turns-to-kill and rewards per minute by level band.
+
+    python balance_simulator.py --fights 1000000 --mode pve --build balanced
+    python balance_simulator.py --mode pvp --build strength --opponent-build tank
+    python balance_simulator.py --sweep crit_cap=0.2,0.3,0.4 --sweep power_multiplier=1.2,1.3
+    python balance_simulator.py --verify
+
+Players enter fights at full HP with their stat points spent by --build and no
+equipment. Auto-cast skills are not modelled. Direction choices are uniform, as
+the monster (and the opponent's dodge, from the attacker's view) is random.
+--verify replays fights through the scalar service code with default
+parameters and compares the outcome distributions.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Attack types in index order, see EnhancedBattleService.make_attack_choice
+ATTACK_TYPES = ('normal', 'precise', 'power')
+
+# Where stat points go, as weights (1 point = +1 stat, see UserService.distribute_stat_points)
+BUILDS = {
+    'balanced': {'strength': 1, 'armor': 1, 'agility': 1},
+    'strength': {'strength': 2, 'armor': 1},
+    'agility': {'agility': 2, 'strength': 1},
+    'tank': {'armor': 2, 'hp': 1}
+}
+
+# New character stats, see the User model defaults
+BASE_STATS = {'strength': 10, 'armor': 10, 'agility': 10, 'hp': 100, 'mana': 50}
+
+DEFAULT_LEVEL_BANDS = "1-5,6-10,11-20,21-30,31-50"
+
+# Fight outcomes
+ONGOING, WIN, DEFEAT, DRAW = 0, 1, 2, 3
+
+class BalanceParams:
+    """Tunable constants of the battle rules, defaults mirror the game code"""
+    
+    DEFAULTS = {
+        # Damage in _calculate_enhanced_player_attack / _calculate_pvp_attack
+        'agility_damage_factor': 0.5,
+        'armor_factor': 0.8,
+        'min_damage_factor': 0.1,
+        # GameFormulas.critical_hit_chance
+        'crit_agility_divisor': 200.0,
+        'crit_cap': 0.3,
+        'crit_multiplier': 1.5,
+        # _calculate_enhanced_player_attack / _calculate_pvp_attack
+        'normal_hit_chance': 0.8,
+        'precise_hit_chance': 0.9,
+        'power_hit_chance': 0.7,
+        'normal_multiplier': 1.0,
+        'precise_multiplier': 1.1,
+        'power_multiplier': 1.3,
+        'precise_crit_factor': 1.5,
+        'glancing_chance': 0.15,
+        'glancing_damage': 2,
+        'perfect_dodge_divisor': 500.0,
+        'perfect_dodge_cap': 0.07,
+        # InteractiveBattle.max_rounds
+        'max_rounds': 10,
+        # Monster.generate_random_monster
+        'weak_share': 0.5,
+        'normal_share': 0.35,
+        'weak_stat_modifier': 0.7,
+        'normal_stat_modifier': 1.0,
+        'strong_stat_modifier': 1.3,
+        'weak_reward_modifier': 0.8,
+        'normal_reward_modifier': 1.0,
+        'strong_reward_modifier': 1.5,
+        'monster_level_variance': 2,
+        # Rewards of a PvP win by timeout, see _finish_pvp_battle_timeout
+        'timeout_win_exp': 15,
+        'timeout_win_money': 5,
+        # Settings.STAT_POINTS_PER_LEVEL
+        'stat_points_per_level': 3
+    }
+    
+    def __init__(self, **overrides):
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown balance parameters: {', '.join(sorted(unknown))}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, type(default)(overrides.get(name, default)))
+    
+    def overrides(self) -> dict:
+        return {name: getattr(self, name) for name, default in self.DEFAULTS.items() if getattr(self, name) != default}
+    
+    @property
+    def hit_chances(self) -> np.ndarray:
+        return np.array([getattr(self, f"{attack_type}_hit_chance") for attack_type in ATTACK_TYPES])
+    
+    @property
+    def multipliers(self) -> np.ndarray:
+        return np.array([getattr(self, f"{attack_type}_multiplier") for attack_type in ATTACK_TYPES])
+
+def parse_level_bands(spec: str) -> list:
+    bands = []
+    for part in spec.split(','):
+        low, _, high = part.partition('-')
+        bands.append((int(low), int(high or low)))
+    return bands
+
+def player_stats(levels: np.ndarray, build: str, params: BalanceParams) -> dict:
+    """Stat arrays of players at the given levels with all points spent by build"""
+    weights = BUILDS[build]
+    total_weight = sum(weights.values())
+    points = (levels - 1) * params.stat_points_per_level
+    
+    stats = {stat: np.full(levels.shape, value, dtype=np.int64) for stat, value in BASE_STATS.items()}
+    spent = np.zeros(levels.shape, dtype=np.int64)
+    for stat, weight in weights.items():
+        share = points * weight // total_weight
+        stats[stat] += share
+        spent += share
+    # Rounding leftovers go to the first stat of the build
+    stats[next(iter(weights))] += points - spent
+    return stats
+
+def generate_monsters(rng: np.random.Generator, player_levels: np.ndarray, params: BalanceParams) -> dict:
+    """Vectorized Monster.generate_random_monster"""
+    n = player_levels.shape[0]
+    roll = rng.random(n)
+    weak = roll < params.weak_share
+    strong = roll >= params.weak_share + params.normal_share
+    
+    stat_modifier = np.where(weak, params.weak_stat_modifier,
+                             np.where(strong, params.strong_stat_modifier, params.normal_stat_modifier))
+    reward_modifier = np.where(weak, params.weak_reward_modifier,
+                               np.where(strong, params.strong_reward_modifier, params.normal_reward_modifier))
+    
+    variance = params.monster_level_variance
+    levels = np.maximum(1, player_levels + rng.integers(-variance, variance + 1, n))
+    
+    return {
+        'level': levels,
+        'strength': ((8 + levels * 2) * stat_modifier).astype(np.int64),
+        'armor': ((6 + levels * 1.5) * stat_modifier).astype(np.int64),
+        'hp': ((60 + levels * 15) * stat_modifier).astype(np.int64),
+        'agility': ((5 + levels * 1.2) * stat_modifier).astype(np.int64),
+        'exp_reward': ((20 + levels * 3) * reward_modifier).astype(np.int64),
+        'money_reward': ((10 + levels * 2) * reward_modifier).astype(np.int64)
+    }
+
+def calculate_damage(strength, agility, armor, multiplier, params: BalanceParams) -> np.ndarray:
+    """Vectorized damage of the enhanced battle services, truncated at each step like the scalar code"""
+    base_damage = strength + (agility * params.agility_damage_factor).astype(np.int64)
+    base_damage = (base_damage * multiplier).astype(np.int64)
+    defense = (armor * params.armor_factor).astype(np.int64)
+    return np.maximum(base_damage - defense, (base_damage * params.min_damage_factor).astype(np.int64))
+
+def critical_hit_chance(agility, params: BalanceParams) -> np.ndarray:
+    return np.minimum(agility / params.crit_agility_divisor, params.crit_cap)
+
+def perfect_dodge_chance(agility, params: BalanceParams) -> np.ndarray:
+    return np.minimum(agility / params.perfect_dodge_divisor, params.perfect_dodge_cap)
+
+def player_attack(rng, attacker: dict, defender: dict, attack_type: np.ndarray, params: BalanceParams,
+                  perfect_dodge: bool) -> np.ndarray:
+    """Damage of one attack per fight, the enhanced PvE / PvP attack resolution"""
+    n = attack_type.shape[0]
+    
+    # The attack direction matches the random dodge direction one time in three
+    direction_hit = rng.integers(0, 3, n) == 0
+    hit = direction_hit & (rng.random(n) < params.hit_chances[attack_type])
+    
+    damage = calculate_damage(
+        attacker['strength'], attacker['agility'], defender['armor'],
+        params.multipliers[attack_type], params
+    )
+    
+    base_crit_chance = critical_hit_chance(attacker['agility'], params)
+    crit_chance = np.where(attack_type == ATTACK_TYPES.index('precise'),
+                           base_crit_chance * params.precise_crit_factor, base_crit_chance)
+    crit = rng.random(n) < crit_chance
+    damage = np.where(crit, (damage * params.crit_multiplier).astype(np.int64), damage)
+    
+    if perfect_dodge:
+        dodged = rng.random(n) < perfect_dodge_chance(defender['agility'], params)
+        damage = np.where(dodged, 0, damage)
+    
+    # A miss can still graze for a fixed amount
+    glancing = (rng.random(n) < base_crit_chance) & (rng.random(n) < params.glancing_chance)
+    return np.where(hit, damage, np.where(glancing, params.glancing_damage, 0))
+
+def monster_attack(rng, monster: dict, player: dict, params: BalanceParams) -> np.ndarray:
+    """Damage of one monster attack per fight, _calculate_enhanced_monster_attack"""
+    n = monster['strength'].shape[0]
+    direction_hit = rng.integers(0, 3, n) == 0
+    damage = calculate_damage(monster['strength'], monster['agility'], player['armor'], 1.0, params)
+    dodged = rng.random(n) < perfect_dodge_chance(player['agility'], params)
+    return np.where(direction_hit & ~dodged, damage, 0)
+
+def _take(stats: dict, index: np.ndarray) -> dict:
+    return {name: values[index] for name, values in stats.items()}
+
+def simulate_pve(rng, levels: np.ndarray, build: str, attack_type: np.ndarray, params: BalanceParams) -> dict:
+    """Fight one random monster per player level, returns outcome arrays"""
+    n = levels.shape[0]
+    player = player_stats(levels, build, params)
+    monster = generate_monsters(rng, levels, params)
+    
+    player_hp = player['hp'].copy()
+    monster_hp = monster['hp'].copy()
+    outcome = np.full(n, ONGOING, dtype=np.int8)
+    rounds = np.full(n, params.max_rounds, dtype=np.int64)
+    
+    for round_number in range(1, params.max_rounds + 1):
+        active = np.flatnonzero(outcome == ONGOING)
+        if active.size == 0:
+            break
+        
+        damage = player_attack(rng, _take(player, active), _take(monster, active), attack_type[active],
+                               params, perfect_dodge=False)
+        monster_hp[active] = np.maximum(0, monster_hp[active] - damage)
+        
+        killed = monster_hp[active] <= 0
+        outcome[active[killed]] = WIN
+        rounds[active[killed]] = round_number
+        
+        # Survivors strike back
+        alive = active[~killed]
+        damage = monster_attack(rng, _take(monster, alive), _take(player, alive), params)
+        player_hp[alive] = np.maximum(0, player_hp[alive] - damage)
+        
+        died = player_hp[alive] <= 0
+        outcome[alive[died]] = DEFEAT
+        rounds[alive[died]] = round_number
+    
+    # Fights still running after max_rounds time out
+    outcome[outcome == ONGOING] = DRAW
+    
+    won = outcome == WIN
+    return {
+        'outcome': outcome,
+        'rounds': rounds,
+        'knockout': outcome != DRAW,
+        'exp': np.where(won, monster['exp_reward'], 0),
+        'money': np.where(won, monster['money_reward'], 0)
+    }
+
+def _battle_rewards(winner: dict, loser: dict, index: np.ndarray) -> tuple:
+    """Vectorized GameFormulas.calculate_battle_rewards"""
+    stats = ('strength', 'armor', 'agility', 'hp', 'mana')
+    winner_total = sum(winner[stat][index] for stat in stats)
+    loser_total = sum(loser[stat][index] for stat in stats)
+    ratio = np.where(winner_total == 0, 1.0, loser_total / np.maximum(winner_total, 1))
+    return (
+        np.maximum((50 * ratio).astype(np.int64), 10),
+        np.maximum((25 * ratio).astype(np.int64), 5)
+    )
+
+def simulate_pvp(rng, levels: np.ndarray, build: str, opponent_build: str, attack_type: np.ndarray,
+                 opponent_attack_type: np.ndarray, params: BalanceParams) -> dict:
+    """Player (build) against an opponent of the same level (opponent_build)"""
+    n = levels.shape[0]
+    player = player_stats(levels, build, params)
+    opponent = player_stats(levels, opponent_build, params)
+    
+    player_hp = player['hp'].copy()
+    opponent_hp = opponent['hp'].copy()
+    outcome = np.full(n, ONGOING, dtype=np.int8)
+    rounds = np.full(n, params.max_rounds, dtype=np.int64)
+    
+    for round_number in range(1, params.max_rounds + 1):
+        active = np.flatnonzero(outcome == ONGOING)
+        if active.size == 0:
+            break
+        
+        # Both sides attack in the same round
+        player_player = _take(player, active)
+        player_opponent = _take(opponent, active)
+        to_opponent = player_attack(rng, player_player, player_opponent, attack_type[active], params, perfect_dodge=True)
+        to_player = player_attack(rng, player_opponent, player_player, opponent_attack_type[active], params,
+                                  perfect_dodge=True)
+        opponent_hp[active] = np.maximum(0, opponent_hp[active] - to_opponent)
+        player_hp[active] = np.maximum(0, player_hp[active] - to_player)
+        
+        # player1 at 0 HP loses even if both fell, see _finish_pvp_battle
+        player_down = player_hp[active] <= 0
+        opponent_down = opponent_hp[active] <= 0
+        outcome[active[player_down]] = DEFEAT
+        outcome[active[~player_down & opponent_down]] = WIN
+        rounds[active[player_down | opponent_down]] = round_number
+    
+    # Timeout: higher HP wins, equal HP is a draw
+    timed_out = outcome == ONGOING
+    outcome[timed_out & (player_hp > opponent_hp)] = WIN
+    outcome[timed_out & (player_hp < opponent_hp)] = DEFEAT
+    outcome[timed_out & (player_hp == opponent_hp)] = DRAW
+    
+    exp = np.zeros(n, dtype=np.int64)
+    money = np.zeros(n, dtype=np.int64)
+    for result, winner, loser in ((WIN, player, opponent), (DEFEAT, opponent, player)):
+        index = np.flatnonzero((outcome == result) & ~timed_out)
+        exp[index], money[index] = _battle_rewards(winner, loser, index)
+    timeout_wins = timed_out & (outcome != DRAW)
+    exp[timeout_wins] = params.timeout_win_exp
+    money[timeout_wins] = params.timeout_win_money
+    
+    return {'outcome': outcome, 'rounds': rounds, 'knockout': ~timed_out, 'exp': exp, 'money': money}
+
+def attack_types(rng, n: int, choice: str) -> np.ndarray:
+    if choice == 'mixed':
+        return rng.integers(0, len(ATTACK_TYPES), n)
+    return np.full(n, ATTACK_TYPES.index(choice))
+
+def run_bands(args, params: BalanceParams) -> list:
+    """Simulate every level band, returns one summary row per band"""
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for low, high in parse_level_bands(args.levels):
+        levels = rng.integers(low, high + 1, args.fights)
+        player_types = attack_types(rng, args.fights, args.attack_type)
+        
+        if args.mode == 'pve':
+            result = simulate_pve(rng, levels, args.build, player_types, params)
+        else:
+            opponent_types = attack_types(rng, args.fights, args.opponent_attack_type)
+            result = simulate_pvp(rng, levels, args.build, args.opponent_build, player_types, opponent_types, params)
+        
+        outcome = result['outcome']
+        won = outcome == WIN
+        kills = won & result['knockout']
+        minutes = result['rounds'].sum() * args.round_seconds / 60
+        # PvP rewards go to whichever side won, report the player's share
+        player_exp = np.where(won, result['exp'], 0).sum()
+        player_money = np.where(won, result['money'], 0).sum()
+        
+        rows.append({
+            'band': f"{low}-{high}",
+            'win': won.mean(),
+            'defeat': (outcome == DEFEAT).mean(),
+            'draw': (outcome == DRAW).mean(),
+            'turns_to_kill': result['rounds'][kills].mean() if kills.any() else float('nan'),
+            'turns': result['rounds'].mean(),
+            'exp_per_minute': player_exp / minutes,
+            'money_per_minute': player_money / minutes
+        })
+    return rows
+
+def print_rows(rows: list, mode: str):
+    draw = 'timeout' if mode == 'pve' else 'draw'
+    print(f"{'levels':<8}{'win':>8}{'defeat':>8}{draw:>9}{'turns/kill':>12}{'turns':>8}{'exp/min':>10}{'gold/min':>10}")
+    for row in rows:
+        print(
+            f"{row['band']:<8}{row['win']:>8.1%}{row['defeat']:>8.1%}{row['draw']:>9.1%}"
+            f"{row['turns_to_kill']:>12.2f}{row['turns']:>8.2f}"
+            f"{row['exp_per_minute']:>10.1f}{row['money_per_minute']:>10.1f}"
+        )
+
+def parse_sweeps(specs: list) -> list:
+    """--sweep name=v1,v2 options as a list of override dicts (cartesian product)"""
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name not in BalanceParams.DEFAULTS:
+            raise SystemExit(f"Unknown parameter {name!r}, known: {', '.join(BalanceParams.DEFAULTS)}")
+        axes.append([(name, value) for value in values.split(',')])
+    return [dict(combination) for combination in itertools.product(*axes)]
+
+async def _scalar_fights(args, count: int) -> tuple:
+    """Outcomes and round counts of fights replayed through the service code"""
+    import random
+    from models.user import User
+    from models.monster import Monster
+    from services.enhanced_battle_service import EnhancedBattleService
+    from services.enhanced_pvp_service import EnhancedPvPService
+    
+    random.seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+    params = BalanceParams()
+    low, high = parse_level_bands(args.levels)[0]
+    battle_service = EnhancedBattleService()
+    pvp_service = EnhancedPvPService()
+    
+    def make_user(level: int, build: str) -> User:
+        stats = player_stats(np.array([level]), build, params)
+        return User(level=level, bonus_strength=0, bonus_armor=0, bonus_agility=0, bonus_hp=0, bonus_mana=0,
+                    **{stat: int(values[0]) for stat, values in stats.items()})
+    
+    outcomes, rounds = [], []
+    for _ in range(count):
+        level = int(rng.integers(low, high + 1))
+        attack_type = random.choice(ATTACK_TYPES) if args.attack_type == 'mixed' else args.attack_type
+        player = make_user(level, args.build)
+        player_hp = player.max_hp
+        outcome = DRAW
+        
+        if args.mode == 'pve':
+            monster = Monster.generate_random_monster(level)
+            monster_data = {'strength': monster.strength, 'armor': monster.armor, 'agility': monster.agility}
+            monster_hp = monster.hp
+            for round_number in range(1, params.max_rounds + 1):
+                attack = await battle_service._calculate_enhanced_player_attack(
+                    player, monster_data, attack_type, random.choice(['left', 'center', 'right']), []
+                )
+                monster_hp = max(0, monster_hp - attack['damage'])
+                if monster_hp <= 0:
+                    outcome = WIN
+                    break
+                player_hp = max(0, player_hp - await battle_service._calculate_enhanced_monster_attack(
+                    monster_data, player, random.choice(['left', 'center', 'right']), 'center'
+                ))
+                if player_hp <= 0:
+                    outcome = DEFEAT
+                    break
+        else:
+            opponent = make_user(level, args.opponent_build)
+            opponent_attack_type = (random.choice(ATTACK_TYPES) if args.opponent_attack_type == 'mixed'
+                                    else args.opponent_attack_type)
+            opponent_hp = opponent.max_hp
+            for round_number in range(1, params.max_rounds + 1):
+                to_opponent = await pvp_service._calculate_pvp_attack(
+                    player, opponent, attack_type, random.choice(['left', 'center', 'right']), []
+                )
+                to_player = await pvp_service._calculate_pvp_attack(
+                    opponent, player, opponent_attack_type, random.choice(['left', 'center', 'right']), []
+                )
+                opponent_hp = max(0, opponent_hp - to_opponent['damage'])
+                player_hp = max(0, player_hp - to_player['damage'])
+                if player_hp <= 0:
+                    outcome = DEFEAT
+                    break
+                if opponent_hp <= 0:
+                    outcome = WIN
+                    break
+            else:
+                if player_hp != opponent_hp:
+                    outcome = WIN if player_hp > opponent_hp else DEFEAT
+        
+        outcomes.append(outcome)
+        rounds.append(round_number)
+    
+    return np.array(outcomes), np.array(rounds)
+
+def verify(args):
+    """Compare the vectorized model with the scalar service code at default parameters"""
+    count = min(args.fights, 50000)
+    started = time.perf_counter()
+    scalar_outcome, scalar_rounds = asyncio.run(_scalar_fights(args, count))
+    scalar_seconds = time.perf_counter() - started
+    
+    args.levels = args.levels.split(',')[0]
+    started = time.perf_counter()
+    rng = np.random.default_rng(args.seed + 1)
+    low, high = parse_level_bands(args.levels)[0]
+    levels = rng.integers(low, high + 1, count)
+    params = BalanceParams()
+    player_types = attack_types(rng, count, args.attack_type)
+    if args.mode == 'pve':
+        result = simulate_pve(rng, levels, args.build, player_types, params)
+    else:
+        opponent_types = attack_types(rng, count, args.opponent_attack_type)
+        result = simulate_pvp(rng, levels, args.build, args.opponent_build, player_types, opponent_types, params)
+    vector_seconds = time.perf_counter() - started
+    
+    print(f"\n🔬 {args.mode.upper()} levels {args.levels}, {count} fights each "
+          f"(scalar {scalar_seconds:.2f}s, vectorized {vector_seconds:.3f}s)\n")
+    print(f"{'':<10}{'scalar':>10}{'vector':>10}{'diff':>10}{'3 sigma':>10}")
+    
+    mismatches = 0
+    for name, result_value in (('win', WIN), ('defeat', DEFEAT), ('draw', DRAW)):
+        scalar_rate = (scalar_outcome == result_value).mean()
+        vector_rate = (result['outcome'] == result_value).mean()
+        tolerance = 3 * np.sqrt(2 * max(scalar_rate * (1 - scalar_rate), 1 / count) / count)
+        mismatches += abs(scalar_rate - vector_rate) > tolerance
+        print(f"{name:<10}{scalar_rate:>10.2%}{vector_rate:>10.2%}{vector_rate - scalar_rate:>+10.2%}{tolerance:>10.2%}")
+    
+    tolerance = 3 * np.sqrt(2 * scalar_rounds.var() / count)
+    difference = result['rounds'].mean() - scalar_rounds.mean()
+    mismatches += abs(difference) > tolerance
+    print(f"{'turns':<10}{scalar_rounds.mean():>10.3f}{result['rounds'].mean():>10.3f}{difference:>+10.3f}{tolerance:>10.3f}")
+    
+    print("\n✅ Distributions match" if not mismatches else f"\n❌ {mismatches} statistics outside 3 sigma")
+    return mismatches == 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Monte Carlo balance simulator")
+    parser.add_argument('--mode', choices=['pve', 'pvp'], default='pve')
+    parser.add_argument('--fights', type=int, default=200000, help="fights per level band")
+    parser.add_argument('--levels', default=DEFAULT_LEVEL_BANDS, help="level bands, e.g. 1-5,6-10")
+    parser.add_argument('--build', choices=list(BUILDS), default='balanced')
+    parser.add_argument('--opponent-build', choices=list(BUILDS), default='balanced')
+    parser.add_argument('--attack-type', choices=[*ATTACK_TYPES, 'mixed'], default='mixed')
+    parser.add_argument('--opponent-attack-type', choices=[*ATTACK_TYPES, 'mixed'], default='mixed')
+    parser.add_argument('--round-seconds', type=float, default=20.0,
+                        help="average real time of one round, for rewards per minute")
+    parser.add_argument('--sweep', action='append', default=[], metavar='NAME=V1,V2',
+                        help="parameter grid axis, may be repeated")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verify', action='store_true',
+                        help="compare with the scalar service code on the first level band")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    
+    if args.verify:
+        # The service modules read settings on import, keep them off the game database
+        os.environ.setdefault('DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'balance_verify.db'))
+        sys.path.insert(0, str(Path(__file__).parent))
+        sys.exit(0 if verify(args) else 1)
+    
+    started = time.perf_counter()
+    for overrides in parse_sweeps(args.sweep):
+        params = BalanceParams(**overrides)
+        title = ', '.join(f"{name}={value}" for name, value in params.overrides().items()) or "defaults"
+        print(f"\n⚖️ {args.mode.upper()} {args.build}"
+              f"{f' vs {args.opponent_build}' if args.mode == 'pvp' else ''}, {args.attack_type} attacks: {title}")
+        print_rows(run_bands(args, params), args.mode)
+    
+    print(f"\n⏱️ {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
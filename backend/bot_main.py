@@ -14,12 +14,23 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from config.settings import settings
-from config.database import init_db
+from config.database import init_db, run_wal_checkpoints
 from handlers import setup_handlers
+from middlewares.database import DatabaseSessionMiddleware, CommitBeforeSendMiddleware
 from middlewares.auth import AuthMiddleware
 from middlewares.throttling import ThrottlingMiddleware
 from middlewares.war_block import WarBlockMiddleware
 from services.user_service import UserService
+from services.activity_buffer import activity_buffer
+from services.battle_state_store import battle_state_store
+from services.round_timer import round_timer
+from services.battle_queue import battle_queue
+from services.enhanced_battle_service import EnhancedBattleService
+from services.enhanced_pvp_service import EnhancedPvPService
+from models.interactive_battle import BattleModeEnum
+from services.user_cache import user_cache
+from services.shop_catalog import shop_catalog
+from services.war_registry import war_registry
 from utils.logging_config import setup_logging
 from war_scheduler import enhanced_war_scheduler
 
@@ -27,24 +38,57 @@ async def main():
     """Main bot function"""
     setup_logging()
     logger = logging.getLogger(__name__)
+    checkpoint_task = None
+    resume_task = None
     
     try:
         # Initialize database
         await init_db()
         logger.info("Database initialized successfully")
         
+        # Shop browsing is served from an in-memory catalog snapshot
+        await shop_catalog.load()
+        
+        # War-mode locks are checked in memory by WarBlockMiddleware
+        await war_registry.rebuild()
+        
+        # Keep the WAL file bounded
+        checkpoint_task = asyncio.create_task(run_wal_checkpoints())
+        
+        # Batch last_active updates instead of one commit per click
+        activity_buffer.start()
+        
+        # Live battles keep round choices in memory, snapshot them periodically
+        battle_state_store.start()
+        
+        # One timer task serves every round deadline, including rounds left waiting at shutdown
+        await round_timer.rebuild({
+            BattleModeEnum.pvp_interactive: EnhancedPvPService().check_pvp_timeout,
+            BattleModeEnum.pve_interactive: EnhancedBattleService().check_round_timeout
+        })
+        round_timer.start()
+        
+        # Auto-resolved PvP battles go through a bounded worker queue, resume those left active
+        battle_queue.start()
+        await battle_queue.rebuild()
+        
         # Initialize bot and dispatcher
         bot = Bot(
             token=settings.BOT_TOKEN,
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
         
+        # Release SQLite's write lock before waiting on Telegram
+        bot.session.middleware(CommitBeforeSendMiddleware())
+        
         dp = Dispatcher(storage=MemoryStorage())
         
         # Initialize services
         user_service = UserService()
         
         # Setup middlewares
+        dp.message.middleware(DatabaseSessionMiddleware())
+        dp.callback_query.middleware(DatabaseSessionMiddleware())
         dp.message.middleware(AuthMiddleware(user_service))
         dp.callback_query.middleware(AuthMiddleware(user_service))
         dp.message.middleware(ThrottlingMiddleware(settings.RATE_LIMIT))
@@ -60,15 +104,31 @@ async def main():
         enhanced_war_scheduler.start()
         logger.info("Enhanced Kingdom War Scheduler started")
         
+        # Finish wars interrupted by the last shutdown in the background once polling is up
+        async def resume_interrupted_wars():
+            nonlocal resume_task
+            resume_task = asyncio.create_task(enhanced_war_scheduler.resume_interrupted_wars())
+        
+        dp.startup.register(resume_interrupted_wars)
+        
         logger.info("Starting RPG Bot v3.0...")
         await dp.start_polling(bot, skip_updates=True)
-        
+    
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
         sys.exit(1)
     finally:
         # Stop enhanced war scheduler on shutdown
         enhanced_war_scheduler.stop()
+        round_timer.stop()
+        if checkpoint_task:
+            checkpoint_task.cancel()
+        if resume_task:
+            resume_task.cancel()
+        await activity_buffer.stop()
+        await battle_state_store.stop()
+        await battle_queue.stop()
+        logger.info(f"User cache stats: {user_cache.stats()}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
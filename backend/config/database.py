@@ -1,6 +1,10 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from config.settings import settings
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,6 +16,16 @@ engine = create_async_engine(
     future=True
 )
 
+@event.listens_for(engine.sync_engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite storage profile to every new connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in settings.SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
 # Session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -30,6 +44,29 @@ async def get_session() -> AsyncSession:
         finally:
             await session.close()
 
+@asynccontextmanager
+async def session_scope(session: Optional[AsyncSession] = None):
+    """Reuse the caller's session or open a short-lived one.
+    
+    Sessions opened here own their transaction. Borrowed sessions (e.g. the
+    request session from DatabaseSessionMiddleware) are committed by their owner.
+    """
+    if session is not None:
+        yield session
+        return
+    
+    async with AsyncSessionLocal() as own_session:
+        own_session.info['owns_transaction'] = True
+        yield own_session
+
+async def commit_session(session: AsyncSession):
+    """Commit an owned session, only flush a borrowed one"""
+    if session.info.get('owns_transaction'):
+        await session.commit()
+    else:
+        await session.flush()
+        session.info['has_writes'] = True
+
 async def init_db():
     """Initialize database"""
     try:
@@ -41,10 +78,33 @@ async def init_db():
         from models.monster import Monster
         from models.kingdom_war import KingdomWar, WarParticipation
         from models.interactive_battle import InteractiveBattle
+        from config.migrations import run_migrations
         
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            version = await run_migrations(conn)
+        logger.info(f"Schema version: {version}")
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
-        raise
\ No newline at end of file
+        raise
+
+async def checkpoint_wal(mode: str = "PASSIVE") -> tuple:
+    """Run a WAL checkpoint, returns (busy, log_frames, checkpointed_frames)"""
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})")
+        return tuple(result.one())
+
+async def run_wal_checkpoints(interval: int = None):
+    """Periodically checkpoint the WAL so it doesn't grow between war windows"""
+    interval = interval or settings.SQLITE_WAL_CHECKPOINT_INTERVAL
+    if interval <= 0:
+        return
+    
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            busy, log_frames, checkpointed = await checkpoint_wal()
+            logger.debug(f"WAL checkpoint: busy={busy}, frames={log_frames}, checkpointed={checkpointed}")
+        except Exception as e:
+            logger.error(f"Error running WAL checkpoint: {e}")
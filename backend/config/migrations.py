@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the SQLite database.
+
+The applied version is stored in PRAGMA user_version. Each migration runs once,
+in order, on startup (see init_db). Steps are plain SQL strings or async
+callables taking the connection, and must be safe to re-run on a fresh database
+where create_all already produced the latest schema.
+"""
+from sqlalchemy.ext.asyncio import AsyncConnection
+from typing import Dict, List
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+def add_column(table: str, column: str, ddl: str):
+    """Migration step adding a column unless create_all already did"""
+    async def step(conn: AsyncConnection):
+        result = await conn.exec_driver_sql(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in result}:
+            await conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return step
+
+def drop_column(table: str, column: str):
+    """Migration step dropping a column if it is still there"""
+    async def step(conn: AsyncConnection):
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            # DROP COLUMN is not supported, the column is left unused
+            return
+        result = await conn.exec_driver_sql(f"PRAGMA table_info({table})")
+        if column in {row[1] for row in result}:
+            await conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+    return step
+
+async def _move_battle_log_to_entries(conn: AsyncConnection):
+    """Copy JSON battle_log arrays into battle_log_entries"""
+    result = await conn.exec_driver_sql("PRAGMA table_info(interactive_battles)")
+    if "battle_log" not in {row[1] for row in result}:
+        return
+    await conn.exec_driver_sql(
+        "INSERT INTO battle_log_entries (battle_id, seq, entry) "
+        "SELECT b.id, CAST(j.key AS INTEGER) + 1, j.value "
+        "FROM interactive_battles b, json_each(b.battle_log) j "
+        "WHERE json_valid(b.battle_log)"
+    )
+    await conn.exec_driver_sql(
+        "UPDATE interactive_battles SET log_size = "
+        "(SELECT COUNT(*) FROM battle_log_entries e WHERE e.battle_id = interactive_battles.id)"
+    )
+
+async def _strip_folded_equipment_bonuses(conn: AsyncConnection):
+    """Reset base stats the old equip code raised to base + equipment bonus"""
+    from config.settings import GameConstants
+    
+    # It only ever wrote exactly BASE_STATS + bonus, anything else was earned
+    for stat, base in GameConstants.BASE_STATS.items():
+        await conn.exec_driver_sql(
+            f"UPDATE users SET {stat} = ? WHERE bonus_{stat} > 0 AND {stat} = ? + bonus_{stat}",
+            (base, base)
+        )
+
+async def _move_player_stats_to_columns(conn: AsyncConnection):
+    """Copy JSON player_stats into the stat_* columns"""
+    result = await conn.exec_driver_sql("PRAGMA table_info(war_participations)")
+    if "player_stats" not in {row[1] for row in result}:
+        return
+    await conn.exec_driver_sql(
+        "UPDATE war_participations SET "
+        "stat_strength = COALESCE(json_extract(player_stats, '$.strength'), 0), "
+        "stat_armor = COALESCE(json_extract(player_stats, '$.armor'), 0), "
+        "stat_hp = COALESCE(json_extract(player_stats, '$.hp'), 0), "
+        "stat_agility = COALESCE(json_extract(player_stats, '$.agility'), 0), "
+        "stat_mana = COALESCE(json_extract(player_stats, '$.mana'), 0), "
+        "stat_level = COALESCE(json_extract(player_stats, '$.level'), 1) "
+        "WHERE json_valid(player_stats)"
+    )
+
+async def _backfill_war_results(conn: AsyncConnection):
+    """Build war summaries, kingdom and player results of already finished wars"""
+    battles = "json_each(CASE WHEN json_valid(w.battle_results) THEN w.battle_results ELSE '[]' END) j"
+    money = "(CASE WHEN json_valid(w.money_transferred) THEN w.money_transferred ELSE '{}' END)"
+    attacker = "json_extract(j.value, '$.attacker')"
+    defense_result = (
+        "CASE s.outcome WHEN 'broken' THEN 'defense_broken' "
+        "WHEN 'held' THEN 'defense_held' ELSE 'no_attack' END"
+    )
+    
+    await conn.exec_driver_sql(
+        "INSERT INTO war_summaries (war_id, defending_kingdom, scheduled_time, started_at, finished_at, "
+        "outcome, defense_buff, attackers_count, defenders_count, total_money_taken, summary_text) "
+        "SELECT w.id, w.defending_kingdom, w.scheduled_time, w.started_at, w.finished_at, "
+        f"CASE WHEN NOT EXISTS (SELECT 1 FROM {battles}) THEN 'no_attack' "
+        f"WHEN EXISTS (SELECT 1 FROM {battles} WHERE json_extract(j.value, '$.result') = 'victory') "
+        "THEN 'broken' ELSE 'held' END, "
+        "COALESCE(w.defense_buff, 1.0), "
+        "(SELECT COUNT(*) FROM war_participations p WHERE p.war_id = w.id AND p.role = 'attacker'), "
+        "(SELECT COUNT(*) FROM war_participations p WHERE p.war_id = w.id AND p.role = 'defender'), "
+        f"COALESCE((SELECT SUM(m.value) FROM json_each({money}) m), 0), "
+        "'🏰 **' || upper(w.defending_kingdom) || '** - Война завершена' || char(10) || COALESCE(("
+        "SELECT group_concat(CASE json_extract(j.value, '$.result') "
+        f"WHEN 'victory' THEN '✅ ' || {attacker} || ' → ПОБЕДА (захвачено ' || "
+        f"COALESCE(json_extract({money}, '$.' || {attacker}), 0) || ' золота)' || char(10) "
+        f"WHEN 'defeat' THEN '❌ ' || {attacker} || ' → Поражение' || char(10) "
+        f"WHEN 'too_late' THEN '⏰ ' || {attacker} || ' → Опоздало' || char(10) "
+        f"ELSE '' END, '') FROM {battles}), '🕊️ Никто не атаковал' || char(10)) "
+        "FROM kingdom_wars w WHERE w.status = 'finished' ORDER BY w.id"
+    )
+    await conn.exec_driver_sql(
+        "INSERT INTO war_kingdom_results "
+        "(war_id, kingdom, role, result, player_count, damage_dealt, money, exp_gained) "
+        f"SELECT w.id, {attacker}, 'attacker', json_extract(j.value, '$.result'), "
+        "(SELECT COUNT(*) FROM war_participations p "
+        f"WHERE p.war_id = w.id AND p.kingdom = {attacker} AND p.role = 'attacker'), "
+        "COALESCE(json_extract(j.value, '$.damage_dealt'), 0), "
+        f"COALESCE(json_extract({money}, '$.' || {attacker}), 0), "
+        "(SELECT COALESCE(SUM(p.exp_gained), 0) FROM war_participations p "
+        f"WHERE p.war_id = w.id AND p.kingdom = {attacker} AND p.role = 'attacker') "
+        f"FROM war_summaries s JOIN kingdom_wars w ON w.id = s.war_id, {battles} "
+        "ORDER BY w.id, j.key"
+    )
+    await conn.exec_driver_sql(
+        "INSERT INTO war_kingdom_results "
+        "(war_id, kingdom, role, result, player_count, damage_dealt, money, exp_gained) "
+        f"SELECT s.war_id, s.defending_kingdom, 'defender', {defense_result}, s.defenders_count, 0, "
+        "s.total_money_taken, "
+        "(SELECT COALESCE(SUM(p.exp_gained), 0) FROM war_participations p "
+        "WHERE p.war_id = s.war_id AND p.role = 'defender') "
+        "FROM war_summaries s ORDER BY s.war_id"
+    )
+    await conn.exec_driver_sql(
+        "INSERT INTO war_user_results "
+        "(war_id, user_id, kingdom, role, result, money_gained, money_lost, exp_gained, "
+        "stat_strength, stat_armor, stat_hp, stat_agility, stat_mana) "
+        "SELECT p.war_id, p.user_id, p.kingdom, p.role, "
+        f"CASE WHEN p.role = 'defender' THEN {defense_result} ELSE COALESCE(k.result, 'no_attack') END, "
+        "COALESCE(p.money_gained, 0), COALESCE(p.money_lost, 0), COALESCE(p.exp_gained, 0), "
+        "p.stat_strength, p.stat_armor, p.stat_hp, p.stat_agility, p.stat_mana "
+        "FROM war_participations p JOIN war_summaries s ON s.war_id = p.war_id "
+        "LEFT JOIN war_kingdom_results k "
+        "ON k.war_id = p.war_id AND k.kingdom = p.kingdom AND k.role = 'attacker' "
+        "ORDER BY p.id"
+    )
+
+# (version, description, steps)
+MIGRATIONS = [
+    (1, "Secondary indexes for war, matchmaking, inventory and battle lookups", [
+        "CREATE INDEX IF NOT EXISTS ix_war_participations_war_user ON war_participations (war_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_users_kingdom_last_active ON users (kingdom, last_active)",
+        "CREATE INDEX IF NOT EXISTS ix_users_kingdom_level_active ON users (kingdom, level, is_active)",
+        "CREATE INDEX IF NOT EXISTS ix_user_items_user_equipped ON user_items (user_id, is_equipped)",
+        "CREATE INDEX IF NOT EXISTS ix_kingdom_wars_status_scheduled ON kingdom_wars (status, scheduled_time)",
+        "CREATE INDEX IF NOT EXISTS ix_interactive_battles_phase_round_start ON interactive_battles (phase, round_start_time)",
+    ]),
+    (2, "Squads are read from war_participations, drop the JSON squad columns", [
+        drop_column("kingdom_wars", "attacking_kingdoms"),
+        drop_column("kingdom_wars", "attack_squads"),
+        drop_column("kingdom_wars", "defense_squad"),
+    ]),
+    (3, "Append-only battle_log_entries instead of the JSON battle_log column", [
+        add_column("interactive_battles", "log_size", "INTEGER DEFAULT 0"),
+        _move_battle_log_to_entries,
+        drop_column("interactive_battles", "battle_log"),
+    ]),
+    (4, "Cached equipment bonus columns on users", [
+        add_column("users", "bonus_strength", "INTEGER DEFAULT 0"),
+        add_column("users", "bonus_armor", "INTEGER DEFAULT 0"),
+        add_column("users", "bonus_hp", "INTEGER DEFAULT 0"),
+        add_column("users", "bonus_agility", "INTEGER DEFAULT 0"),
+        add_column("users", "bonus_mana", "INTEGER DEFAULT 0"),
+        "UPDATE users SET "
+        "bonus_strength = (SELECT COALESCE(SUM(i.strength_bonus), 0) FROM user_items ui "
+        "JOIN items i ON i.id = ui.item_id WHERE ui.user_id = users.id AND ui.is_equipped = 1), "
+        "bonus_armor = (SELECT COALESCE(SUM(i.armor_bonus), 0) FROM user_items ui "
+        "JOIN items i ON i.id = ui.item_id WHERE ui.user_id = users.id AND ui.is_equipped = 1), "
+        "bonus_hp = (SELECT COALESCE(SUM(i.hp_bonus), 0) FROM user_items ui "
+        "JOIN items i ON i.id = ui.item_id WHERE ui.user_id = users.id AND ui.is_equipped = 1), "
+        "bonus_agility = (SELECT COALESCE(SUM(i.agility_bonus), 0) FROM user_items ui "
+        "JOIN items i ON i.id = ui.item_id WHERE ui.user_id = users.id AND ui.is_equipped = 1), "
+        "bonus_mana = (SELECT COALESCE(SUM(i.mana_bonus), 0) FROM user_items ui "
+        "JOIN items i ON i.id = ui.item_id WHERE ui.user_id = users.id AND ui.is_equipped = 1)",
+        _strip_folded_equipment_bonuses,
+    ]),
+    (5, "Shop catalog version counter bumped by triggers on items", [
+        "CREATE TABLE IF NOT EXISTS catalog_meta (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL DEFAULT 0)",
+        "INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 1)",
+        "CREATE TRIGGER IF NOT EXISTS trg_items_catalog_insert AFTER INSERT ON items "
+        "BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_items_catalog_update AFTER UPDATE ON items "
+        "BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_items_catalog_delete AFTER DELETE ON items "
+        "BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END",
+    ]),
+    (6, "Typed war stat snapshot columns and auto-defender flag", [
+        add_column("war_participations", "stat_strength", "INTEGER DEFAULT 0"),
+        add_column("war_participations", "stat_armor", "INTEGER DEFAULT 0"),
+        add_column("war_participations", "stat_hp", "INTEGER DEFAULT 0"),
+        add_column("war_participations", "stat_agility", "INTEGER DEFAULT 0"),
+        add_column("war_participations", "stat_mana", "INTEGER DEFAULT 0"),
+        add_column("war_participations", "stat_level", "INTEGER DEFAULT 1"),
+        add_column("war_participations", "is_auto_defender", "BOOLEAN DEFAULT 0"),
+        _move_player_stats_to_columns,
+        drop_column("war_participations", "player_stats"),
+    ]),
+    (7, "Running squad totals in war_squad_stats", [
+        "INSERT OR IGNORE INTO war_squad_stats "
+        "(war_id, kingdom, role, player_count, auto_defenders, "
+        "total_strength, total_armor, total_hp, total_agility, total_mana) "
+        "SELECT war_id, kingdom, role, COUNT(*), SUM(COALESCE(is_auto_defender, 0)), "
+        "SUM(stat_strength), SUM(stat_armor), SUM(stat_hp), SUM(stat_agility), SUM(stat_mana) "
+        "FROM war_participations GROUP BY war_id, kingdom, role ORDER BY MIN(id)",
+    ]),
+    (8, "Idempotent post-war HP/MP restoration flag", [
+        add_column("kingdom_wars", "participants_restored", "BOOLEAN DEFAULT 0"),
+        # Wars finished before the upgrade were restored by the time-window job
+        "UPDATE kingdom_wars SET participants_restored = 1 WHERE status = 'finished'",
+    ]),
+    (9, "Precomputed war summaries, kingdom and player results", [
+        _backfill_war_results,
+    ]),
+    (10, "Checkpointed war pipeline stage and cursor", [
+        add_column("kingdom_wars", "pipeline_stage", "VARCHAR(8) DEFAULT 'pending'"),
+        add_column("kingdom_wars", "pipeline_cursor", "INTEGER DEFAULT 0"),
+        "UPDATE kingdom_wars SET pipeline_stage = 'finished' WHERE status = 'finished'",
+        # Active wars were interrupted after their start transaction
+        "UPDATE kingdom_wars SET pipeline_stage = 'enrolled' WHERE status = 'active'",
+    ]),
+]
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    result = await conn.exec_driver_sql("PRAGMA user_version")
+    return result.scalar() or 0
+
+async def run_migrations(conn: AsyncConnection) -> int:
+    """Apply pending migrations, returns the resulting schema version"""
+    version = await get_schema_version(conn)
+    
+    for target, description, steps in MIGRATIONS:
+        if target <= version:
+            continue
+        
+        for step in steps:
+            if callable(step):
+                await step(conn)
+            else:
+                await conn.exec_driver_sql(step)
+        
+        await conn.exec_driver_sql(f"PRAGMA user_version = {target}")
+        version = target
+        logger.info(f"Applied migration {target}: {description}")
+    
+    return version
+
+# Hot queries that must be served by an index: (name, sql, params)
+HOT_QUERIES = [
+    ("war participation lookup",
+     "SELECT id FROM war_participations WHERE war_id = ? AND user_id = ?", (1, 1)),
+    ("user war mode",
+     "SELECT id FROM war_participations WHERE user_id = ? AND war_id IN "
+     "(SELECT id FROM kingdom_wars WHERE status = 'scheduled')", (1,)),
+    ("online defenders",
+     "SELECT id FROM users WHERE kingdom = ? AND last_active >= ?", ('north', '2000-01-01')),
+    ("matchmaking",
+     "SELECT id FROM users WHERE kingdom = ? AND level >= ? AND level <= ? AND is_active = 1", ('north', 1, 10)),
+    ("equipped items",
+     "SELECT id FROM user_items WHERE user_id = ? AND is_equipped = 1", (1,)),
+    ("scheduled wars",
+     "SELECT id FROM kingdom_wars WHERE status = 'scheduled' AND scheduled_time >= ? AND scheduled_time < ?",
+     ('2000-01-01', '2000-01-02')),
+    ("inventory page",
+     "SELECT ui.id FROM user_items ui JOIN items i ON i.id = ui.item_id "
+     "WHERE ui.user_id = ? AND ui.is_equipped = 0 AND ui.id < ? ORDER BY ui.id DESC LIMIT 11", (1, 100)),
+    ("war squad stats",
+     "SELECT * FROM war_squad_stats WHERE war_id = ? ORDER BY id", (1,)),
+    ("war slot",
+     "SELECT id, defending_kingdom FROM kingdom_wars WHERE status = 'scheduled' AND scheduled_time = ?",
+     ('2000-01-01 03:00:00.000000',)),
+    ("next war of kingdom",
+     "SELECT id FROM kingdom_wars WHERE status = 'scheduled' AND scheduled_time >= ? "
+     "AND defending_kingdom = ? ORDER BY scheduled_time LIMIT 1", ('2000-01-01', 'north')),
+    ("battle log page",
+     "SELECT entry FROM battle_log_entries WHERE battle_id = ? ORDER BY seq DESC LIMIT 5", (1,)),
+    ("round timeouts",
+     "SELECT id FROM interactive_battles WHERE phase = 'attack_selection' AND round_start_time <= ?",
+     ('2000-01-01',)),
+    ("pending round deadlines",
+     "SELECT id, mode, round_start_time, round_timeout FROM interactive_battles "
+     "WHERE phase IN ('attack_selection', 'dodge_selection') AND round_start_time IS NOT NULL", ()),
+    ("latest war result",
+     "SELECT r.id, s.summary_text FROM war_user_results r JOIN war_summaries s ON s.war_id = r.war_id "
+     "WHERE r.user_id = ? ORDER BY r.war_id DESC LIMIT 1", (1,)),
+    ("war channel summary",
+     "SELECT summary_text FROM war_summaries WHERE war_id IN (?, ?) ORDER BY war_id", (1, 2)),
+]
+
+async def explain_hot_queries(conn: AsyncConnection) -> Dict[str, List[str]]:
+    """EXPLAIN QUERY PLAN details for every hot query"""
+    plans = {}
+    for name, sql, params in HOT_QUERIES:
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+        plans[name] = [row[-1] for row in result]
+    return plans
+
+async def verify_hot_query_plans(conn: AsyncConnection) -> Dict[str, List[str]]:
+    """Raise RuntimeError if a hot query falls back to a full table scan"""
+    plans = await explain_hot_queries(conn)
+    
+    offenders = {}
+    for name, details in plans.items():
+        scans = [
+            detail for detail in details
+            if detail.startswith("SCAN") and "INDEX" not in detail
+        ]
+        if scans or not any("INDEX" in detail for detail in details):
+            offenders[name] = details
+    
+    if offenders:
+        listing = "; ".join(f"{name}: {' | '.join(details)}" for name, details in offenders.items())
+        raise RuntimeError(f"Hot queries without index: {listing}")
+    return plans
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    from pathlib import Path
+    
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from config.database import engine, init_db
+    
+    async def main():
+        await init_db()
+        async with engine.connect() as conn:
+            print(f"Schema version: {await get_schema_version(conn)}")
+            plans = await verify_hot_query_plans(conn)
+        for name, details in plans.items():
+            print(f"✅ {name}: {' | '.join(details)}")
+    
+    asyncio.run(main())
@@ -9,8 +9,19 @@ class Settings(BaseSettings):
     # Database
     DB_PATH: str = "./rpg_game.db"
     
+    # SQLite storage profile (applied to every new connection)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MB
+    SQLITE_CACHE_SIZE: int = -65536  # negative value = KiB, i.e. 64 MB
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_WAL_CHECKPOINT_INTERVAL: int = 300  # seconds, 0 disables periodic checkpoints
+    
     # War Settings
     WAR_CHANNEL_ID: str = ""  # ID канала для уведомлений о войнах
+    WAR_MAX_CONCURRENCY: int = 1  # wars of one time slot processed at once, raise once a gain is measured
+    WAR_REWARD_CHUNK_SIZE: int = 500  # attackers rewarded per transaction
     
     # Game Settings
     MAX_LEVEL: int = 100
@@ -22,6 +33,10 @@ class Settings(BaseSettings):
     # Battle Settings
     BATTLE_TIMEOUT: int = 300
     MAX_BATTLE_TURNS: int = 50
+    BATTLE_QUEUE_WORKERS: int = 4  # auto-resolved PvP battles simulated at once
+    BATTLE_QUEUE_SIZE: int = 200  # accepted battles waiting for a worker before accepts are refused
+    BATTLE_COMMIT_BATCH_SIZE: int = 50  # resolved battles written per transaction
+    BATTLE_COMMIT_INTERVAL: float = 1.0  # seconds a resolved battle may wait for its batch
     
     # Dungeon Settings
     MAX_DUNGEON_PARTICIPANTS: int = 5
@@ -30,6 +45,16 @@ class Settings(BaseSettings):
     # Security
     RATE_LIMIT: int = 30
     
+    # Write-behind buffers
+    ACTIVITY_FLUSH_INTERVAL: int = 30  # seconds between last_active flushes
+    BATTLE_SNAPSHOT_INTERVAL: int = 15  # seconds between snapshots of unsaved battle choices
+    BATTLE_STATE_IDLE_TTL: int = 1800  # seconds before an untouched live battle is dropped from memory
+    
+    # Caches
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: int = 60  # seconds
+    SHOP_CATALOG_CHECK_INTERVAL: int = 60  # seconds between catalog version checks
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     
@@ -37,6 +62,18 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"sqlite+aiosqlite:///{self.DB_PATH}"
     
+    @property
+    def SQLITE_PRAGMAS(self) -> list:
+        """Pragmas executed on every new SQLite connection"""
+        return [
+            f"PRAGMA journal_mode={self.SQLITE_JOURNAL_MODE}",
+            f"PRAGMA busy_timeout={self.SQLITE_BUSY_TIMEOUT_MS}",
+            f"PRAGMA synchronous={self.SQLITE_SYNCHRONOUS}",
+            f"PRAGMA mmap_size={self.SQLITE_MMAP_SIZE}",
+            f"PRAGMA cache_size={self.SQLITE_CACHE_SIZE}",
+            f"PRAGMA temp_store={self.SQLITE_TEMP_STORE}",
+        ]
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
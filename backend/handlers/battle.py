@@ -3,9 +3,11 @@ from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBut
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from keyboards.main_menu import battle_menu_keyboard, kingdom_attack_keyboard, battle_accept_keyboard
 from services.battle_service import BattleService
+from services.battle_queue import battle_queue
 from services.user_service import UserService
 from config.settings import GameConstants
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from config.database import AsyncSessionLocal
 from models.user import User
 import random
@@ -22,8 +24,8 @@ async def show_battle_menu(callback: CallbackQuery, user, is_registered: bool):
     await callback.message.edit_text(
         f"⚔️ <b>Меню сражений</b>\n\n"
         f"👤 {user.name} | Уровень {user.level}\n"
-        f"💪 Сила: {user.strength} | 🛡️ Броня: {user.armor}\n"
-        f"❤️ HP: {user.current_hp}/{user.hp} | 🔮 Мана: {user.current_mana}/{user.mana}\n\n"
+        f"💪 Сила: {user.effective_strength} | 🛡️ Броня: {user.effective_armor}\n"
+        f"❤️ HP: {user.current_hp}/{user.max_hp} | 🔮 Мана: {user.current_mana}/{user.max_mana}\n\n"
         f"Выберите тип сражения:",
         reply_markup=battle_menu_keyboard()
     )
@@ -110,7 +112,7 @@ async def challenge_player(callback: CallbackQuery, user, is_registered: bool):
     defender_id = int(callback.data.replace("challenge_", ""))
     
     # Check if user has enough HP
-    if user.current_hp < user.hp * 0.3:  # Need at least 30% HP
+    if user.current_hp < user.max_hp * 0.3:  # Need at least 30% HP
         await callback.answer(
             "❤️ Недостаточно здоровья для боя!\n"
             "Нужно минимум 30% HP",
@@ -225,10 +227,10 @@ async def view_battle_challenge(callback: CallbackQuery, user, is_registered: bo
         f"🏰 Королевство: <b>{kingdom_info['emoji']} {kingdom_info['name']}</b>\n\n"
         
         f"💪 <b>Характеристики противника:</b>\n"
-        f"⚔️ Сила: <b>{challenger.strength}</b>\n"
-        f"🛡️ Броня: <b>{challenger.armor}</b>\n"
-        f"❤️ Здоровье: <b>{challenger.hp}</b>\n"
-        f"💨 Проворность: <b>{challenger.agility}</b>\n\n"
+        f"⚔️ Сила: <b>{challenger.effective_strength}</b>\n"
+        f"🛡️ Броня: <b>{challenger.effective_armor}</b>\n"
+        f"❤️ Здоровье: <b>{challenger.max_hp}</b>\n"
+        f"💨 Проворность: <b>{challenger.effective_agility}</b>\n\n"
         
         f"🏆 Статистика: {challenger.pvp_wins}W/{challenger.pvp_losses}L\n\n"
         f"Принять вызов?"
@@ -250,7 +252,7 @@ async def accept_battle(callback: CallbackQuery, user, is_registered: bool):
     battle_id = int(callback.data.replace("accept_battle_", ""))
     
     # Check if user has enough HP
-    if user.current_hp < user.hp * 0.3:  # Need at least 30% HP
+    if user.current_hp < user.max_hp * 0.3:  # Need at least 30% HP
         await callback.answer(
             "❤️ Недостаточно здоровья для боя!\n"
             "Нужно минимум 30% HP",
@@ -258,6 +260,14 @@ async def accept_battle(callback: CallbackQuery, user, is_registered: bool):
         )
         return
     
+    if battle_queue.full():
+        await callback.answer(
+            "⏳ Сейчас идёт слишком много боёв!\n"
+            "Попробуйте принять вызов через минуту",
+            show_alert=True
+        )
+        return
+    
     battle_service = BattleService()
     success = await battle_service.accept_battle(battle_id)
     
@@ -427,14 +437,14 @@ async def training_battle(callback: CallbackQuery, user, is_registered: bool):
     
     # Generate AI opponent with similar stats
     ai_level = max(1, user.level + random.randint(-2, 2))
-    ai_strength = user.strength + random.randint(-3, 3)
-    ai_armor = user.armor + random.randint(-3, 3)
-    ai_hp = user.hp + random.randint(-20, 20)
-    ai_agility = user.agility + random.randint(-3, 3)
+    ai_strength = user.effective_strength + random.randint(-3, 3)
+    ai_armor = user.effective_armor + random.randint(-3, 3)
+    ai_hp = user.max_hp + random.randint(-20, 20)
+    ai_agility = user.effective_agility + random.randint(-3, 3)
     
     # Simple battle simulation
-    user_damage = max(1, user.strength + user.agility // 2 - ai_armor // 2)
-    ai_damage = max(1, ai_strength + ai_agility // 2 - user.armor // 2)
+    user_damage = max(1, user.effective_strength + user.effective_agility // 2 - ai_armor // 2)
+    ai_damage = max(1, ai_strength + ai_agility // 2 - user.effective_armor // 2)
     
     user_hp = user.current_hp
     ai_hp_current = max(50, ai_hp)
@@ -449,12 +459,12 @@ async def training_battle(callback: CallbackQuery, user, is_registered: bool):
         
         if ai_hp_current <= 0:
             break
-            
+        
         # AI attacks
         if random.random() > 0.1:  # 90% hit chance
             damage = ai_damage + random.randint(-2, 5)
             user_hp -= damage
-            
+        
         turns += 1
     
     # Determine result
@@ -510,7 +520,7 @@ async def placeholder_features(callback: CallbackQuery):
     await callback.answer(f"{feature_name} будут добавлены в следующих обновлениях!", show_alert=True)
 
 @router.callback_query(F.data == "inventory")
-async def inventory_from_battle(callback: CallbackQuery, user, is_registered: bool):
+async def inventory_from_battle(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Redirect to inventory from battle menu"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -518,10 +528,10 @@ async def inventory_from_battle(callback: CallbackQuery, user, is_registered: bo
     
     # Import and use inventory handler
     from handlers.inventory import show_inventory
-    await show_inventory(callback, user, is_registered)
+    await show_inventory(callback, user, is_registered, session)
 
 @router.callback_query(F.data == "shop_menu")
-async def shop_menu_from_battle(callback: CallbackQuery, user, is_registered: bool):
+async def shop_menu_from_battle(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Redirect to shop menu from battle menu"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -529,4 +539,4 @@ async def shop_menu_from_battle(callback: CallbackQuery, user, is_registered: bo
     
     # Import and use shop handler
     from handlers.shop import show_shop_menu
-    await show_shop_menu(callback, user, is_registered)
\ No newline at end of file
+    await show_shop_menu(callback, user, is_registered, session)
\ No newline at end of file
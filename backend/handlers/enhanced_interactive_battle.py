@@ -2,7 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from services.enhanced_battle_service import EnhancedBattleService
-from models.interactive_battle import BattlePhaseEnum
+from services.battle_log_service import BattleLogService
 import asyncio
 
 router = Router()
@@ -14,7 +14,7 @@ async def start_enhanced_pve_encounter(callback: CallbackQuery, user, is_registe
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
-    if user.current_hp < user.hp * 0.3:
+    if user.current_hp < user.max_hp * 0.3:
         await callback.answer("❤️ Недостаточно здоровья для боя! Нужно минимум 30% HP", show_alert=True)
         return
     
@@ -30,7 +30,7 @@ async def start_enhanced_pve_encounter(callback: CallbackQuery, user, is_registe
     # Enhanced monster card with flee chance info
     level_diff = user.level - monster_data['level']
     base_chance = 0.6
-    agility_bonus = (user.agility - 10) * 0.02
+    agility_bonus = (user.effective_agility - 10) * 0.02
     level_bonus = level_diff * 0.05
     flee_chance = max(0.1, min(0.9, base_chance + agility_bonus + level_bonus))
     
@@ -51,9 +51,9 @@ async def start_enhanced_pve_encounter(callback: CallbackQuery, user, is_registe
         f"💰 Деньги: <b>+{monster_data['money_reward']}</b> золота\n\n"
         
         f"👤 <b>Ваше состояние:</b>\n"
-        f"❤️ HP: <b>{user.current_hp}/{user.hp}</b>\n"
-        f"🔮 Мана: <b>{user.current_mana}/{user.mana}</b>\n"
-        f"💨 Проворность: <b>{user.agility}</b>\n\n"
+        f"❤️ HP: <b>{user.current_hp}/{user.max_hp}</b>\n"
+        f"🔮 Мана: <b>{user.current_mana}/{user.max_mana}</b>\n"
+        f"💨 Проворность: <b>{user.effective_agility}</b>\n\n"
         
         f"🏃‍♂️ <b>Шанс побега: {flee_chance:.1%}</b>\n"
         f"⚠️ При неудачном побеге монстр нанесёт удар!\n\n"
@@ -128,8 +128,8 @@ async def show_attack_type_selection(callback: CallbackQuery, battle_id: int, us
     attack_text = (
         f"⚔️ <b>Раунд {battle.current_round} - Выбор атаки</b>\n\n"
         f"👤 <b>Ваше состояние:</b>\n"
-        f"❤️ HP: <b>{battle.player1_hp}/{user.hp}</b>\n"
-        f"🔮 Мана: <b>{battle.player1_mana}/{user.mana}</b>\n\n"
+        f"❤️ HP: <b>{battle.player1_hp}/{user.max_hp}</b>\n"
+        f"🔮 Мана: <b>{battle.player1_mana}/{user.max_mana}</b>\n\n"
         
         f"{monster_data['type_emoji']} <b>{monster_data['name']}:</b>\n"
         f"❤️ HP: <b>{battle.monster_hp}/{monster_data['hp']}</b>\n\n"
@@ -161,9 +161,6 @@ async def show_attack_type_selection(callback: CallbackQuery, battle_id: int, us
     ])
     
     await callback.message.edit_text(attack_text, reply_markup=keyboard)
-    
-    # Start timeout checker
-    asyncio.create_task(check_attack_timeout(battle_id, 50))
 
 @router.callback_query(F.data.startswith("attack_type_"))
 async def handle_attack_type_choice(callback: CallbackQuery, user, is_registered: bool):
@@ -199,13 +196,13 @@ async def show_dodge_direction_selection(callback: CallbackQuery, battle_id: int
     monster_data = battle.get_monster_data()
     
     # Calculate perfect dodge chance
-    perfect_dodge_chance = min(user.agility / 500.0, 0.07) * 100
+    perfect_dodge_chance = min(user.effective_agility / 500.0, 0.07) * 100
     
     dodge_text = (
         f"🛡️ <b>Раунд {battle.current_round} - Уклонение</b>\n\n"
         f"👤 <b>Ваше состояние:</b>\n"
-        f"❤️ HP: <b>{battle.player1_hp}/{user.hp}</b>\n"
-        f"💨 Проворность: <b>{user.agility}</b>\n\n"
+        f"❤️ HP: <b>{battle.player1_hp}/{user.max_hp}</b>\n"
+        f"💨 Проворность: <b>{user.effective_agility}</b>\n\n"
         
         f"{monster_data['type_emoji']} <b>{monster_data['name']}:</b>\n"
         f"❤️ HP: <b>{battle.monster_hp}/{monster_data['hp']}</b>\n\n"
@@ -229,9 +226,6 @@ async def show_dodge_direction_selection(callback: CallbackQuery, battle_id: int
     ])
     
     await callback.message.edit_text(dodge_text, reply_markup=keyboard)
-    
-    # Start timeout checker
-    asyncio.create_task(check_dodge_timeout(battle_id, 50))
 
 @router.callback_query(F.data.startswith("dodge_dir_"))
 async def handle_dodge_direction_choice(callback: CallbackQuery, user, is_registered: bool):
@@ -278,12 +272,10 @@ async def show_enhanced_round_results(callback: CallbackQuery, battle_id: int, u
     if not battle:
         return
     
-    battle_log = battle.get_battle_log()
-    if not battle_log:
+    last_round = await BattleLogService().get_last_round(battle_id)
+    if not last_round:
         return
     
-    last_round = battle_log[-1]
-    
     # Build enhanced results text
     results_text = f"📊 <b>Результаты раунда {last_round['round']}</b>\n\n"
     
@@ -333,17 +325,19 @@ async def continue_enhanced_battle(callback: CallbackQuery, user, is_registered:
 
 async def show_enhanced_battle_finished(callback: CallbackQuery, battle, user):
     """Show enhanced battle finished results"""
-    battle_log = battle.get_battle_log()
-    final_result = battle_log[-1] if battle_log else {}
+    log_service = BattleLogService()
+    final_entries = await log_service.get_last_entries(battle.id)
+    final_result = final_entries[-1] if final_entries else {}
     
     if battle.winner_id == user.id:
         # Victory
+        skills_rounds = await log_service.count_rounds_with_skills(battle.id)
         result_text = (
             f"🏆 <b>ВЕЛИКОЛЕПНАЯ ПОБЕДА!</b>\n\n"
             f"🎉 Вы одержали победу в бою!\n\n"
             f"📊 <b>Статистика боя:</b>\n"
             f"⏱️ Раундов: <b>{battle.current_round}</b>\n"
-            f"💪 Использовано навыков: <b>{len([r for r in battle_log if r.get('skills_used')])}</b>\n\n"
+            f"💪 Использовано навыков: <b>{skills_rounds}</b>\n\n"
             
             f"🎁 <b>Награды:</b>\n"
             f"⚡ Опыт: <b>+{battle.exp_gained}</b>\n"
@@ -373,30 +367,63 @@ async def show_enhanced_battle_finished(callback: CallbackQuery, battle, user):
             )
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📜 Журнал боя", callback_data=f"battle_log_{battle.id}_1")],
         [InlineKeyboardButton(text="🔄 Новый бой", callback_data="enhanced_pve_encounter")],
         [InlineKeyboardButton(text="🔙 В меню", callback_data="battle_menu")]
     ])
     
     await callback.message.edit_text(result_text, reply_markup=keyboard)
 
-async def check_attack_timeout(battle_id: int, timeout_seconds: int):
-    """Check for attack selection timeout"""
-    await asyncio.sleep(timeout_seconds)
+@router.callback_query(F.data.startswith("battle_log_"))
+async def show_battle_log(callback: CallbackQuery, user, is_registered: bool):
+    """Show battle log page by page"""
+    if not is_registered:
+        await callback.answer("Сначала нужно зарегистрироваться!")
+        return
     
-    battle_service = EnhancedBattleService()
-    battle = await battle_service.get_battle(battle_id)
+    # Parse callback data: battle_log_{battle_id}_{page}
+    parts = callback.data.split("_")
+    battle_id = int(parts[2])
+    page = int(parts[3])
     
-    if battle and battle.phase == BattlePhaseEnum.attack_selection:
-        # Auto-select normal attack
-        await battle_service.make_attack_choice(battle_id, battle.player1_id, 'normal')
-
-async def check_dodge_timeout(battle_id: int, timeout_seconds: int):
-    """Check for dodge selection timeout"""
-    await asyncio.sleep(timeout_seconds)
+    battle = await EnhancedBattleService().get_battle(battle_id)
+    if not battle or user.id not in (battle.player1_id, battle.player2_id):
+        await callback.answer("❌ Бой не найден!", show_alert=True)
+        return
     
-    battle_service = EnhancedBattleService()
-    battle = await battle_service.get_battle(battle_id)
+    entries, total_pages = await BattleLogService().get_log_page(battle_id, page)
+    
+    log_text = f"📜 <b>Журнал боя</b> (стр. {page}/{total_pages})\n\n"
+    for entry in entries:
+        log_text += f"<b>Раунд {entry.get('round', '?')}</b>\n"
+        for event in entry.get('events', []):
+            log_text += f"• {event}\n"
+        if entry.get('message'):
+            log_text += f"• {entry['message']}\n"
+        log_text += "\n"
+    
+    if not entries:
+        log_text += "Журнал пуст"
+    
+    builder = InlineKeyboardBuilder()
+    nav_buttons = []
+    if page > 1:
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅️ Назад",
+            callback_data=f"battle_log_{battle_id}_{page-1}"
+        ))
+    if page < total_pages:
+        nav_buttons.append(InlineKeyboardButton(
+            text="➡️ Далее",
+            callback_data=f"battle_log_{battle_id}_{page+1}"
+        ))
+    
+    if nav_buttons:
+        builder.row(*nav_buttons)
+    
+    builder.row(
+        InlineKeyboardButton(text="🔙 В меню", callback_data="battle_menu")
+    )
     
-    if battle and battle.phase == BattlePhaseEnum.dodge_selection:
-        # Auto-select center (no dodge)
-        await battle_service.make_direction_choice(battle_id, battle.player1_id, 'center')
\ No newline at end of file
+    await callback.message.edit_text(log_text, reply_markup=builder.as_markup())
+    await callback.answer()
\ No newline at end of file
@@ -1,12 +1,14 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.enhanced_kingdom_war_service import EnhancedKingdomWarService
+from services.war_calendar import war_calendar
 from keyboards.main_menu import battle_menu_keyboard
 
 router = Router()
 
 @router.callback_query(F.data == "enhanced_battle_menu")
-async def show_enhanced_battle_menu(callback: CallbackQuery, user, is_registered: bool):
+async def show_enhanced_battle_menu(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show enhanced battle menu with war blocking check"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -14,7 +16,7 @@ async def show_enhanced_battle_menu(callback: CallbackQuery, user, is_registered
     
     # Check if user is blocked due to war participation
     war_service = EnhancedKingdomWarService()
-    is_blocked, block_message = await war_service.check_user_war_block(user.id)
+    is_blocked, block_message = await war_service.check_user_war_block(user.id, session=session)
     
     if is_blocked:
         await callback.message.edit_text(
@@ -34,8 +36,8 @@ async def show_enhanced_battle_menu(callback: CallbackQuery, user, is_registered
     battle_text = (
         f"⚔️ <b>Меню сражений v3.0</b>\n\n"
         f"👤 {user.name} | Уровень {user.level}\n"
-        f"💪 Сила: {user.strength} | 🛡️ Броня: {user.armor}\n"
-        f"❤️ HP: {user.current_hp}/{user.hp} | 🔮 Мана: {user.current_mana}/{user.mana}\n\n"
+        f"💪 Сила: {user.effective_strength} | 🛡️ Броня: {user.effective_armor}\n"
+        f"❤️ HP: {user.current_hp}/{user.max_hp} | 🔮 Мана: {user.current_mana}/{user.max_mana}\n\n"
         
         f"🆕 <b>Новые возможности:</b>\n"
         f"🎯 Интерактивные PvE бои с выбором действий\n"
@@ -75,27 +77,9 @@ async def show_kingdom_wars_menu(callback: CallbackQuery, user, is_registered: b
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
-    from datetime import datetime
-    import pytz
-    
     # Get current time in Tashkent timezone
-    tashkent_tz = pytz.timezone('Asia/Tashkent')
-    current_time = datetime.now(tashkent_tz)
-    
-    # Calculate next war times
-    war_times = [8, 13, 18]
-    next_wars = []
-    
-    for hour in war_times:
-        war_time = current_time.replace(hour=hour, minute=0, second=0, microsecond=0)
-        if war_time <= current_time:
-            # Add one day if time has passed
-            war_time = war_time.replace(day=war_time.day + 1)
-        next_wars.append(war_time)
-    
-    # Sort by time
-    next_wars.sort()
-    next_war = next_wars[0]
+    current_time = war_calendar.now()
+    next_war = war_calendar.next_slot(current_time).local_time
     
     wars_text = (
         f"🏰 <b>Войны Королевств</b>\n\n"
@@ -218,32 +202,11 @@ async def join_attack_squad(callback: CallbackQuery, user, is_registered: bool):
     target_kingdom = callback.data.replace("join_attack_", "")
     
     # Get next war time
-    from datetime import datetime
-    import pytz
-    
-    tashkent_tz = pytz.timezone('Asia/Tashkent')
-    current_time = datetime.now(tashkent_tz)
-    
-    # Find next war time
-    war_times = [8, 13, 18]
-    next_war_time = None
-    
-    for hour in war_times:
-        war_time = current_time.replace(hour=hour, minute=0, second=0, microsecond=0)
-        if war_time > current_time:
-            next_war_time = war_time
-            break
-    
-    if not next_war_time:
-        # Tomorrow's first war
-        tomorrow = current_time.replace(day=current_time.day + 1, hour=8, minute=0, second=0, microsecond=0)
-        next_war_time = tomorrow
-    
-    # Convert to UTC for storage
-    next_war_time_utc = next_war_time.astimezone(pytz.UTC)
+    next_slot = war_calendar.next_slot()
+    next_war_time = next_slot.local_time
     
     war_service = EnhancedKingdomWarService()
-    success, message = await war_service.join_attack_squad(user.id, target_kingdom, next_war_time_utc)
+    success, message = await war_service.join_attack_squad(user.id, target_kingdom, next_slot.utc_time)
     
     if success:
         result_text = (
@@ -282,32 +245,11 @@ async def join_attack_squad(callback: CallbackQuery, user, is_registered: bool):
 async def join_defense_squad(callback: CallbackQuery, user, is_registered: bool):
     """Join defense squad for own kingdom"""
     # Get next war time
-    from datetime import datetime
-    import pytz
-    
-    tashkent_tz = pytz.timezone('Asia/Tashkent')
-    current_time = datetime.now(tashkent_tz)
-    
-    # Find next war time
-    war_times = [8, 13, 18]
-    next_war_time = None
-    
-    for hour in war_times:
-        war_time = current_time.replace(hour=hour, minute=0, second=0, microsecond=0)
-        if war_time > current_time:
-            next_war_time = war_time
-            break
-    
-    if not next_war_time:
-        # Tomorrow's first war
-        tomorrow = current_time.replace(day=current_time.day + 1, hour=8, minute=0, second=0, microsecond=0)
-        next_war_time = tomorrow
-    
-    # Convert to UTC for storage
-    next_war_time_utc = next_war_time.astimezone(pytz.UTC)
+    next_slot = war_calendar.next_slot()
+    next_war_time = next_slot.local_time
     
     war_service = EnhancedKingdomWarService()
-    success, message = await war_service.join_defense_squad(user.id, next_war_time_utc)
+    success, message = await war_service.join_defense_squad(user.id, next_slot.utc_time)
     
     if success:
         result_text = (
@@ -346,11 +288,10 @@ async def join_defense_squad(callback: CallbackQuery, user, is_registered: bool)
     await callback.answer()
 
 # Placeholder handlers for other war-related functions
-@router.callback_query(F.data.in_(["my_war_results", "kingdom_stats", "war_rules"]))
+@router.callback_query(F.data.in_(["kingdom_stats", "war_rules"]))
 async def war_placeholder_handlers(callback: CallbackQuery):
     """Placeholder handlers for war features"""
     feature_names = {
-        "my_war_results": "Результаты войн",
         "kingdom_stats": "Статистика королевств",
         "war_rules": "Правила войн"
     }
@@ -2,6 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from services.enhanced_pvp_service import EnhancedPvPService
+from services.battle_log_service import BattleLogService
 from models.interactive_battle import BattlePhaseEnum
 from config.settings import GameConstants
 import asyncio
@@ -15,7 +16,7 @@ async def show_interactive_pvp_menu(callback: CallbackQuery, user, is_registered
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
-    if user.current_hp < user.hp * 0.3:
+    if user.current_hp < user.max_hp * 0.3:
         await callback.answer("❤️ Недостаточно здоровья для боя! Нужно минимум 30% HP", show_alert=True)
         return
     
@@ -29,8 +30,8 @@ async def show_interactive_pvp_menu(callback: CallbackQuery, user, is_registered
         f"• 50 секунд на каждый ход\n\n"
         
         f"👤 <b>Ваше состояние:</b>\n"
-        f"❤️ HP: <b>{user.current_hp}/{user.hp}</b>\n"
-        f"🔮 Мана: <b>{user.current_mana}/{user.mana}</b>\n"
+        f"❤️ HP: <b>{user.current_hp}/{user.max_hp}</b>\n"
+        f"🔮 Мана: <b>{user.current_mana}/{user.max_mana}</b>\n"
         f"⚡ Уровень: <b>{user.level}</b>\n\n"
         
         f"Выберите королевство для поиска противников:"
@@ -80,7 +81,7 @@ async def select_pvp_opponent(callback: CallbackQuery, user, is_registered: bool
                     User.level <= max_level,
                     User.id != user.id,
                     User.is_active == True,
-                    User.current_hp >= User.hp * 0.3  # Must have enough HP
+                    User.current_hp >= (User.hp + User.bonus_hp) * 0.3  # Must have enough HP
                 )
             ).limit(10)
         )
@@ -107,8 +108,8 @@ async def select_pvp_opponent(callback: CallbackQuery, user, is_registered: bool
     
     for player in players[:8]:  # Show max 8 players
         # Calculate relative strength
-        player_total = player.strength + player.armor + player.agility
-        user_total = user.strength + user.armor + user.agility
+        player_total = player.effective_strength + player.effective_armor + player.effective_agility
+        user_total = user.effective_strength + user.effective_armor + user.effective_agility
         
         if player_total > user_total * 1.2:
             strength_indicator = "🔴 Сильнее"
@@ -120,7 +121,7 @@ async def select_pvp_opponent(callback: CallbackQuery, user, is_registered: bool
         menu_text += (
             f"👤 <b>{player.name}</b> (Ур.{player.level})\n"
             f"📊 {strength_indicator} | "
-            f"❤️ {player.current_hp}/{player.hp} | "
+            f"❤️ {player.current_hp}/{player.max_hp} | "
             f"🏆 {player.pvp_wins}W/{player.pvp_losses}L\n\n"
         )
         
@@ -164,10 +165,10 @@ async def challenge_interactive_pvp(callback: CallbackQuery, user, is_registered
         f"🏰 Королевство: {GameConstants.KINGDOMS[defender.kingdom.value]['emoji']} {GameConstants.KINGDOMS[defender.kingdom.value]['name']}\n\n"
         
         f"📊 <b>Характеристики противника:</b>\n"
-        f"⚔️ Сила: <b>{defender.strength}</b>\n"
-        f"🛡️ Броня: <b>{defender.armor}</b>\n"
-        f"❤️ HP: <b>{defender.hp}</b>\n"
-        f"💨 Проворность: <b>{defender.agility}</b>\n\n"
+        f"⚔️ Сила: <b>{defender.effective_strength}</b>\n"
+        f"🛡️ Броня: <b>{defender.effective_armor}</b>\n"
+        f"❤️ HP: <b>{defender.max_hp}</b>\n"
+        f"💨 Проворность: <b>{defender.effective_agility}</b>\n\n"
         
         f"🏆 Статистика: <b>{defender.pvp_wins}W/{defender.pvp_losses}L</b>\n\n"
         
@@ -241,8 +242,8 @@ async def show_interactive_pvp_battle_state(callback: CallbackQuery, battle, use
         f"🔄 Раунд: <b>{battle.current_round}</b>\n"
         f"📍 Фаза: <b>{phase_names.get(battle.phase.value, battle.phase.value)}</b>\n\n"
         
-        f"👤 <b>Вы:</b> ❤️ {user_hp}/{user.hp} | 🔮 {user_mana}/{user.mana}\n"
-        f"👤 <b>{opponent.name}:</b> ❤️ {opponent_hp}/{opponent.hp}\n\n"
+        f"👤 <b>Вы:</b> ❤️ {user_hp}/{user.max_hp} | 🔮 {user_mana}/{user.max_mana}\n"
+        f"👤 <b>{opponent.name}:</b> ❤️ {opponent_hp}/{opponent.max_hp}\n\n"
         
         f"🎯 Ваш выбор атаки: <b>{user_attack or 'Не выбран'}</b>\n"
         f"🛡️ Ваш выбор уклонения: <b>{user_dodge or 'Не выбран'}</b>\n\n"
@@ -338,12 +339,10 @@ async def handle_pvp_dodge_choice(callback: CallbackQuery, user, is_registered:
 
 async def show_interactive_pvp_round_results(callback: CallbackQuery, battle, user):
     """Show PvP round results"""
-    battle_log = battle.get_battle_log()
-    if not battle_log:
+    last_round = await BattleLogService().get_last_round(battle.id)
+    if not last_round:
         return
     
-    last_round = battle_log[-1]
-    
     # Get opponent info
     from config.database import AsyncSessionLocal
     from models.user import User
@@ -389,8 +388,8 @@ async def show_interactive_pvp_round_results(callback: CallbackQuery, battle, us
 
 async def show_interactive_pvp_results(callback: CallbackQuery, battle, user):
     """Show final PvP battle results"""
-    battle_log = battle.get_battle_log()
-    final_result = battle_log[-1] if battle_log else {}
+    final_entries = await BattleLogService().get_last_entries(battle.id)
+    final_result = final_entries[-1] if final_entries else {}
     
     # Get opponent info
     from config.database import AsyncSessionLocal
@@ -445,6 +444,7 @@ async def show_interactive_pvp_results(callback: CallbackQuery, battle, user):
         )
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📜 Журнал боя", callback_data=f"battle_log_{battle.id}_1")],
         [InlineKeyboardButton(text="🔄 Новый PvP", callback_data="interactive_pvp")],
         [InlineKeyboardButton(text="🔙 В меню", callback_data="battle_menu")]
     ])
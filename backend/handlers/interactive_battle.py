@@ -2,6 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from services.interactive_battle_service import InteractiveBattleService
+from services.battle_log_service import BattleLogService
 from models.interactive_battle import BattlePhaseEnum
 import asyncio
 
@@ -15,7 +16,7 @@ async def start_pve_encounter(callback: CallbackQuery, user, is_registered: bool
         return
     
     # Check if user has enough HP
-    if user.current_hp < user.hp * 0.3:
+    if user.current_hp < user.max_hp * 0.3:
         await callback.answer("❤️ Недостаточно здоровья для боя! Нужно минимум 30% HP", show_alert=True)
         return
     
@@ -46,8 +47,8 @@ async def start_pve_encounter(callback: CallbackQuery, user, is_registered: bool
         f"💰 Деньги: <b>+{monster_data['money_reward']}</b> золота\n\n"
         
         f"👤 <b>Ваше состояние:</b>\n"
-        f"❤️ HP: <b>{user.current_hp}/{user.hp}</b>\n"
-        f"🔮 Мана: <b>{user.current_mana}/{user.mana}</b>\n\n"
+        f"❤️ HP: <b>{user.current_hp}/{user.max_hp}</b>\n"
+        f"🔮 Мана: <b>{user.current_mana}/{user.max_mana}</b>\n\n"
         
         f"Что будете делать?"
     )
@@ -110,8 +111,8 @@ async def show_attack_selection(callback: CallbackQuery, battle_id: int, user):
     attack_text = (
         f"⚔️ <b>Раунд {battle.current_round}</b>\n\n"
         f"👤 <b>Ваше состояние:</b>\n"
-        f"❤️ HP: <b>{battle.player1_hp}/{user.hp}</b>\n"
-        f"🔮 Мана: <b>{battle.player1_mana}/{user.mana}</b>\n\n"
+        f"❤️ HP: <b>{battle.player1_hp}/{user.max_hp}</b>\n"
+        f"🔮 Мана: <b>{battle.player1_mana}/{user.max_mana}</b>\n\n"
         
         f"{monster_data['type_emoji']} <b>{monster_data['name']}:</b>\n"
         f"❤️ HP: <b>{battle.monster_hp}/{monster_data['hp']}</b>\n\n"
@@ -131,9 +132,6 @@ async def show_attack_selection(callback: CallbackQuery, battle_id: int, user):
     ])
     
     await callback.message.edit_text(attack_text, reply_markup=keyboard)
-    
-    # Start timeout checker
-    asyncio.create_task(check_round_timeout(battle_id, 50))
 
 @router.callback_query(F.data.startswith("attack_"))
 async def handle_attack_choice(callback: CallbackQuery, user, is_registered: bool):
@@ -165,7 +163,7 @@ async def show_dodge_selection(callback: CallbackQuery, battle_id: int, user):
     dodge_text = (
         f"🛡️ <b>Раунд {battle.current_round} - Уклонение</b>\n\n"
         f"👤 <b>Ваше состояние:</b>\n"
-        f"❤️ HP: <b>{battle.player1_hp}/{user.hp}</b>\n\n"
+        f"❤️ HP: <b>{battle.player1_hp}/{user.max_hp}</b>\n\n"
         
         f"{monster_data['type_emoji']} <b>{monster_data['name']}:</b>\n"
         f"❤️ HP: <b>{battle.monster_hp}/{monster_data['hp']}</b>\n\n"
@@ -223,12 +221,10 @@ async def show_round_results(callback: CallbackQuery, battle_id: int, user):
     if not battle:
         return
     
-    battle_log = battle.get_battle_log()
-    if not battle_log:
+    last_round = await BattleLogService().get_last_round(battle_id)
+    if not last_round:
         return
     
-    last_round = battle_log[-1]
-    
     # Build results text
     results_text = f"📊 <b>Результаты раунда {last_round['round']}</b>\n\n"
     
@@ -266,8 +262,8 @@ async def continue_battle(callback: CallbackQuery, user, is_registered: bool):
 
 async def show_battle_finished(callback: CallbackQuery, battle, user):
     """Show battle finished results"""
-    battle_log = battle.get_battle_log()
-    final_result = battle_log[-1] if battle_log else {}
+    final_entries = await BattleLogService().get_last_entries(battle.id)
+    final_result = final_entries[-1] if final_entries else {}
     
     if battle.winner_id == user.id:
         # Victory
@@ -298,20 +294,9 @@ async def show_battle_finished(callback: CallbackQuery, battle, user):
         result_emoji = "💀"
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📜 Журнал боя", callback_data=f"battle_log_{battle.id}_1")],
         [InlineKeyboardButton(text="🔄 Новый бой", callback_data="pve_encounter")],
         [InlineKeyboardButton(text="🔙 В меню", callback_data="battle_menu")]
     ])
     
-    await callback.message.edit_text(result_text, reply_markup=keyboard)
-
-async def check_round_timeout(battle_id: int, timeout_seconds: int):
-    """Check for round timeout"""
-    await asyncio.sleep(timeout_seconds)
-    
-    battle_service = InteractiveBattleService()
-    timed_out = await battle_service.check_battle_timeout(battle_id)
-    
-    if timed_out:
-        # Battle timed out - would need to notify players
-        # This is simplified for now
-        pass
\ No newline at end of file
+    await callback.message.edit_text(result_text, reply_markup=keyboard)
\ No newline at end of file
@@ -1,23 +1,40 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.inventory_service import InventoryService
 from models.item import ItemTypeEnum
 
 router = Router()
 
+OTHER_ITEM_TYPES = [
+    item_type for item_type in ItemTypeEnum
+    if item_type not in (ItemTypeEnum.weapon, ItemTypeEnum.armor, ItemTypeEnum.consumable)
+]
+
+# category -> (title, item types, equipped filter)
+INVENTORY_CATEGORIES = {
+    'weapons': ("⚔️ Оружие", [ItemTypeEnum.weapon], False),
+    'armor': ("🛡️ Броня", [ItemTypeEnum.armor], False),
+    'consumables': ("🧪 Зелья", [ItemTypeEnum.consumable], None),
+    'other': ("📦 Прочее", OTHER_ITEM_TYPES, False),
+    'equipped': ("⚡ Экипированные предметы", None, True)
+}
+
+INVENTORY_PAGE_SIZE = 10
+
 @router.callback_query(F.data == "inventory")
-async def show_inventory(callback: CallbackQuery, user, is_registered: bool):
+async def show_inventory(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show user inventory"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
     inventory_service = InventoryService()
-    inventory = await inventory_service.get_user_inventory(user.id)
-    stats = await inventory_service.get_inventory_stats(user.id)
+    summary = await inventory_service.get_inventory_summary(user.id, session=session)
+    total_items = sum(summary.values())
     
-    if not inventory:
+    if not total_items:
         await callback.message.edit_text(
             f"🎒 <b>Инвентарь пуст</b>\n\n"
             f"📦 Использовано: 0/{user.inventory_size}\n\n"
@@ -30,30 +47,23 @@ async def show_inventory(callback: CallbackQuery, user, is_registered: bool):
         await callback.answer()
         return
     
-    # Group items by type
-    equipped_items = []
-    weapons = []
-    armor = []
-    consumables = []
-    other_items = []
-    
-    for user_item in inventory:
-        if user_item.is_equipped:
-            equipped_items.append(user_item)
-        elif user_item.item.item_type == ItemTypeEnum.weapon:
-            weapons.append(user_item)
-        elif user_item.item.item_type == ItemTypeEnum.armor:
-            armor.append(user_item)
-        elif user_item.item.item_type == ItemTypeEnum.consumable:
-            consumables.append(user_item)
-        else:
-            other_items.append(user_item)
+    def count_items(item_types, is_equipped=False):
+        return sum(summary.get((item_type, is_equipped), 0) for item_type in item_types)
+    
+    weapons_count = count_items([ItemTypeEnum.weapon])
+    armor_count = count_items([ItemTypeEnum.armor])
+    consumables_count = count_items([ItemTypeEnum.consumable])
+    other_count = count_items(OTHER_ITEM_TYPES)
+    equipped_count = count_items(ItemTypeEnum, is_equipped=True)
     
     inventory_text = f"🎒 <b>Инвентарь</b>\n\n"
-    inventory_text += f"📦 Использовано: {stats['total_items']}/{user.inventory_size}\n\n"
+    inventory_text += f"📦 Использовано: {total_items}/{user.inventory_size}\n\n"
     
     # Show equipped items
-    if equipped_items:
+    if equipped_count:
+        equipped_items, _ = await inventory_service.get_inventory_page(
+            user.id, is_equipped=True, limit=INVENTORY_PAGE_SIZE, session=session
+        )
         inventory_text += "⚡ <b>Экипировано:</b>\n"
         for user_item in equipped_items:
             durability_text = f" ({user_item.current_durability}/{user_item.item.max_durability})" if user_item.item.max_durability > 0 else ""
@@ -63,31 +73,31 @@ async def show_inventory(callback: CallbackQuery, user, is_registered: bool):
     builder = InlineKeyboardBuilder()
     
     # Show inventory categories
-    if weapons:
+    if weapons_count:
         builder.row(InlineKeyboardButton(
-            text=f"⚔️ Оружие ({len(weapons)})",
+            text=f"⚔️ Оружие ({weapons_count})",
             callback_data="inventory_weapons"
         ))
     
-    if armor:
+    if armor_count:
         builder.row(InlineKeyboardButton(
-            text=f"🛡️ Броня ({len(armor)})",
+            text=f"🛡️ Броня ({armor_count})",
             callback_data="inventory_armor"
         ))
     
-    if consumables:
+    if consumables_count:
         builder.row(InlineKeyboardButton(
-            text=f"🧪 Зелья ({len(consumables)})",
+            text=f"🧪 Зелья ({consumables_count})",
             callback_data="inventory_consumables"
         ))
     
-    if other_items:
+    if other_count:
         builder.row(InlineKeyboardButton(
-            text=f"📦 Прочее ({len(other_items)})",
+            text=f"📦 Прочее ({other_count})",
             callback_data="inventory_other"
         ))
     
-    if equipped_items:
+    if equipped_count:
         builder.row(InlineKeyboardButton(
             text="⚡ Управление экипировкой",
             callback_data="inventory_equipped"
@@ -105,36 +115,28 @@ async def show_inventory(callback: CallbackQuery, user, is_registered: bool):
     await callback.answer()
 
 @router.callback_query(F.data.startswith("inventory_"))
-async def show_inventory_category(callback: CallbackQuery, user, is_registered: bool):
+async def show_inventory_category(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show specific inventory category"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
-    category = callback.data.replace("inventory_", "")
+    # Parse callback data: inventory_{category}[_{after_id}]
+    parts = callback.data.replace("inventory_", "").split("_")
+    category = parts[0]
+    after_id = int(parts[1]) if len(parts) > 1 else None
+    
+    if category not in INVENTORY_CATEGORIES:
+        await callback.answer("Категория не найдена!", show_alert=True)
+        return
+    
+    category_name, item_types, is_equipped = INVENTORY_CATEGORIES[category]
     
     inventory_service = InventoryService()
-    inventory = await inventory_service.get_user_inventory(user.id)
-    
-    # Filter items by category
-    filtered_items = []
-    category_name = ""
-    
-    if category == "weapons":
-        filtered_items = [item for item in inventory if item.item.item_type == ItemTypeEnum.weapon and not item.is_equipped]
-        category_name = "⚔️ Оружие"
-    elif category == "armor":
-        filtered_items = [item for item in inventory if item.item.item_type == ItemTypeEnum.armor and not item.is_equipped]
-        category_name = "🛡️ Броня"
-    elif category == "consumables":
-        filtered_items = [item for item in inventory if item.item.item_type == ItemTypeEnum.consumable]
-        category_name = "🧪 Зелья"
-    elif category == "other":
-        filtered_items = [item for item in inventory if item.item.item_type not in [ItemTypeEnum.weapon, ItemTypeEnum.armor, ItemTypeEnum.consumable] and not item.is_equipped]
-        category_name = "📦 Прочее"
-    elif category == "equipped":
-        filtered_items = [item for item in inventory if item.is_equipped]
-        category_name = "⚡ Экипированные предметы"
+    filtered_items, next_cursor = await inventory_service.get_inventory_page(
+        user.id, item_types=item_types, is_equipped=is_equipped,
+        after_id=after_id, limit=INVENTORY_PAGE_SIZE, session=session
+    )
     
     if not filtered_items:
         await callback.answer(f"В категории '{category_name}' нет предметов!", show_alert=True)
@@ -144,7 +146,7 @@ async def show_inventory_category(callback: CallbackQuery, user, is_registered:
     
     builder = InlineKeyboardBuilder()
     
-    for user_item in filtered_items[:10]:  # Show max 10 items
+    for user_item in filtered_items:
         # Item info
         item = user_item.item
         quantity_text = f" x{user_item.quantity}" if user_item.quantity > 1 else ""
@@ -195,6 +197,23 @@ async def show_inventory_category(callback: CallbackQuery, user, is_registered:
                 callback_data=f"sell_item_{user_item.id}"
             ))
     
+    # Pagination
+    nav_buttons = []
+    if after_id is not None:
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅️ В начало",
+            callback_data=f"inventory_{category}"
+        ))
+    
+    if next_cursor is not None:
+        nav_buttons.append(InlineKeyboardButton(
+            text="➡️ Далее",
+            callback_data=f"inventory_{category}_{next_cursor}"
+        ))
+    
+    if nav_buttons:
+        builder.row(*nav_buttons)
+    
     builder.row(
         InlineKeyboardButton(text="🔙 К инвентарю", callback_data="inventory")
     )
@@ -206,7 +225,7 @@ async def show_inventory_category(callback: CallbackQuery, user, is_registered:
     await callback.answer()
 
 @router.callback_query(F.data.startswith("equip_"))
-async def equip_item(callback: CallbackQuery, user, is_registered: bool):
+async def equip_item(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Equip an item"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -215,17 +234,17 @@ async def equip_item(callback: CallbackQuery, user, is_registered: bool):
     user_item_id = int(callback.data.replace("equip_", ""))
     
     inventory_service = InventoryService()
-    success, message = await inventory_service.equip_item(user.id, user_item_id)
+    success, message = await inventory_service.equip_item(user.id, user_item_id, session=session)
     
     if success:
         await callback.answer(f"✅ {message}", show_alert=True)
         # Refresh inventory
-        await show_inventory(callback, user, is_registered)
+        await show_inventory(callback, user, is_registered, session)
     else:
         await callback.answer(f"❌ {message}", show_alert=True)
 
 @router.callback_query(F.data.startswith("unequip_"))
-async def unequip_item(callback: CallbackQuery, user, is_registered: bool):
+async def unequip_item(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Unequip an item"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -234,17 +253,17 @@ async def unequip_item(callback: CallbackQuery, user, is_registered: bool):
     user_item_id = int(callback.data.replace("unequip_", ""))
     
     inventory_service = InventoryService()
-    success, message = await inventory_service.unequip_item(user.id, user_item_id)
+    success, message = await inventory_service.unequip_item(user.id, user_item_id, session=session)
     
     if success:
         await callback.answer(f"✅ {message}", show_alert=True)
         # Refresh inventory
-        await show_inventory(callback, user, is_registered)
+        await show_inventory(callback, user, is_registered, session)
     else:
         await callback.answer(f"❌ {message}", show_alert=True)
 
 @router.callback_query(F.data.startswith("use_item_"))
-async def use_item(callback: CallbackQuery, user, is_registered: bool):
+async def use_item(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Use a consumable item"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -253,17 +272,17 @@ async def use_item(callback: CallbackQuery, user, is_registered: bool):
     user_item_id = int(callback.data.replace("use_item_", ""))
     
     inventory_service = InventoryService()
-    success, message = await inventory_service.use_item(user.id, user_item_id)
+    success, message = await inventory_service.use_item(user.id, user_item_id, session=session)
     
     if success:
         await callback.answer(f"✅ {message}", show_alert=True)
         # Refresh inventory to show updated quantities
-        await show_inventory(callback, user, is_registered)
+        await show_inventory(callback, user, is_registered, session)
     else:
         await callback.answer(f"❌ {message}", show_alert=True)
 
 @router.callback_query(F.data.startswith("sell_item_"))
-async def sell_item(callback: CallbackQuery, user, is_registered: bool):
+async def sell_item(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Sell an item"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -272,11 +291,11 @@ async def sell_item(callback: CallbackQuery, user, is_registered: bool):
     user_item_id = int(callback.data.replace("sell_item_", ""))
     
     inventory_service = InventoryService()
-    success, message = await inventory_service.sell_item(user.id, user_item_id, 1)
+    success, message = await inventory_service.sell_item(user.id, user_item_id, 1, session=session)
     
     if success:
         await callback.answer(f"✅ {message}", show_alert=True)
         # Refresh inventory
-        await show_inventory(callback, user, is_registered)
+        await show_inventory(callback, user, is_registered, session)
     else:
         await callback.answer(f"❌ {message}", show_alert=True)
\ No newline at end of file
@@ -1,10 +1,12 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.enhanced_kingdom_war_service import EnhancedKingdomWarService
 from services.user_service import UserService
+from services.war_calendar import war_calendar, WarSlot, WAR_TIMEZONE
 from config.settings import GameConstants
-from datetime import datetime, timedelta
+from datetime import datetime
 import pytz
 import logging
 
@@ -12,7 +14,7 @@ router = Router()
 logger = logging.getLogger(__name__)
 
 @router.callback_query(F.data == "kingdom_wars")
-async def show_kingdom_wars_menu(callback: CallbackQuery, user, is_registered: bool):
+async def show_kingdom_wars_menu(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show kingdom wars main menu"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -21,25 +23,14 @@ async def show_kingdom_wars_menu(callback: CallbackQuery, user, is_registered: b
     war_service = EnhancedKingdomWarService()
     
     # Check if user is blocked due to war participation
-    is_blocked, block_message = await war_service.check_user_war_block(user.id)
+    is_blocked, block_message = await war_service.check_user_war_block(user.id, session=session)
     
-    tashkent_tz = pytz.timezone('Asia/Tashkent')
-    now = datetime.now(tashkent_tz)
-    
-    # Get next war times
-    next_wars = []
-    war_times = [8, 13, 18]
-    
-    for hour in war_times:
-        next_war = now.replace(hour=hour, minute=0, second=0, microsecond=0)
-        if next_war <= now:
-            next_war += timedelta(days=1)
-        next_wars.append(next_war)
+    now = war_calendar.now()
     
     next_war_text = "⏰ **Следующие войны:**\n"
-    for war_time in next_wars[:3]:  # Show next 3 wars
-        time_str = war_time.strftime("%H:%M")
-        if war_time.date() == now.date():
+    for slot in war_calendar.upcoming_slots(3, now):  # Show next 3 wars
+        time_str = slot.local_time.strftime("%H:%M")
+        if slot.date == now.date():
             next_war_text += f"• Сегодня в {time_str}\n"
         else:
             next_war_text += f"• Завтра в {time_str}\n"
@@ -55,6 +46,24 @@ async def show_kingdom_wars_menu(callback: CallbackQuery, user, is_registered: b
     if is_blocked:
         menu_text += f"⚠️ **{block_message}**\n\n"
     
+    # Live squads of the next war against the user's kingdom
+    live_stats = await war_service.get_live_squad_stats(user.kingdom.value, session=session)
+    if live_stats:
+        war_time = WarSlot.from_time(live_stats['scheduled_time']).local_time
+        defense = live_stats['defense_stats']
+        menu_text += (
+            f"📊 **Отряды на {war_time.strftime('%H:%M')}:**\n"
+            f"🛡️ Защитники: {defense['player_count']} "
+            f"(⚔️{defense['total_strength']} 🛡️{defense['total_armor']} ❤️{defense['total_hp']})\n"
+        )
+        for kingdom, stats in live_stats['attack_stats'].items():
+            attacker_info = GameConstants.KINGDOMS.get(kingdom, {})
+            menu_text += (
+                f"⚔️ {attacker_info.get('emoji', '🏰')} {attacker_info.get('name', kingdom)}: {stats['player_count']} "
+                f"(⚔️{stats['total_strength']} 🛡️{stats['total_armor']} ❤️{stats['total_hp']})\n"
+            )
+        menu_text += "\n"
+    
     menu_text += (
         f"**Правила войн:**\n"
         f"• Войны проходят 3 раза в день\n" 
@@ -75,7 +84,7 @@ async def show_kingdom_wars_menu(callback: CallbackQuery, user, is_registered: b
     await callback.answer()
 
 @router.callback_query(F.data == "kingdom_war_attack")
-async def show_attack_kingdoms(callback: CallbackQuery, user, is_registered: bool):
+async def show_attack_kingdoms(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show kingdoms available for attack"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -84,37 +93,25 @@ async def show_attack_kingdoms(callback: CallbackQuery, user, is_registered: boo
     war_service = EnhancedKingdomWarService()
     
     # Check if user is blocked
-    is_blocked, block_message = await war_service.check_user_war_block(user.id)
+    is_blocked, block_message = await war_service.check_user_war_block(user.id, session=session)
     if is_blocked:
         await callback.answer(block_message, show_alert=True)
         return
     
-    # Get next war times
-    tashkent_tz = pytz.timezone('Asia/Tashkent')
-    now = datetime.now(tashkent_tz)
-    war_times = [8, 13, 18]
-    
-    # Find next available war time
-    next_wars = []
-    for hour in war_times:
-        next_war = now.replace(hour=hour, minute=0, second=0, microsecond=0)
-        if next_war <= now:
-            next_war += timedelta(days=1)
-        next_wars.append(next_war)
-    
+    now = war_calendar.now()
     builder = InlineKeyboardBuilder()
     
     # Add kingdom attack buttons for each time slot
-    for war_time in next_wars[:2]:  # Show next 2 wars
-        time_str = war_time.strftime("%H:%M")
-        date_str = "сегодня" if war_time.date() == now.date() else "завтра"
+    for slot in war_calendar.upcoming_slots(2, now):  # Show next 2 wars
+        time_str = slot.local_time.strftime("%H:%M")
+        date_str = "сегодня" if slot.date == now.date() else "завтра"
         
         # Add kingdoms to attack (except user's own)
         for kingdom_key, kingdom_info in GameConstants.KINGDOMS.items():
             if kingdom_key != user.kingdom.value:
                 builder.row(InlineKeyboardButton(
                     text=f"⚔️ {kingdom_info['emoji']} {kingdom_info['name']} [{date_str} {time_str}]",
-                    callback_data=f"attack_kingdom_{kingdom_key}_{war_time.strftime('%Y%m%d_%H')}"
+                    callback_data=f"attack_kingdom_{kingdom_key}_{slot.key}"
                 ))
     
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="kingdom_wars"))
@@ -139,19 +136,14 @@ async def join_attack_squad(callback: CallbackQuery, user, is_registered: bool):
     # Parse callback data: attack_kingdom_{kingdom}_{date}_{hour}
     parts = callback.data.split("_")
     target_kingdom = parts[2]
-    date_hour = "_".join(parts[3:])  # YYYYMMDD_HH
-    
-    try:
-        war_datetime = datetime.strptime(date_hour, "%Y%m%d_%H")
-        tashkent_tz = pytz.timezone('Asia/Tashkent')
-        war_time = tashkent_tz.localize(war_datetime)
-        war_time_utc = war_time.astimezone(pytz.UTC)
-    except ValueError:
+    slot = WarSlot.from_key("_".join(parts[3:]))  # YYYYMMDD_HH
+    if not slot:
         await callback.answer("Неверный формат времени!", show_alert=True)
         return
+    war_time = slot.local_time
     
     war_service = EnhancedKingdomWarService()
-    success, message = await war_service.join_attack_squad(user.id, target_kingdom, war_time_utc)
+    success, message = await war_service.join_attack_squad(user.id, target_kingdom, slot.utc_time)
     
     if success:
         kingdom_info = GameConstants.KINGDOMS[target_kingdom]
@@ -170,7 +162,7 @@ async def join_attack_squad(callback: CallbackQuery, user, is_registered: bool):
         await callback.answer(message, show_alert=True)
 
 @router.callback_query(F.data == "kingdom_war_defend")
-async def show_defend_options(callback: CallbackQuery, user, is_registered: bool):
+async def show_defend_options(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show defense options for user's kingdom"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -179,34 +171,22 @@ async def show_defend_options(callback: CallbackQuery, user, is_registered: bool
     war_service = EnhancedKingdomWarService()
     
     # Check if user is blocked
-    is_blocked, block_message = await war_service.check_user_war_block(user.id)
+    is_blocked, block_message = await war_service.check_user_war_block(user.id, session=session)
     if is_blocked:
         await callback.answer(block_message, show_alert=True)
         return
     
-    # Get next war times
-    tashkent_tz = pytz.timezone('Asia/Tashkent')
-    now = datetime.now(tashkent_tz)
-    war_times = [8, 13, 18]
-    
-    # Find next available war times
-    next_wars = []
-    for hour in war_times:
-        next_war = now.replace(hour=hour, minute=0, second=0, microsecond=0)
-        if next_war <= now:
-            next_war += timedelta(days=1)
-        next_wars.append(next_war)
-    
+    now = war_calendar.now()
     builder = InlineKeyboardBuilder()
     
     # Add defense options for each time slot
-    for war_time in next_wars[:2]:  # Show next 2 wars
-        time_str = war_time.strftime("%H:%M")
-        date_str = "сегодня" if war_time.date() == now.date() else "завтра"
+    for slot in war_calendar.upcoming_slots(2, now):  # Show next 2 wars
+        time_str = slot.local_time.strftime("%H:%M")
+        date_str = "сегодня" if slot.date == now.date() else "завтра"
         
         builder.row(InlineKeyboardButton(
             text=f"🛡️ Защищать {date_str} в {time_str}",
-            callback_data=f"defend_kingdom_{war_time.strftime('%Y%m%d_%H')}"
+            callback_data=f"defend_kingdom_{slot.key}"
         ))
     
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="kingdom_wars"))
@@ -233,19 +213,14 @@ async def join_defense_squad(callback: CallbackQuery, user, is_registered: bool)
         return
     
     # Parse callback data: defend_kingdom_{date}_{hour}
-    date_hour = callback.data.replace("defend_kingdom_", "")
-    
-    try:
-        war_datetime = datetime.strptime(date_hour, "%Y%m%d_%H")
-        tashkent_tz = pytz.timezone('Asia/Tashkent')
-        war_time = tashkent_tz.localize(war_datetime)
-        war_time_utc = war_time.astimezone(pytz.UTC)
-    except ValueError:
+    slot = WarSlot.from_key(callback.data.replace("defend_kingdom_", ""))
+    if not slot:
         await callback.answer("Неверный формат времени!", show_alert=True)
         return
+    war_time = slot.local_time
     
     war_service = EnhancedKingdomWarService()
-    success, message = await war_service.join_defense_squad(user.id, war_time_utc)
+    success, message = await war_service.join_defense_squad(user.id, slot.utc_time)
     
     if success:
         kingdom_info = GameConstants.KINGDOMS[user.kingdom.value]
@@ -281,21 +256,60 @@ async def show_war_results_menu(callback: CallbackQuery, user, is_registered: bo
     )
     await callback.answer()
 
+# Result lines by stored war result (see WarSummaryService)
+WAR_RESULTS = {
+    'victory': ("🎉", "ПОБЕДА!"),
+    'defeat': ("❌", "Поражение"),
+    'too_late': ("⏰", "Опоздание"),
+    'defense_held': ("🛡️", "Успешная оборона!"),
+    'defense_broken': ("❌", "Оборона пробита"),
+    'no_attack': ("🕊️", "Никто не атаковал")
+}
+
+def _war_local_time(summary) -> datetime:
+    """War start (or schedule) time in Tashkent time"""
+    war_time = summary.started_at or summary.scheduled_time
+    if war_time.tzinfo is None:
+        war_time = pytz.utc.localize(war_time)
+    return war_time.astimezone(WAR_TIMEZONE)
+
 @router.callback_query(F.data == "my_war_results")
-async def show_my_war_results(callback: CallbackQuery, user, is_registered: bool):
+async def show_my_war_results(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show user's personal war results"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
-    # This would be implemented to show user's recent war participations
+    war_service = EnhancedKingdomWarService()
+    results = await war_service.summary_service.get_user_results(user.id, session=session)
+    
+    if not results:
+        text = (
+            f"📈 **Ваши результаты войн**\n\n"
+            f"У вас пока нет участий в войнах королевств.\n\n"
+            f"Запишитесь на атаку или защиту в меню 'Королевские битвы'!"
+        )
+    else:
+        text = f"📈 **Ваши результаты войн**\n\n"
+        for user_result, summary in results:
+            kingdom_info = GameConstants.KINGDOMS.get(summary.defending_kingdom, {})
+            emoji, label = WAR_RESULTS.get(user_result.result, ("❓", "Неизвестно"))
+            text += (
+                f"🗓️ {_war_local_time(summary).strftime('%d.%m %H:%M')} - "
+                f"{kingdom_info.get('emoji', '🏰')} {kingdom_info.get('name', summary.defending_kingdom)}\n"
+                f"{'⚔️ Атака' if user_result.role == 'attacker' else '🛡️ Защита'}: "
+                f"{emoji} {label}"
+            )
+            if user_result.money_gained > 0:
+                text += f", 💰 +{user_result.money_gained}"
+            elif user_result.money_lost > 0:
+                text += f", 💸 -{user_result.money_lost}"
+            if user_result.exp_gained > 0:
+                text += f", ⭐ +{user_result.exp_gained}"
+            text += "\n\n"
+    
     await callback.message.edit_text(
-        f"📈 **Ваши результаты войн**\n\n"
-        f"Эта функция будет доступна после первой войны!\n\n"
-        f"Здесь будет отображаться:\n"
-        f"• История участия в войнах\n"
-        f"• Полученные награды и потери\n"
-        f"• Статистика по атакам и защите",
+        text,
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🔙 Назад", callback_data="war_results")]
         ])
@@ -303,21 +317,31 @@ async def show_my_war_results(callback: CallbackQuery, user, is_registered: bool
     await callback.answer()
 
 @router.callback_query(F.data == "global_war_results")
-async def show_global_war_results(callback: CallbackQuery, user, is_registered: bool):
+async def show_global_war_results(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show global war results"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
-    # This would show recent global war results
+    war_service = EnhancedKingdomWarService()
+    summaries = await war_service.summary_service.get_recent_summaries(session=session)
+    
+    if not summaries:
+        text = (
+            f"🌍 **Глобальные результаты войн**\n\n"
+            f"Последние войны королевств будут отображаться здесь!"
+        )
+    else:
+        text = f"🌍 **Глобальные результаты войн**\n\n"
+        for summary in summaries:
+            text += (
+                f"🗓️ {_war_local_time(summary).strftime('%d.%m %H:%M')} · "
+                f"⚔️ {summary.attackers_count} / 🛡️ {summary.defenders_count}\n"
+                f"{summary.summary_text}\n"
+            )
+    
     await callback.message.edit_text(
-        f"🌍 **Глобальные результаты войн**\n\n"
-        f"Последние войны королевств будут отображаться здесь!\n\n"
-        f"Информация будет включать:\n"
-        f"• Результаты каждой войны\n"
-        f"• Участвующие королевства\n"
-        f"• Переданные суммы золота\n"
-        f"• Ключевые участники",
+        text,
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🔙 Назад", callback_data="war_results")]
         ])
@@ -325,7 +349,7 @@ async def show_global_war_results(callback: CallbackQuery, user, is_registered:
     await callback.answer()
 
 @router.message(F.text == "/war_result")
-async def cmd_war_result(message, user, is_registered: bool):
+async def cmd_war_result(message, user, is_registered: bool, session: AsyncSession):
     """Command to show latest war result for user"""
     if not is_registered:
         await message.reply("Сначала нужно зарегистрироваться!")
@@ -333,123 +357,59 @@ async def cmd_war_result(message, user, is_registered: bool):
     
     war_service = EnhancedKingdomWarService()
     
-    # Get user's latest war result
-    from config.database import AsyncSessionLocal
-    from models.kingdom_war import WarParticipation, KingdomWar, WarStatusEnum
-    from sqlalchemy import select, desc, and_
-    
-    async with AsyncSessionLocal() as session:
-        # Get user's latest war participation
-        latest_participation = await session.execute(
-            select(WarParticipation)
-            .join(KingdomWar)
-            .where(
-                and_(
-                    WarParticipation.user_id == user.id,
-                    KingdomWar.status == WarStatusEnum.finished
-                )
-            )
-            .order_by(desc(WarParticipation.joined_at))
-            .limit(1)
-        )
-        
-        participation = latest_participation.scalar_one_or_none()
-        
-        if not participation:
-            await message.reply(
-                f"📊 **Результат последней войны**\n\n"
-                f"У вас пока нет участий в войнах королевств.\n\n"
-                f"Чтобы принять участие:\n"
-                f"1. Перейдите в меню битв\n"
-                f"2. Выберите 'Королевские битвы'\n"
-                f"3. Запишитесь на атаку или защиту",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="🏰 Королевские битвы", callback_data="kingdom_wars")]
-                ])
-            )
-            return
-        
-        # Get war details
-        war = await session.get(KingdomWar, participation.war_id)
-        
-        if not war:
-            await message.reply("Ошибка: война не найдена.")
-            return
-        
-        # Create result message
-        from config.settings import GameConstants
-        import pytz
-        
-        war_time = war.started_at.astimezone(pytz.timezone('Asia/Tashkent'))
-        kingdom_info = GameConstants.KINGDOMS.get(participation.kingdom, {})
-        
-        result_text = (
-            f"📊 **Результат последней войны**\n\n"
-            f"🗓️ **Дата:** {war_time.strftime('%d.%m.%Y в %H:%M')}\n"
-            f"🏰 **Ваше королевство:** {kingdom_info.get('emoji', '🏰')} {kingdom_info.get('name', participation.kingdom)}\n"
-            f"⚔️ **Роль:** {'Атакующий' if participation.role == 'attacker' else 'Защитник'}\n\n"
-        )
-        
-        # War outcome
-        battle_results = war.get_battle_results()
-        if battle_results:
-            if participation.role == 'attacker':
-                # Find result for this user's kingdom
-                user_result = None
-                for result in battle_results:
-                    if result.get('attacker') == participation.kingdom:
-                        user_result = result
-                        break
-                
-                if user_result:
-                    if user_result['result'] == 'victory':
-                        result_text += "🎉 **Результат:** ПОБЕДА!\n"
-                    elif user_result['result'] == 'defeat':
-                        result_text += "❌ **Результат:** Поражение\n"
-                    else:
-                        result_text += "⏰ **Результат:** Опоздание\n"
-                else:
-                    result_text += "❓ **Результат:** Неизвестно\n"
-            else:
-                # Defender - check if defense held
-                defending_kingdom = war.defending_kingdom
-                total_damage = 0
-                for result in battle_results:
-                    total_damage += result.get('damage', 0)
-                
-                defense_hp = sum([war.get_defense_stats().get('hp', 0)])
-                if total_damage >= defense_hp:
-                    result_text += "❌ **Результат:** Оборона пробита\n"
-                else:
-                    result_text += "🛡️ **Результат:** Успешная оборона!\n"
-        else:
-            result_text += "🕊️ **Результат:** Никто не атаковал\n"
-        
-        # Personal rewards/losses
-        if participation.money_gained > 0:
-            result_text += f"💰 **Получено золота:** +{participation.money_gained}\n"
-        elif participation.money_lost > 0:
-            result_text += f"💸 **Потеряно золота:** -{participation.money_lost}\n"
-        
-        if participation.exp_gained > 0:
-            result_text += f"⭐ **Получено опыта:** +{participation.exp_gained}\n"
-        
-        # Player stats at time of war
-        player_stats = participation.get_player_stats()
-        if player_stats:
-            result_text += (
-                f"\n**Ваши характеристики в войне:**\n"
-                f"💪 Сила: {player_stats.get('strength', 0)}\n"
-                f"🛡️ Броня: {player_stats.get('armor', 0)}\n"
-                f"❤️ Здоровье: {player_stats.get('hp', 0)}\n"
-                f"⚡ Ловкость: {player_stats.get('agility', 0)}\n"
-                f"🔮 Мана: {player_stats.get('mana', 0)}"
-            )
-        
+    # Latest finished war of the user, written when the war completed
+    latest = await war_service.summary_service.get_user_result(user.id, session=session)
+    
+    if not latest:
         await message.reply(
-            result_text,
+            f"📊 **Результат последней войны**\n\n"
+            f"У вас пока нет участий в войнах королевств.\n\n"
+            f"Чтобы принять участие:\n"
+            f"1. Перейдите в меню битв\n"
+            f"2. Выберите 'Королевские битвы'\n"
+            f"3. Запишитесь на атаку или защиту",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="🏰 Королевские битвы", callback_data="kingdom_wars")],
-                [InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")]
+                [InlineKeyboardButton(text="🏰 Королевские битвы", callback_data="kingdom_wars")]
             ])
-        )
\ No newline at end of file
+        )
+        return
+    
+    user_result, summary = latest
+    kingdom_info = GameConstants.KINGDOMS.get(user_result.kingdom, {})
+    emoji, label = WAR_RESULTS.get(user_result.result, ("❓", "Неизвестно"))
+    
+    result_text = (
+        f"📊 **Результат последней войны**\n\n"
+        f"🗓️ **Дата:** {_war_local_time(summary).strftime('%d.%m.%Y в %H:%M')}\n"
+        f"🏰 **Ваше королевство:** {kingdom_info.get('emoji', '🏰')} {kingdom_info.get('name', user_result.kingdom)}\n"
+        f"⚔️ **Роль:** {'Атакующий' if user_result.role == 'attacker' else 'Защитник'}\n\n"
+        f"{emoji} **Результат:** {label}\n"
+    )
+    
+    # Personal rewards/losses
+    if user_result.money_gained > 0:
+        result_text += f"💰 **Получено золота:** +{user_result.money_gained}\n"
+    elif user_result.money_lost > 0:
+        result_text += f"💸 **Потеряно золота:** -{user_result.money_lost}\n"
+    
+    if user_result.exp_gained > 0:
+        result_text += f"⭐ **Получено опыта:** +{user_result.exp_gained}\n"
+    
+    # Player stats at time of war
+    player_stats = user_result.get_player_stats()
+    result_text += (
+        f"\n**Ваши характеристики в войне:**\n"
+        f"💪 Сила: {player_stats['strength']}\n"
+        f"🛡️ Броня: {player_stats['armor']}\n"
+        f"❤️ Здоровье: {player_stats['hp']}\n"
+        f"⚡ Ловкость: {player_stats['agility']}\n"
+        f"🔮 Мана: {player_stats['mana']}"
+    )
+    
+    await message.reply(
+        result_text,
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="🏰 Королевские битвы", callback_data="kingdom_wars")],
+            [InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")]
+        ])
+    )
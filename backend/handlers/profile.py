@@ -29,11 +29,11 @@ async def show_profile(callback: CallbackQuery, user, is_registered: bool):
         f"⚡ Опыт: <b>{user.experience}/{exp_needed}</b>\n\n"
         
         f"💪 <b>Характеристики:</b>\n"
-        f"⚔️ Сила: <b>{user.strength}</b>\n"
-        f"🛡️ Броня: <b>{user.armor}</b>\n"
-        f"❤️ Здоровье: <b>{user.current_hp}/{user.hp}</b>\n"
-        f"💨 Проворность: <b>{user.agility}</b>\n"
-        f"🔮 Мана: <b>{user.current_mana}/{user.mana}</b>\n\n"
+        f"⚔️ Сила: <b>{user.effective_strength}</b>\n"
+        f"🛡️ Броня: <b>{user.effective_armor}</b>\n"
+        f"❤️ Здоровье: <b>{user.current_hp}/{user.max_hp}</b>\n"
+        f"💨 Проворность: <b>{user.effective_agility}</b>\n"
+        f"🔮 Мана: <b>{user.current_mana}/{user.max_mana}</b>\n\n"
         
         f"💰 <b>Ресурсы:</b>\n"
         f"🪙 Деньги: <b>{user.money}</b> золота\n"
@@ -63,28 +63,33 @@ async def view_detailed_stats(callback: CallbackQuery, user, is_registered: bool
         return
     
     # Calculate derived stats
-    crit_chance = min(user.agility / 200.0, 0.3) * 100
-    dodge_chance = min(user.agility / 300.0, 0.2) * 100
+    crit_chance = min(user.effective_agility / 200.0, 0.3) * 100
+    dodge_chance = min(user.effective_agility / 300.0, 0.2) * 100
     
     stats_text = (
         f"📊 <b>Подробная статистика</b>\n\n"
         f"💪 <b>Базовые характеристики:</b>\n"
-        f"⚔️ Сила: <b>{user.strength}</b>\n"
-        f"   └ Урон в бою: <b>+{user.strength}</b>\n"
-        f"🛡️ Броня: <b>{user.armor}</b>\n"
-        f"   └ Поглощение урона: <b>{int(user.armor * 0.8)}</b>\n"
-        f"❤️ Здоровье: <b>{user.hp}</b>\n"
-        f"   └ Текущее: <b>{user.current_hp}/{user.hp}</b>\n"
-        f"💨 Проворность: <b>{user.agility}</b>\n"
+        f"⚔️ Сила: <b>{user.effective_strength}</b>\n"
+        f"   └ Урон в бою: <b>+{user.effective_strength}</b>\n"
+        f"   └ Снаряжение: <b>+{user.bonus_strength or 0}</b>\n"
+        f"🛡️ Броня: <b>{user.effective_armor}</b>\n"
+        f"   └ Поглощение урона: <b>{int(user.effective_armor * 0.8)}</b>\n"
+        f"   └ Снаряжение: <b>+{user.bonus_armor or 0}</b>\n"
+        f"❤️ Здоровье: <b>{user.max_hp}</b>\n"
+        f"   └ Текущее: <b>{user.current_hp}/{user.max_hp}</b>\n"
+        f"   └ Снаряжение: <b>+{user.bonus_hp or 0}</b>\n"
+        f"💨 Проворность: <b>{user.effective_agility}</b>\n"
         f"   └ Шанс крита: <b>{crit_chance:.1f}%</b>\n"
         f"   └ Шанс уклонения: <b>{dodge_chance:.1f}%</b>\n"
-        f"🔮 Мана: <b>{user.mana}</b>\n"
-        f"   └ Текущая: <b>{user.current_mana}/{user.mana}</b>\n\n"
+        f"   └ Снаряжение: <b>+{user.bonus_agility or 0}</b>\n"
+        f"🔮 Мана: <b>{user.max_mana}</b>\n"
+        f"   └ Текущая: <b>{user.current_mana}/{user.max_mana}</b>\n"
+        f"   └ Снаряжение: <b>+{user.bonus_mana or 0}</b>\n\n"
         
         f"📈 <b>Производные характеристики:</b>\n"
         f"⚡ Общая сила: <b>{user.total_stats}</b>\n"
-        f"🎯 Базовый урон: <b>{user.strength + int(user.agility * 0.5)}</b>\n"
-        f"🛡️ Физическая защита: <b>{int(user.armor * 0.8)}</b>\n"
+        f"🎯 Базовый урон: <b>{user.effective_strength + int(user.effective_agility * 0.5)}</b>\n"
+        f"🛡️ Физическая защита: <b>{int(user.effective_armor * 0.8)}</b>\n"
     )
     
     if user.free_stat_points > 0:
@@ -1,21 +1,23 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.shop_service import ShopService
+from services.user_service import UserService
 from models.item import ItemTypeEnum
 import math
 
 router = Router()
 
 @router.callback_query(F.data == "shop_menu")
-async def show_shop_menu(callback: CallbackQuery, user, is_registered: bool):
+async def show_shop_menu(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show shop main menu"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
         return
     
     shop_service = ShopService()
-    categories = await shop_service.get_shop_categories()
+    categories = await shop_service.get_shop_categories(session=session)
     
     builder = InlineKeyboardBuilder()
     
@@ -52,7 +54,7 @@ async def show_shop_menu(callback: CallbackQuery, user, is_registered: bool):
     await callback.answer()
 
 @router.callback_query(F.data.startswith("shop_category_"))
-async def show_shop_category(callback: CallbackQuery, user, is_registered: bool):
+async def show_shop_category(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Show items in category"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -64,7 +66,7 @@ async def show_shop_category(callback: CallbackQuery, user, is_registered: bool)
     page = int(parts[3])
     
     shop_service = ShopService()
-    items = await shop_service.get_shop_items(category, page, 6)
+    items, has_next_page = await shop_service.get_shop_page(category, page, 6, session=session)
     
     if not items:
         await callback.answer("В этой категории нет товаров!", show_alert=True)
@@ -135,9 +137,7 @@ async def show_shop_category(callback: CallbackQuery, user, is_registered: bool)
             callback_data=f"shop_category_{category}_{page-1}"
         ))
     
-    # Check if there are more items
-    more_items = await shop_service.get_shop_items(category, page + 1, 6)
-    if more_items:
+    if has_next_page:
         nav_buttons.append(InlineKeyboardButton(
             text="➡️ Далее",
             callback_data=f"shop_category_{category}_{page+1}"
@@ -157,7 +157,7 @@ async def show_shop_category(callback: CallbackQuery, user, is_registered: bool)
     await callback.answer()
 
 @router.callback_query(F.data.startswith("buy_item_"))
-async def buy_item(callback: CallbackQuery, user, is_registered: bool):
+async def buy_item(callback: CallbackQuery, user, is_registered: bool, session: AsyncSession):
     """Buy an item"""
     if not is_registered:
         await callback.answer("Сначала нужно зарегистрироваться!")
@@ -166,12 +166,13 @@ async def buy_item(callback: CallbackQuery, user, is_registered: bool):
     item_id = int(callback.data.replace("buy_item_", ""))
     
     shop_service = ShopService()
-    success, message = await shop_service.buy_item(user.id, item_id, 1)
+    success, message = await shop_service.buy_item(user.id, item_id, 1, session=session)
     
     if success:
         await callback.answer(f"✅ {message}", show_alert=True)
         # Refresh the user money display
-        await show_shop_menu(callback, user, is_registered)
+        user = await UserService().get_user(user.id, session=session)
+        await show_shop_menu(callback, user, is_registered, session)
     else:
         await callback.answer(f"❌ {message}", show_alert=True)
 
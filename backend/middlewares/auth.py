@@ -2,6 +2,7 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
 from services.user_service import UserService
+from services.activity_buffer import activity_buffer
 
 class AuthMiddleware(BaseMiddleware):
     def __init__(self, user_service: UserService):
@@ -16,16 +17,17 @@ class AuthMiddleware(BaseMiddleware):
         # Get user_id from event
         if isinstance(event, (Message, CallbackQuery)):
             user_id = event.from_user.id
+            session = data.get('session')
             
             # Get user from database
-            user = await self.user_service.get_user(user_id)
+            user = await self.user_service.get_user(user_id, session=session)
             
             # Add user data to handler context
             data['user'] = user
             data['is_registered'] = user is not None
             
-            # Update last active timestamp if user exists
+            # Update last active timestamp if user exists (batched write-behind)
             if user:
-                await self.user_service.update_last_active(user_id)
+                activity_buffer.touch(user_id)
         
         return await handler(event, data)
\ No newline at end of file
@@ -0,0 +1,51 @@
+from typing import Callable, Dict, Any, Awaitable, Optional
+from contextvars import ContextVar
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import AsyncSessionLocal
+
+# Session of the update being handled, for the request middleware below
+_request_session: ContextVar[Optional[AsyncSession]] = ContextVar('request_session', default=None)
+
+async def commit_request_session():
+    """Commit what the services flushed so far during the current update"""
+    session = _request_session.get()
+    if session is not None and session.info.pop('has_writes', False):
+        await session.commit()
+
+class DatabaseSessionMiddleware(BaseMiddleware):
+    """One unit of work per update, shared by middlewares, handlers and services"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # The session connects lazily, so updates that never query stay off SQLite
+        async with AsyncSessionLocal() as session:
+            data['session'] = session
+            token = _request_session.set(session)
+            try:
+                result = await handler(event, data)
+                
+                # Commit for whatever was flushed after the last reply
+                await commit_request_session()
+            finally:
+                _request_session.reset(token)
+            
+            return result
+
+class CommitBeforeSendMiddleware(BaseRequestMiddleware):
+    """Commit the update's writes before each Telegram API call.
+    
+    A flush takes SQLite's write lock and keeps it until commit. Without this
+    the lock would be held across every edit_text/answer round-trip, stalling
+    the activity buffer, battle snapshots and wars on busy_timeout.
+    """
+    
+    async def __call__(self, make_request, bot, method):
+        await commit_request_session()
+        return await make_request(bot, method)
\ No newline at end of file
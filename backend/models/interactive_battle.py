@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Boolean, Index, event
 from sqlalchemy.sql import func
 from config.database import Base
+from datetime import datetime
 import enum
 import json
 
@@ -18,6 +19,9 @@ class BattlePhaseEnum(enum.Enum):
 
 class InteractiveBattle(Base):
     __tablename__ = "interactive_battles"
+    __table_args__ = (
+        Index("ix_interactive_battles_phase_round_start", "phase", "round_start_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     mode = Column(Enum(BattleModeEnum), nullable=False)
@@ -49,8 +53,8 @@ class InteractiveBattle(Base):
     round_start_time = Column(DateTime(timezone=True), nullable=True)
     round_timeout = Column(Integer, default=50)  # seconds
     
-    # Battle log
-    battle_log = Column(Text, default="[]")  # JSON array
+    # Battle log, entries live in battle_log_entries
+    log_size = Column(Integer, default=0)
     
     # Results
     winner_id = Column(Integer, ForeignKey('users.id'), nullable=True)
@@ -88,18 +92,20 @@ class InteractiveBattle(Base):
         self.monster_data = json.dumps(monster_dict)
         self.monster_hp = monster.hp
     
-    def get_battle_log(self):
-        """Parse battle log from JSON"""
-        try:
-            return json.loads(self.battle_log) if self.battle_log else []
-        except:
-            return []
+    @property
+    def pending_log_entries(self):
+        """Log entries not yet written to battle_log_entries"""
+        return self.__dict__.setdefault('_pending_log_entries', [])
+    
+    @property
+    def skill_loadouts(self):
+        """Players' skill loadouts by user id, kept while the battle is live"""
+        return self.__dict__.setdefault('_skill_loadouts', {})
     
     def add_to_battle_log(self, entry):
-        """Add entry to battle log"""
-        log = self.get_battle_log()
-        log.append(entry)
-        self.battle_log = json.dumps(log)
+        """Add entry to battle log, it is inserted on the next flush"""
+        self.log_size = (self.log_size or 0) + 1
+        self.pending_log_entries.append((self.log_size, entry))
     
     def reset_round_choices(self):
         """Reset choices for new round"""
@@ -107,7 +113,8 @@ class InteractiveBattle(Base):
         self.player1_dodge_choice = None
         self.player2_attack_choice = None
         self.player2_dodge_choice = None
-        self.round_start_time = func.now()
+        # A Python value stays readable on live battles kept between sessions
+        self.round_start_time = datetime.utcnow()
     
     def both_players_ready(self):
         """Check if both players have made their choices"""
@@ -118,4 +125,41 @@ class InteractiveBattle(Base):
             return (self.player1_attack_choice is not None and 
                     self.player1_dodge_choice is not None and
                     self.player2_attack_choice is not None and 
-                    self.player2_dodge_choice is not None)
\ No newline at end of file
+                    self.player2_dodge_choice is not None)
+
+class BattleLogEntry(Base):
+    __tablename__ = "battle_log_entries"
+    __table_args__ = (
+        Index("ix_battle_log_entries_battle_seq", "battle_id", "seq"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    battle_id = Column(Integer, ForeignKey('interactive_battles.id'), nullable=False)
+    seq = Column(Integer, nullable=False)  # 1-based position in the battle log
+    entry = Column(Text, nullable=False)  # JSON object
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<BattleLogEntry(battle_id={self.battle_id}, seq={self.seq})>"
+    
+    def get_entry(self):
+        """Parse entry from JSON"""
+        try:
+            return json.loads(self.entry) if self.entry else {}
+        except:
+            return {}
+
+@event.listens_for(InteractiveBattle, "after_insert")
+@event.listens_for(InteractiveBattle, "after_update")
+def _write_pending_log_entries(mapper, connection, battle):
+    """Append queued log entries in the same flush as the battle row"""
+    entries = battle.__dict__.pop('_pending_log_entries', None)
+    if entries:
+        connection.execute(
+            BattleLogEntry.__table__.insert(),
+            [
+                {'battle_id': battle.id, 'seq': seq, 'entry': json.dumps(entry)}
+                for seq, entry in entries
+            ]
+        )
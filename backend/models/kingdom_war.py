@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, Boolean, Float, Index
 from sqlalchemy.sql import func
 from config.database import Base
 import enum
@@ -10,12 +10,24 @@ class WarStatusEnum(enum.Enum):
     active = "active"
     finished = "finished"
 
+class WarStageEnum(enum.Enum):
+    """Last completed stage of the war pipeline"""
+    pending = "pending"
+    enrolled = "enrolled"
+    battles = "battles"
+    settled = "settled"
+    rewarded = "rewarded"
+    finished = "finished"
+
 class WarTypeEnum(enum.Enum):
     kingdom_attack = "kingdom_attack"
     siege = "siege"
 
 class KingdomWar(Base):
     __tablename__ = "kingdom_wars"
+    __table_args__ = (
+        Index("ix_kingdom_wars_status_scheduled", "status", "scheduled_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     war_type = Column(Enum(WarTypeEnum), default=WarTypeEnum.kingdom_attack)
@@ -26,14 +38,9 @@ class KingdomWar(Base):
     started_at = Column(DateTime(timezone=True), nullable=True)
     finished_at = Column(DateTime(timezone=True), nullable=True)
     
-    # Participating kingdoms
-    attacking_kingdoms = Column(Text, default="[]")  # JSON array of kingdom names
+    # Defending kingdom, attackers and squads are WarParticipation rows
     defending_kingdom = Column(String(20), nullable=False)
     
-    # Battle data
-    attack_squads = Column(Text, default="{}")  # JSON dict: kingdom -> [player_ids]
-    defense_squad = Column(Text, default="[]")  # JSON array of player_ids
-    
     # Stats
     total_attack_stats = Column(Text, default="{}")  # JSON dict: kingdom -> stats
     defense_stats = Column(Text, default="{}")  # JSON dict with defense stats
@@ -43,6 +50,11 @@ class KingdomWar(Base):
     battle_results = Column(Text, default="[]")  # JSON array of battle results
     money_transferred = Column(Text, default="{}")  # JSON dict: kingdom -> amount
     exp_distributed = Column(Text, default="{}")  # JSON dict: player_id -> exp
+    participants_restored = Column(Boolean, default=False)  # HP/MP restored after the war
+    
+    # Pipeline checkpoint, cursor is the progress inside the next stage
+    pipeline_stage = Column(Enum(WarStageEnum), default=WarStageEnum.pending)
+    pipeline_cursor = Column(Integer, default=0)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -50,39 +62,6 @@ class KingdomWar(Base):
     def __repr__(self):
         return f"<KingdomWar(id={self.id}, defending={self.defending_kingdom}, status={self.status})>"
     
-    def get_attacking_kingdoms(self):
-        """Parse attacking kingdoms from JSON"""
-        try:
-            return json.loads(self.attacking_kingdoms) if self.attacking_kingdoms else []
-        except:
-            return []
-    
-    def set_attacking_kingdoms(self, kingdoms):
-        """Set attacking kingdoms as JSON"""
-        self.attacking_kingdoms = json.dumps(kingdoms)
-    
-    def get_attack_squads(self):
-        """Parse attack squads from JSON"""
-        try:
-            return json.loads(self.attack_squads) if self.attack_squads else {}
-        except:
-            return {}
-    
-    def set_attack_squads(self, squads):
-        """Set attack squads as JSON"""
-        self.attack_squads = json.dumps(squads)
-    
-    def get_defense_squad(self):
-        """Parse defense squad from JSON"""
-        try:
-            return json.loads(self.defense_squad) if self.defense_squad else []
-        except:
-            return []
-    
-    def set_defense_squad(self, squad):
-        """Set defense squad as JSON"""
-        self.defense_squad = json.dumps(squad)
-    
     def get_total_attack_stats(self):
         """Parse total attack stats from JSON"""
         try:
@@ -142,6 +121,9 @@ class KingdomWar(Base):
 
 class WarParticipation(Base):
     __tablename__ = "war_participations"
+    __table_args__ = (
+        Index("ix_war_participations_war_user", "war_id", "user_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     war_id = Column(Integer, nullable=False)
@@ -150,7 +132,15 @@ class WarParticipation(Base):
     role = Column(Enum(enum.Enum('Role', ['attacker', 'defender'])), nullable=False)
     
     # Player stats at time of war
-    player_stats = Column(Text, default="{}")  # JSON with player stats
+    stat_strength = Column(Integer, default=0)
+    stat_armor = Column(Integer, default=0)
+    stat_hp = Column(Integer, default=0)
+    stat_agility = Column(Integer, default=0)
+    stat_mana = Column(Integer, default=0)
+    stat_level = Column(Integer, default=1)
+    
+    # Online player enrolled into defense at war start
+    is_auto_defender = Column(Boolean, default=False)
     
     # Results
     money_gained = Column(Integer, default=0)
@@ -164,12 +154,139 @@ class WarParticipation(Base):
         return f"<WarParticipation(war_id={self.war_id}, user_id={self.user_id}, role={self.role})>"
     
     def get_player_stats(self):
-        """Parse player stats from JSON"""
-        try:
-            return json.loads(self.player_stats) if self.player_stats else {}
-        except:
-            return {}
+        """Player stats snapshot as a dict"""
+        return {
+            'strength': self.stat_strength or 0,
+            'armor': self.stat_armor or 0,
+            'hp': self.stat_hp or 0,
+            'agility': self.stat_agility or 0,
+            'mana': self.stat_mana or 0,
+            'level': self.stat_level or 1
+        }
     
     def set_player_stats(self, stats):
-        """Set player stats as JSON"""
-        self.player_stats = json.dumps(stats)
\ No newline at end of file
+        """Set player stats snapshot from a dict"""
+        self.stat_strength = stats.get('strength', 0)
+        self.stat_armor = stats.get('armor', 0)
+        self.stat_hp = stats.get('hp', 0)
+        self.stat_agility = stats.get('agility', 0)
+        self.stat_mana = stats.get('mana', 0)
+        self.stat_level = stats.get('level', 1)
+
+class WarSquadStats(Base):
+    """Running totals of one squad (war, kingdom, role), updated on every join"""
+    __tablename__ = "war_squad_stats"
+    __table_args__ = (
+        Index("ix_war_squad_stats_war_kingdom_role", "war_id", "kingdom", "role", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    war_id = Column(Integer, nullable=False)
+    kingdom = Column(String(20), nullable=False)
+    role = Column(String(10), nullable=False)  # attacker / defender
+    
+    player_count = Column(Integer, default=0)
+    auto_defenders = Column(Integer, default=0)
+    total_strength = Column(Integer, default=0)
+    total_armor = Column(Integer, default=0)
+    total_hp = Column(Integer, default=0)
+    total_agility = Column(Integer, default=0)
+    total_mana = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<WarSquadStats(war_id={self.war_id}, kingdom={self.kingdom}, role={self.role}, players={self.player_count})>"
+    
+    def get_stats(self):
+        """Totals in the kingdom stats format used by KingdomWar"""
+        return {
+            'total_strength': self.total_strength,
+            'total_armor': self.total_armor,
+            'total_hp': self.total_hp,
+            'total_agility': self.total_agility,
+            'total_mana': self.total_mana,
+            'player_count': self.player_count
+        }
+
+class WarSummary(Base):
+    """Outcome of a finished war, written once at completion"""
+    __tablename__ = "war_summaries"
+    __table_args__ = (
+        Index("ix_war_summaries_war", "war_id", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    war_id = Column(Integer, nullable=False)
+    defending_kingdom = Column(String(20), nullable=False)
+    scheduled_time = Column(DateTime(timezone=True))
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    
+    outcome = Column(String(20), nullable=False)  # no_attack / held / broken
+    defense_buff = Column(Float, default=1.0)
+    attackers_count = Column(Integer, default=0)
+    defenders_count = Column(Integer, default=0)
+    total_money_taken = Column(Integer, default=0)
+    
+    summary_text = Column(Text)  # Channel post
+    
+    def __repr__(self):
+        return f"<WarSummary(war_id={self.war_id}, defending={self.defending_kingdom}, outcome={self.outcome})>"
+
+class WarKingdomResult(Base):
+    """Per-kingdom totals of a finished war"""
+    __tablename__ = "war_kingdom_results"
+    __table_args__ = (
+        Index("ix_war_kingdom_results_war_kingdom", "war_id", "kingdom", "role"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    war_id = Column(Integer, nullable=False)
+    kingdom = Column(String(20), nullable=False)
+    role = Column(String(10), nullable=False)  # attacker / defender
+    result = Column(String(20), nullable=False)  # victory / defeat / too_late / defense_held / defense_broken / no_attack
+    
+    player_count = Column(Integer, default=0)
+    damage_dealt = Column(Float, default=0)
+    money = Column(Integer, default=0)  # Gained by attackers, taken from defenders
+    exp_gained = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<WarKingdomResult(war_id={self.war_id}, kingdom={self.kingdom}, result={self.result})>"
+
+class WarUserResult(Base):
+    """Per-player result of a finished war"""
+    __tablename__ = "war_user_results"
+    __table_args__ = (
+        Index("ix_war_user_results_user_war", "user_id", "war_id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    war_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    kingdom = Column(String(20), nullable=False)
+    role = Column(String(10), nullable=False)
+    result = Column(String(20), nullable=False)
+    
+    money_gained = Column(Integer, default=0)
+    money_lost = Column(Integer, default=0)
+    exp_gained = Column(Integer, default=0)
+    
+    # Player stats at time of war
+    stat_strength = Column(Integer, default=0)
+    stat_armor = Column(Integer, default=0)
+    stat_hp = Column(Integer, default=0)
+    stat_agility = Column(Integer, default=0)
+    stat_mana = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<WarUserResult(war_id={self.war_id}, user_id={self.user_id}, result={self.result})>"
+    
+    def get_player_stats(self):
+        """Player stats snapshot as a dict"""
+        return {
+            'strength': self.stat_strength or 0,
+            'armor': self.stat_armor or 0,
+            'hp': self.stat_hp or 0,
+            'agility': self.stat_agility or 0,
+            'mana': self.stat_mana or 0
+        }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum, Index
 from sqlalchemy.sql import func
 from config.database import Base
 import enum
@@ -15,6 +15,10 @@ class KingdomEnum(enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_kingdom_last_active", "kingdom", "last_active"),
+        Index("ix_users_kingdom_level_active", "kingdom", "level", "is_active"),
+    )
     
     # Primary key - Telegram ID
     id = Column(Integer, primary_key=True, index=True)
@@ -42,6 +46,13 @@ class User(Base):
     mana = Column(Integer, default=50)
     current_mana = Column(Integer, default=50)
     
+    # Equipment bonuses, recalculated on equip/unequip
+    bonus_strength = Column(Integer, default=0)
+    bonus_armor = Column(Integer, default=0)
+    bonus_hp = Column(Integer, default=0)
+    bonus_agility = Column(Integer, default=0)
+    bonus_mana = Column(Integer, default=0)
+    
     # Additional fields
     inventory_size = Column(Integer, default=20)
     
@@ -60,17 +71,45 @@ class User(Base):
     def __repr__(self):
         return f"<User(id={self.id}, name='{self.name}', level={self.level})>"
     
+    @property
+    def effective_strength(self):
+        """Strength including equipment bonus"""
+        return self.strength + (self.bonus_strength or 0)
+    
+    @property
+    def effective_armor(self):
+        """Armor including equipment bonus"""
+        return self.armor + (self.bonus_armor or 0)
+    
+    @property
+    def effective_agility(self):
+        """Agility including equipment bonus"""
+        return self.agility + (self.bonus_agility or 0)
+    
     @property
     def max_hp(self):
         """Calculate max HP including bonuses"""
-        return self.hp
+        return self.hp + (self.bonus_hp or 0)
     
     @property
     def max_mana(self):
         """Calculate max mana including bonuses"""
-        return self.mana
+        return self.mana + (self.bonus_mana or 0)
+    
+    @property
+    def effective_stats(self):
+        """Stats used in battle formulas and war snapshots"""
+        return {
+            'strength': self.effective_strength,
+            'armor': self.effective_armor,
+            'hp': self.max_hp,
+            'agility': self.effective_agility,
+            'mana': self.max_mana,
+            'level': self.level
+        }
     
     @property
     def total_stats(self):
         """Calculate total stats"""
-        return self.strength + self.armor + self.agility + (self.hp // 10) + (self.mana // 5)
\ No newline at end of file
+        return (self.effective_strength + self.effective_armor + self.effective_agility +
+                (self.max_hp // 10) + (self.max_mana // 5))
\ No newline at end of file
@@ -0,0 +1,87 @@
+from sqlalchemy import update, bindparam
+from config.database import engine
+from config.settings import settings
+from models.user import User
+from datetime import datetime
+from typing import Dict, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ActivityBuffer:
+    """Write-behind buffer for User.last_active.
+    
+    Keeps the latest activity timestamp per user in memory and writes them
+    all with a single executemany UPDATE every flush interval.
+    """
+    
+    def __init__(self, flush_interval: int = None):
+        self.flush_interval = flush_interval or settings.ACTIVITY_FLUSH_INTERVAL
+        self._pending: Dict[int, datetime] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+    
+    def touch(self, user_id: int):
+        """Record activity for user (no I/O)"""
+        self._pending[user_id] = datetime.utcnow()
+    
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+    
+    async def flush(self) -> int:
+        """Write buffered timestamps to the database, returns rows written"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            
+            pending, self._pending = self._pending, {}
+            rows = [{'b_user_id': user_id, 'b_last_active': ts} for user_id, ts in pending.items()]
+            
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        update(User.__table__)
+                        .where(User.__table__.c.id == bindparam('b_user_id'))
+                        .values(last_active=bindparam('b_last_active')),
+                        rows
+                    )
+            except BaseException:
+                # Keep entries for the next attempt unless the user was active again meanwhile,
+                # also when stop() cancels the flush loop mid-write
+                for user_id, ts in pending.items():
+                    self._pending.setdefault(user_id, ts)
+                raise
+            
+            logger.debug(f"Flushed last_active for {len(rows)} users")
+            return len(rows)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing activity buffer: {e}")
+    
+    def start(self):
+        """Start periodic flushing"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Activity buffer started (flush every {self.flush_interval}s)")
+    
+    async def stop(self):
+        """Stop periodic flushing and write whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing activity buffer on shutdown: {e}")
+        logger.info("Activity buffer stopped")
+
+# Global activity buffer instance
+activity_buffer = ActivityBuffer()
@@ -0,0 +1,67 @@
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import session_scope
+from models.interactive_battle import BattleLogEntry
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BattleLogService:
+    """Paged reads of battle_log_entries"""
+    
+    def __init__(self):
+        pass
+    
+    async def get_last_entries(self, battle_id: int, count: int = 1,
+                               session: Optional[AsyncSession] = None) -> List[dict]:
+        """Last entries of the battle log, oldest first"""
+        async with session_scope(session) as session:
+            result = await session.scalars(
+                select(BattleLogEntry).where(
+                    BattleLogEntry.battle_id == battle_id
+                ).order_by(BattleLogEntry.seq.desc(), BattleLogEntry.id.desc()).limit(count)
+            )
+            return [entry.get_entry() for entry in reversed(result.all())]
+    
+    async def get_last_round(self, battle_id: int,
+                             session: Optional[AsyncSession] = None) -> Optional[dict]:
+        """Last round entry, skipping a trailing result entry"""
+        # A round is followed by at most one result entry
+        entries = await self.get_last_entries(battle_id, 2, session=session)
+        if not entries:
+            return None
+        
+        rounds = [entry for entry in entries if 'events' in entry]
+        return rounds[-1] if rounds else entries[-1]
+    
+    async def get_log_page(self, battle_id: int, page: int = 1, per_page: int = 5,
+                           session: Optional[AsyncSession] = None) -> Tuple[List[dict], int]:
+        """Page of the battle log and total page count"""
+        async with session_scope(session) as session:
+            total = await session.scalar(
+                select(func.count(BattleLogEntry.id)).where(
+                    BattleLogEntry.battle_id == battle_id
+                )
+            )
+            
+            result = await session.scalars(
+                select(BattleLogEntry).where(
+                    BattleLogEntry.battle_id == battle_id
+                ).order_by(BattleLogEntry.seq, BattleLogEntry.id)
+                .offset((page - 1) * per_page).limit(per_page)
+            )
+            
+            total_pages = max(1, (total + per_page - 1) // per_page)
+            return [entry.get_entry() for entry in result], total_pages
+    
+    async def count_rounds_with_skills(self, battle_id: int,
+                                       session: Optional[AsyncSession] = None) -> int:
+        """Number of rounds in which skills were auto-cast"""
+        async with session_scope(session) as session:
+            return await session.scalar(
+                select(func.count(BattleLogEntry.id)).where(
+                    BattleLogEntry.battle_id == battle_id,
+                    func.json_array_length(BattleLogEntry.entry, '$.skills_used') > 0
+                )
+            ) or 0
@@ -0,0 +1,333 @@
+from sqlalchemy import select
+from config.database import AsyncSessionLocal
+from config.settings import settings
+from models.battle import Battle, BattleTypeEnum, BattleStatusEnum
+from models.user import User
+from utils.formulas import GameFormulas
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Fighter(NamedTuple):
+    """What the turn simulation needs of a participant"""
+    id: int
+    name: str
+    hp: int
+    stats: dict
+
+def fighter_snapshot(user: User) -> Fighter:
+    return Fighter(id=user.id, name=user.name, hp=user.current_hp, stats=user.effective_stats)
+
+def simulate_battle(challenger: Fighter, defender: Fighter, max_turns: int = 50) -> dict:
+    """Simulate an auto-resolved PvP battle, touches no session so it can run in an executor"""
+    battle_log = []
+    turn = 1
+    challenger_hp = challenger.hp
+    defender_hp = defender.hp
+    
+    while turn <= max_turns and challenger_hp > 0 and defender_hp > 0:
+        # Determine who attacks first based on agility
+        if challenger.stats['agility'] >= defender.stats['agility']:
+            attacker, defender_target = challenger, defender
+        else:
+            attacker, defender_target = defender, challenger
+        
+        attacker_stats = attacker.stats
+        defender_stats = defender_target.stats
+        
+        # Check for dodge
+        if GameFormulas.is_dodge(defender_stats['agility']):
+            battle_log.append({
+                'turn': turn,
+                'attacker': attacker.name,
+                'action': 'attack',
+                'result': 'dodged',
+                'damage': 0
+            })
+        else:
+            damage = GameFormulas.calculate_damage(attacker_stats, defender_stats)
+            
+            # Check for critical hit
+            if GameFormulas.is_critical_hit(attacker_stats['agility']):
+                damage = int(damage * 1.5)
+                result = 'critical'
+            else:
+                result = 'hit'
+            
+            # Apply damage
+            if attacker is challenger:
+                defender_hp = max(0, defender_hp - damage)
+            else:
+                challenger_hp = max(0, challenger_hp - damage)
+            
+            battle_log.append({
+                'turn': turn,
+                'attacker': attacker.name,
+                'action': 'attack',
+                'result': result,
+                'damage': damage,
+                'challenger_hp': challenger_hp,
+                'defender_hp': defender_hp
+            })
+        
+        turn += 1
+    
+    # Determine winner, on timeout higher HP wins
+    if challenger_hp <= 0:
+        winner, loser = defender, challenger
+    elif defender_hp <= 0:
+        winner, loser = challenger, defender
+    elif challenger_hp > defender_hp:
+        winner, loser = challenger, defender
+    else:
+        winner, loser = defender, challenger
+    
+    reward_keys = ('strength', 'armor', 'agility', 'hp', 'mana')
+    rewards = GameFormulas.calculate_battle_rewards(
+        {key: winner.stats[key] for key in reward_keys},
+        {key: loser.stats[key] for key in reward_keys}
+    )
+    
+    return {
+        'winner_id': winner.id,
+        'winner_name': winner.name,
+        'loser_id': loser.id,
+        'total_turns': turn - 1,
+        'log': battle_log,
+        'experience': rewards['experience'],
+        'money': rewards['money']
+    }
+
+class BattleQueue:
+    """Resolution queue for auto-resolved PvP battles.
+    
+    Accepted battles wait in a bounded queue; submit() refuses new ones once
+    it is full so callers can turn the challenge down instead of piling up
+    tasks. A fixed number of workers load the participants, run the turn
+    simulation in a thread pool off the event loop and hand the result to a
+    committer that writes finished battles in batches of BATTLE_COMMIT_BATCH_SIZE
+    or every BATTLE_COMMIT_INTERVAL. Battles still active at shutdown are
+    queued again by rebuild().
+    """
+    
+    def __init__(self, workers: int = None, max_size: int = None,
+                 batch_size: int = None, batch_interval: float = None):
+        self.workers = workers or settings.BATTLE_QUEUE_WORKERS
+        self.max_size = max_size or settings.BATTLE_QUEUE_SIZE
+        self.batch_size = batch_size or settings.BATTLE_COMMIT_BATCH_SIZE
+        self.batch_interval = batch_interval or settings.BATTLE_COMMIT_INTERVAL
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_size)
+        self._results: Dict[int, Optional[dict]] = {}
+        self._batch_ready = asyncio.Event()
+        self._commit_lock = asyncio.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.resolved = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.batches = 0
+        self._simulation_time = 0.0
+    
+    def __len__(self) -> int:
+        return self._queue.qsize()
+    
+    def full(self) -> bool:
+        return self._queue.full()
+    
+    def submit(self, battle_id: int) -> bool:
+        """Queue an accepted battle, False when the queue is full"""
+        try:
+            self._queue.put_nowait(battle_id)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Battle queue full ({self.max_size}), battle {battle_id} refused")
+            return False
+        self.submitted += 1
+        return True
+    
+    def stats(self) -> dict:
+        """Queue depth and throughput counters"""
+        simulated = self.resolved + self.cancelled
+        return {
+            'queued': self._queue.qsize(),
+            'max_size': self.max_size,
+            'in_flight': self._in_flight,
+            'pending_commit': len(self._results),
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'resolved': self.resolved,
+            'cancelled': self.cancelled,
+            'failed': self.failed,
+            'batches': self.batches,
+            'avg_simulation_ms': self._simulation_time * 1000 / simulated if simulated else 0.0
+        }
+    
+    async def rebuild(self) -> int:
+        """Queue battles left active by the last shutdown, call after start()"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Battle.id).where(
+                    Battle.battle_type == BattleTypeEnum.pvp,
+                    Battle.status == BattleStatusEnum.active
+                ).order_by(Battle.id)
+            )
+            battle_ids = result.scalars().all()
+        
+        # Waits for free slots rather than refusing, workers are already running
+        for battle_id in battle_ids:
+            await self._queue.put(battle_id)
+            self.submitted += 1
+        
+        logger.info(f"Battle queue rebuilt: {len(battle_ids)} active battles")
+        return len(battle_ids)
+    
+    async def _load(self, battle_id: int):
+        async with AsyncSessionLocal() as session:
+            battle = await session.get(Battle, battle_id)
+            if not battle or battle.status != BattleStatusEnum.active:
+                return None
+            
+            result = await session.execute(
+                select(User).where(User.id.in_((battle.challenger_id, battle.defender_id)))
+            )
+            users = {user.id: user for user in result.scalars()}
+        
+        challenger = users.get(battle.challenger_id)
+        defender = users.get(battle.defender_id)
+        if not challenger or not defender:
+            return ()
+        return fighter_snapshot(challenger), fighter_snapshot(defender)
+    
+    async def _resolve(self, battle_id: int):
+        fighters = await self._load(battle_id)
+        if fighters is None:
+            return
+        
+        result = None
+        if fighters:
+            started = time.perf_counter()
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, simulate_battle, *fighters, settings.MAX_BATTLE_TURNS
+            )
+            self._simulation_time += time.perf_counter() - started
+        
+        # None cancels the battle, a participant is gone
+        self._results[battle_id] = result
+        if len(self._results) >= self.batch_size:
+            self._batch_ready.set()
+    
+    async def _worker(self):
+        while True:
+            battle_id = await self._queue.get()
+            self._in_flight += 1
+            try:
+                await self._resolve(battle_id)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error resolving battle {battle_id}: {e}")
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+    
+    async def commit(self) -> int:
+        """Write resolved battles in one transaction, returns battles written"""
+        async with self._commit_lock:
+            if not self._results:
+                return 0
+            
+            results, self._results = self._results, {}
+            try:
+                async with AsyncSessionLocal() as session:
+                    battles = (await session.execute(
+                        select(Battle).where(Battle.id.in_(results))
+                    )).scalars().all()
+                    user_ids = {battle.challenger_id for battle in battles} | {battle.defender_id for battle in battles}
+                    users = {user.id: user for user in (await session.execute(
+                        select(User).where(User.id.in_(user_ids))
+                    )).scalars()}
+                    
+                    finished, cancelled = [], 0
+                    for battle in battles:
+                        if battle.status != BattleStatusEnum.active:
+                            continue
+                        result = results[battle.id]
+                        battle.finished_at = datetime.utcnow()
+                        if result is None or result['winner_id'] not in users or result['loser_id'] not in users:
+                            battle.status = BattleStatusEnum.cancelled
+                            cancelled += 1
+                            continue
+                        
+                        winner, loser = users[result['winner_id']], users[result['loser_id']]
+                        battle.winner_id = winner.id
+                        battle.total_turns = result['total_turns']
+                        battle.set_damage_log(result['log'])
+                        battle.status = BattleStatusEnum.finished
+                        battle.exp_gained = result['experience']
+                        battle.money_gained = result['money']
+                        
+                        winner.experience += result['experience']
+                        winner.money += result['money']
+                        winner.pvp_wins += 1
+                        loser.pvp_losses += 1
+                        finished.append((battle.id, result['winner_name']))
+                    
+                    await session.commit()
+            except Exception:
+                # Keep results for the next attempt
+                for battle_id, result in results.items():
+                    self._results.setdefault(battle_id, result)
+                raise
+            
+            self.batches += 1
+            self.resolved += len(finished)
+            self.cancelled += cancelled
+            for battle_id, winner_name in finished:
+                logger.info(f"Battle {battle_id} finished. Winner: {winner_name}")
+            return len(finished) + cancelled
+    
+    async def _run_commits(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.batch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            try:
+                await self.commit()
+            except Exception as e:
+                logger.error(f"Error committing resolved battles: {e}")
+    
+    def start(self):
+        """Start the workers and the batch committer"""
+        if self._tasks:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="battle-sim")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._run_commits()))
+        logger.info(f"Battle queue started ({self.workers} workers, up to {self.max_size} queued)")
+    
+    async def stop(self):
+        """Stop the workers and write resolved battles, queued ones are rebuilt on the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        try:
+            await self.commit()
+        except Exception as e:
+            logger.error(f"Error committing resolved battles on shutdown: {e}")
+        logger.info(f"Battle queue stopped: {self.stats()}")
+
+# Global battle queue instance
+battle_queue = BattleQueue()
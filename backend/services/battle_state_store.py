@@ -0,0 +1,188 @@
+from sqlalchemy import update, bindparam
+from config.database import AsyncSessionLocal, engine
+from config.settings import settings
+from models.interactive_battle import InteractiveBattle, BattlePhaseEnum
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns that change between round resolutions
+SNAPSHOT_COLUMNS = (
+    'phase',
+    'player1_attack_choice',
+    'player1_dodge_choice',
+    'player2_attack_choice',
+    'player2_dodge_choice'
+)
+
+class BattleStateStore:
+    """Live interactive battles, keyed by battle id.
+    
+    Battles are kept as detached InteractiveBattle instances. Attack and dodge
+    choices only change the in-memory battle; the row is written when a round
+    resolves or the battle ends, and by a periodic snapshot of battles with
+    unsaved choices so a restart resumes mid-round. Changes to a battle are
+    made under its lock, PvP players pressing buttons at once are serialized.
+    """
+    
+    def __init__(self, snapshot_interval: int = None, idle_ttl: int = None):
+        self.snapshot_interval = snapshot_interval or settings.BATTLE_SNAPSHOT_INTERVAL
+        self.idle_ttl = idle_ttl or settings.BATTLE_STATE_IDLE_TTL
+        self._battles: Dict[int, InteractiveBattle] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._touched: Dict[int, float] = {}
+        self._dirty: Set[int] = set()
+        self._snapshot_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+    
+    def __contains__(self, battle_id: int) -> bool:
+        return battle_id in self._battles
+    
+    def __len__(self) -> int:
+        return len(self._battles)
+    
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+    
+    def lock(self, battle_id: int) -> asyncio.Lock:
+        lock = self._locks.get(battle_id)
+        if lock is None:
+            lock = self._locks[battle_id] = asyncio.Lock()
+        return lock
+    
+    async def get(self, battle_id: int) -> Optional[InteractiveBattle]:
+        """Live battle, loaded from the database on first use"""
+        battle = self._battles.get(battle_id)
+        if battle is None:
+            async with AsyncSessionLocal() as session:
+                battle = await session.get(InteractiveBattle, battle_id)
+            if battle is None:
+                return None
+            # Finished battles are read-only, no need to keep them
+            if battle.phase == BattlePhaseEnum.finished:
+                return battle
+            # A concurrent first load may have won, everyone must share one instance
+            battle = self._battles.setdefault(battle_id, battle)
+        
+        self._touched[battle_id] = time.monotonic()
+        return battle
+    
+    def add(self, battle: InteractiveBattle):
+        """Keep a newly committed battle"""
+        self._battles[battle.id] = battle
+        self._touched[battle.id] = time.monotonic()
+    
+    def mark_dirty(self, battle: InteractiveBattle):
+        """Record an in-memory change, written by the next snapshot"""
+        self._dirty.add(battle.id)
+    
+    def discard(self, battle_id: int):
+        """Forget a battle, the next get() reloads it"""
+        self._battles.pop(battle_id, None)
+        self._touched.pop(battle_id, None)
+        self._dirty.discard(battle_id)
+        # A held lock is still guarding the battle, idle cleanup drops it later
+        lock = self._locks.get(battle_id)
+        if lock is not None and not lock.locked():
+            del self._locks[battle_id]
+    
+    @asynccontextmanager
+    async def persist(self, battle: InteractiveBattle):
+        """Session that writes the battle on exit, for round resolution and battle end"""
+        async with AsyncSessionLocal() as session:
+            session.add(battle)
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                # The live battle may be half-updated, reload the committed state next time
+                self.discard(battle.id)
+                raise
+        
+        self._dirty.discard(battle.id)
+        if battle.phase == BattlePhaseEnum.finished:
+            self.discard(battle.id)
+    
+    async def snapshot(self) -> int:
+        """Write unsaved choices of live battles, returns rows written"""
+        async with self._snapshot_lock:
+            self._evict_idle()
+            if not self._dirty:
+                return 0
+            
+            dirty, self._dirty = self._dirty, set()
+            rows = []
+            for battle_id in dirty:
+                battle = self._battles.get(battle_id)
+                if battle is None:
+                    continue
+                row = {f"b_{column}": getattr(battle, column) for column in SNAPSHOT_COLUMNS}
+                row['b_id'] = battle_id
+                row['b_log_size'] = battle.log_size or 0
+                rows.append(row)
+            
+            if rows:
+                table = InteractiveBattle.__table__
+                try:
+                    # A round resolved since these values were read has already written a newer state
+                    async with engine.begin() as conn:
+                        await conn.execute(
+                            update(table).where(
+                                table.c.id == bindparam('b_id'),
+                                table.c.log_size == bindparam('b_log_size')
+                            ).values({column: bindparam(f"b_{column}") for column in SNAPSHOT_COLUMNS}),
+                            rows
+                        )
+                except BaseException:
+                    # Also when stop() cancels the snapshot loop mid-write
+                    self._dirty.update(row['b_id'] for row in rows)
+                    raise
+            
+            logger.debug(f"Snapshot of {len(rows)} live battles")
+            return len(rows)
+    
+    def _evict_idle(self):
+        """Drop battles nobody touched for idle_ttl, they are reloaded if resumed"""
+        cutoff = time.monotonic() - self.idle_ttl
+        for battle_id in [battle_id for battle_id, touched in self._touched.items() if touched < cutoff]:
+            if battle_id in self._dirty or self.lock(battle_id).locked():
+                continue
+            self.discard(battle_id)
+        
+        for battle_id in [battle_id for battle_id, lock in self._locks.items()
+                          if battle_id not in self._battles and not lock.locked()]:
+            del self._locks[battle_id]
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.error(f"Error writing battle snapshot: {e}")
+    
+    def start(self):
+        """Start periodic snapshots"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Battle state store started (snapshot every {self.snapshot_interval}s)")
+    
+    async def stop(self):
+        """Stop periodic snapshots and write unsaved choices"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.snapshot()
+        except Exception as e:
+            logger.error(f"Error writing battle snapshot on shutdown: {e}")
+        logger.info("Battle state store stopped")
+
+# Global battle state store instance
+battle_state_store = BattleStateStore()
@@ -4,7 +4,10 @@ from config.database import AsyncSessionLocal
 from models.interactive_battle import InteractiveBattle, BattleModeEnum, BattlePhaseEnum
 from models.monster import Monster
 from models.user import User
-from models.skill import UserSkill, SkillTypeEnum
+from models.skill import SkillTypeEnum
+from services.battle_state_store import battle_state_store
+from services.round_timer import round_timer
+from services.skill_loadout import get_loadouts, flush_skill_usage
 from utils.formulas import GameFormulas
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Tuple, List
@@ -25,7 +28,7 @@ class EnhancedBattleService:
             if not player:
                 return None
             
-            if player.current_hp < player.hp * 0.3:
+            if player.current_hp < player.max_hp * 0.3:
                 return None
             
             # Generate random monster
@@ -45,6 +48,7 @@ class EnhancedBattleService:
             await session.commit()
             await session.refresh(battle)
             
+            battle_state_store.add(battle)
             logger.info(f"Enhanced PvE encounter: Player {player_id} vs {monster.name}")
             return battle
     
@@ -53,62 +57,68 @@ class EnhancedBattleService:
         Attempt to flee from battle with chance calculation
         Returns: (success, message, damage_taken)
         """
-        async with AsyncSessionLocal() as session:
-            battle = await session.get(InteractiveBattle, battle_id)
+        async with battle_state_store.lock(battle_id):
+            battle = await battle_state_store.get(battle_id)
             if not battle or battle.player1_id != player_id:
                 return False, "Битва не найдена", 0
             
-            player = await session.get(User, battle.player1_id)
-            monster_data = battle.get_monster_data()
+            async with battle_state_store.persist(battle) as session:
+                result = await self._attempt_flee(battle, session)
             
-            # Calculate flee chance based on agility and level difference
-            level_diff = player.level - monster_data['level']
-            base_chance = 0.6  # 60% base chance
-            agility_bonus = (player.agility - 10) * 0.02  # 2% per agility point above 10
-            level_bonus = level_diff * 0.05  # 5% per level difference
+            round_timer.arm(battle, self.check_round_timeout)
+            return result
+    
+    async def _attempt_flee(self, battle: InteractiveBattle, session: AsyncSession) -> Tuple[bool, str, int]:
+        """Flee roll, both outcomes are written with the battle"""
+        player = await session.get(User, battle.player1_id)
+        monster_data = battle.get_monster_data()
+        
+        # Calculate flee chance based on agility and level difference
+        level_diff = player.level - monster_data['level']
+        base_chance = 0.6  # 60% base chance
+        agility_bonus = (player.effective_agility - 10) * 0.02  # 2% per agility point above 10
+        level_bonus = level_diff * 0.05  # 5% per level difference
+        
+        flee_chance = max(0.1, min(0.9, base_chance + agility_bonus + level_bonus))
+        
+        if random.random() < flee_chance:
+            # Successful flee
+            battle.phase = BattlePhaseEnum.finished
+            battle.finished_at = datetime.utcnow()
+            battle.add_to_battle_log({
+                'round': battle.current_round,
+                'action': 'flee_success',
+                'player': 'player1',
+                'message': f'Успешный побег! (Шанс: {flee_chance:.1%})'
+            })
             
-            flee_chance = max(0.1, min(0.9, base_chance + agility_bonus + level_bonus))
+            return True, f"🏃‍♂️ Успешный побег! (Шанс был {flee_chance:.1%})", 0
+        
+        else:
+            # Failed flee - monster gets one free attack
+            monster_damage = self._calculate_monster_attack(monster_data, player)
             
-            if random.random() < flee_chance:
-                # Successful flee
-                battle.phase = BattlePhaseEnum.finished
-                battle.finished_at = datetime.utcnow()
-                battle.add_to_battle_log({
-                    'round': battle.current_round,
-                    'action': 'flee_success',
-                    'player': 'player1',
-                    'message': f'Успешный побег! (Шанс: {flee_chance:.1%})'
-                })
-                
-                await session.commit()
-                return True, f"🏃‍♂️ Успешный побег! (Шанс был {flee_chance:.1%})", 0
+            battle.player1_hp = max(0, battle.player1_hp - monster_damage)
+            player.current_hp = battle.player1_hp
             
-            else:
-                # Failed flee - monster gets one free attack
-                monster_damage = self._calculate_monster_attack(monster_data, player)
-                
-                battle.player1_hp = max(0, battle.player1_hp - monster_damage)
-                player.current_hp = battle.player1_hp
-                
-                battle.add_to_battle_log({
-                    'round': battle.current_round,
-                    'action': 'flee_failed',
-                    'player': 'player1',
-                    'damage_taken': monster_damage,
-                    'message': f'Неудачный побег! Монстр нанёс {monster_damage} урона'
-                })
-                
-                # Can't flee again from this monster
-                battle.phase = BattlePhaseEnum.attack_selection
-                battle.reset_round_choices()
-                
-                await session.commit()
-                return False, f"❌ Побег не удался! Монстр нанёс {monster_damage} урона. Больше нельзя убежать от этого врага!", monster_damage
+            battle.add_to_battle_log({
+                'round': battle.current_round,
+                'action': 'flee_failed',
+                'player': 'player1',
+                'damage_taken': monster_damage,
+                'message': f'Неудачный побег! Монстр нанёс {monster_damage} урона'
+            })
+            
+            # Can't flee again from this monster
+            battle.phase = BattlePhaseEnum.attack_selection
+            battle.reset_round_choices()
+            
+            return False, f"❌ Побег не удался! Монстр нанёс {monster_damage} урона. Больше нельзя убежать от этого врага!", monster_damage
     
     def _calculate_monster_attack(self, monster_data: dict, player: User) -> int:
         """Calculate monster's free attack damage"""
         base_damage = monster_data['strength'] + int(monster_data['agility'] * 0.5)
-        defense = int(player.armor * 0.8)
+        defense = int(player.effective_armor * 0.8)
         return max(base_damage - defense, int(base_damage * 0.1))
     
     async def make_attack_choice(self, battle_id: int, player_id: int, attack_type: str) -> bool:
@@ -118,8 +128,8 @@ class EnhancedBattleService:
         - power: мощный удар (higher damage, lower accuracy)
         - normal: обычная атака (balanced)
         """
-        async with AsyncSessionLocal() as session:
-            battle = await session.get(InteractiveBattle, battle_id)
+        async with battle_state_store.lock(battle_id):
+            battle = await battle_state_store.get(battle_id)
             if not battle or battle.phase != BattlePhaseEnum.attack_selection:
                 return False
             
@@ -133,17 +143,22 @@ class EnhancedBattleService:
             else:
                 return False
             
-            # For PvE, auto-proceed to direction selection
+            # For PvE, auto-proceed to direction selection, with its own time limit
             if battle.mode == BattleModeEnum.pve_interactive:
                 battle.phase = BattlePhaseEnum.dodge_selection
+                round_timer.arm(
+                    battle, self.check_round_timeout,
+                    datetime.utcnow() + timedelta(seconds=battle.round_timeout or 50)
+                )
             
-            await session.commit()
+            # Choices stay in memory until the round resolves
+            battle_state_store.mark_dirty(battle)
             return True
     
     async def make_direction_choice(self, battle_id: int, player_id: int, direction: str) -> bool:
         """Make direction choice for dodge"""
-        async with AsyncSessionLocal() as session:
-            battle = await session.get(InteractiveBattle, battle_id)
+        async with battle_state_store.lock(battle_id):
+            battle = await battle_state_store.get(battle_id)
             if not battle or battle.phase != BattlePhaseEnum.dodge_selection:
                 return False
             
@@ -157,11 +172,15 @@ class EnhancedBattleService:
             else:
                 return False
             
-            # Check if ready to calculate
+            # Check if ready to calculate, the resolved round is written with the battle
             if battle.both_players_ready():
-                await self._calculate_enhanced_round(battle, session)
+                async with battle_state_store.persist(battle) as session:
+                    await self._calculate_enhanced_round(battle, session)
+                # Next round's deadline, or none once the battle is over
+                round_timer.arm(battle, self.check_round_timeout)
+            else:
+                battle_state_store.mark_dirty(battle)
             
-            await session.commit()
             return True
     
     async def _calculate_enhanced_round(self, battle: InteractiveBattle, session: AsyncSession):
@@ -172,6 +191,10 @@ class EnhancedBattleService:
         
         if battle.mode == BattleModeEnum.pve_interactive:
             await self._calculate_enhanced_pve_round(battle, player, session)
+        
+        # Cast counters are written once, with the finished battle
+        if battle.phase == BattlePhaseEnum.finished:
+            await flush_skill_usage(battle, session)
     
     async def _calculate_enhanced_pve_round(self, battle: InteractiveBattle, player: User, session: AsyncSession):
         """Enhanced PvE round with skills and improved mechanics"""
@@ -263,24 +286,16 @@ class EnhancedBattleService:
     
     async def _auto_cast_skills(self, player: User, battle: InteractiveBattle, session: AsyncSession) -> List[dict]:
         """Auto-cast skills based on priority system"""
-        # Get player's skills
-        user_skills_result = await session.execute(
-            select(UserSkill).where(UserSkill.user_id == player.id)
-        )
-        user_skills = user_skills_result.scalars().all()
+        # Player's skills, loaded once per battle in priority order (heal > buff > debuff > defense > attack)
+        loadout = (await get_loadouts(battle, [player.id], session))[player.id]
         
-        if not user_skills:
+        if not loadout:
             return []
         
         skills_used = []
         current_mana = battle.player1_mana
         
-        # Sort skills by priority (heal > buff > debuff > defense > attack)
-        sorted_skills = sorted(user_skills, key=lambda x: x.skill.priority)
-        
-        for user_skill in sorted_skills:
-            skill = user_skill.skill
-            
+        for skill in loadout.skills:
             # Check if skill can be used
             if current_mana < skill.mana_cost:
                 continue
@@ -288,7 +303,7 @@ class EnhancedBattleService:
             # Check skill conditions
             should_use = False
             
-            if skill.skill_type == SkillTypeEnum.heal and battle.player1_hp < player.hp * 0.5:
+            if skill.skill_type == SkillTypeEnum.heal and battle.player1_hp < player.max_hp * 0.5:
                 should_use = True
             elif skill.skill_type == SkillTypeEnum.buff and battle.current_round <= 2:
                 should_use = True
@@ -304,7 +319,7 @@ class EnhancedBattleService:
                 if skill.skill_type == SkillTypeEnum.heal:
                     heal_amount = skill.heal_amount
                     old_hp = battle.player1_hp
-                    battle.player1_hp = min(battle.player1_hp + heal_amount, player.hp)
+                    battle.player1_hp = min(battle.player1_hp + heal_amount, player.max_hp)
                     actual_heal = battle.player1_hp - old_hp
                     
                     skills_used.append({
@@ -321,8 +336,7 @@ class EnhancedBattleService:
                     })
                 
                 # Update usage stats
-                user_skill.times_used += 1
-                user_skill.last_used = datetime.utcnow()
+                loadout.record_use(skill)
         
         return skills_used
     
@@ -346,7 +360,7 @@ class EnhancedBattleService:
         
         if direction_hit and random.random() < hit_chance:
             # Direct hit
-            base_damage = player.strength + int(player.agility * 0.5)
+            base_damage = player.effective_strength + int(player.effective_agility * 0.5)
             
             # Apply attack type modifiers
             if attack_type == 'power':
@@ -358,7 +372,7 @@ class EnhancedBattleService:
             damage = max(base_damage - defense, int(base_damage * 0.1))
             
             # Check for critical hit (enhanced chance for precise attacks)
-            crit_chance = GameFormulas.critical_hit_chance(player.agility)
+            crit_chance = GameFormulas.critical_hit_chance(player.effective_agility)
             if attack_type == 'precise':
                 crit_chance *= 1.5  # 50% higher crit chance for precise attacks
             
@@ -368,10 +382,10 @@ class EnhancedBattleService:
             
             result['damage'] = damage
             result['events'].append(f"⚔️ {attack_type.title()} удар нанёс {damage} урона")
-            
+        
         else:
             # Missed, but check for glancing hit
-            if GameFormulas.is_critical_hit(player.agility) and random.random() < 0.15:
+            if GameFormulas.is_critical_hit(player.effective_agility) and random.random() < 0.15:
                 result['damage'] = 2
                 result['events'].append("✨ Промах, но мастерство позволило нанести 2 урона!")
             else:
@@ -388,11 +402,11 @@ class EnhancedBattleService:
         
         # Monster hit, calculate damage
         base_damage = monster_data['strength'] + int(monster_data['agility'] * 0.5)
-        defense = int(player.armor * 0.8)
+        defense = int(player.effective_armor * 0.8)
         damage = max(base_damage - defense, int(base_damage * 0.1))
         
         # Check for perfect dodge (very low chance)
-        perfect_dodge_chance = min(player.agility / 500.0, 0.07)  # Max 7%
+        perfect_dodge_chance = min(player.effective_agility / 500.0, 0.07)  # Max 7%
         if random.random() < perfect_dodge_chance:
             return 0  # Perfect dodge
         
@@ -425,9 +439,20 @@ class EnhancedBattleService:
         # Add experience
         from services.user_service import UserService
         user_service = UserService()
-        await user_service.add_experience(player.id, battle.exp_gained)
+        await user_service.add_experience(player.id, battle.exp_gained, session=session)
+    
+    async def check_round_timeout(self, battle_id: int) -> bool:
+        """Pick for a player who let the phase time out: normal attack, then block"""
+        battle = await battle_state_store.get(battle_id)
+        if not battle:
+            return False
+        
+        if battle.phase == BattlePhaseEnum.attack_selection:
+            return await self.make_attack_choice(battle_id, battle.player1_id, 'normal')
+        if battle.phase == BattlePhaseEnum.dodge_selection:
+            return await self.make_direction_choice(battle_id, battle.player1_id, 'center')
+        return False
     
     async def get_battle(self, battle_id: int) -> Optional[InteractiveBattle]:
         """Get battle by ID"""
-        async with AsyncSessionLocal() as session:
-            return await session.get(InteractiveBattle, battle_id)
\ No newline at end of file
+        return await battle_state_store.get(battle_id)
\ No newline at end of file
@@ -1,10 +1,16 @@
-from sqlalchemy import select, and_, func, update
+from sqlalchemy import select, insert, and_, func, update, case, cast, literal, true, Integer
 from sqlalchemy.ext.asyncio import AsyncSession
-from config.database import AsyncSessionLocal
+from config.database import AsyncSessionLocal, session_scope, commit_session
 from config.settings import settings
-from models.kingdom_war import KingdomWar, WarParticipation, WarStatusEnum, WarTypeEnum
+from models.kingdom_war import KingdomWar, WarParticipation, WarStatusEnum, WarStageEnum, WarTypeEnum
 from models.user import User, KingdomEnum
 from services.user_service import UserService
+from services.war_squad_service import WarSquadService
+from services.war_summary_service import WarSummaryService
+from services.activity_buffer import activity_buffer
+from services.user_cache import invalidate_after_commit
+from services.war_registry import war_registry
+from services.war_calendar import war_calendar, WarSlot
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 import logging
@@ -13,45 +19,45 @@ import json
 
 logger = logging.getLogger(__name__)
 
+WAR_BLOCK_MESSAGE = "Вы заявлены на участие в Атаке Королевств. Дождитесь окончания битвы."
+
 class EnhancedKingdomWarService:
     def __init__(self):
         self.user_service = UserService()
+        self.squad_service = WarSquadService()
+        self.summary_service = WarSummaryService()
         self.tashkent_tz = pytz.timezone('Asia/Tashkent')
-        self.war_times = [8, 13, 18]
         self.war_channel_id = settings.WAR_CHANNEL_ID
     
     async def schedule_daily_wars(self, date: datetime):
         """Schedule wars with 30-minute advance notifications"""
+        slots = war_calendar.slots_for_date(date.date())
+        
         async with AsyncSessionLocal() as session:
-            for hour in self.war_times:
-                # Create war time in Tashkent timezone
-                war_time = self.tashkent_tz.localize(
-                    datetime.combine(date.date(), datetime.min.time().replace(hour=hour))
-                )
-                
-                # Convert to UTC for storage
-                war_time_utc = war_time.astimezone(pytz.UTC)
-                
+            for slot in slots:
                 # Check if war already scheduled
                 existing = await session.scalar(
-                    select(KingdomWar).where(
-                        KingdomWar.scheduled_time == war_time_utc,
-                        KingdomWar.status == WarStatusEnum.scheduled
-                    )
+                    select(KingdomWar.id).where(
+                        KingdomWar.status == WarStatusEnum.scheduled,
+                        KingdomWar.scheduled_time == slot.utc_time
+                    ).limit(1)
                 )
                 
                 if not existing:
                     # Create wars for each kingdom as potential defender
                     for kingdom in KingdomEnum:
                         war = KingdomWar(
-                            scheduled_time=war_time_utc,
+                            scheduled_time=slot.utc_time,
                             defending_kingdom=kingdom.value,
                             status=WarStatusEnum.scheduled
                         )
                         session.add(war)
             
             await session.commit()
-            logger.info(f"Scheduled enhanced wars for {date.date()}")
+        
+        for slot in slots:
+            war_calendar.forget(slot)
+        logger.info(f"Scheduled enhanced wars for {date.date()}")
     
     async def join_attack_squad(self, user_id: int, target_kingdom: str, war_time: datetime) -> Tuple[bool, str]:
         """Join attack squad with action blocking"""
@@ -68,39 +74,13 @@ class EnhancedKingdomWarService:
                 return False, "Вы уже заявлены на участие в войне королевств!"
             
             # Find the war
-            war = await session.scalar(
-                select(KingdomWar).where(
-                    and_(
-                        KingdomWar.defending_kingdom == target_kingdom,
-                        KingdomWar.scheduled_time == war_time,
-                        KingdomWar.status == WarStatusEnum.scheduled
-                    )
-                )
-            )
+            war = await self._get_slot_war(war_time, target_kingdom, session)
             
             if not war:
                 return False, "Война не найдена"
             
-            # Block user from other actions
-            await self._set_user_war_mode(user_id, war.id, 'attacker', session)
-            
-            # Add to attack squad
-            attack_squads = war.get_attack_squads()
+            # The participation record is the squad membership
             user_kingdom = user.kingdom.value
-            
-            if user_kingdom not in attack_squads:
-                attack_squads[user_kingdom] = []
-            
-            attack_squads[user_kingdom].append(user_id)
-            war.set_attack_squads(attack_squads)
-            
-            # Add attacking kingdom to list
-            attacking_kingdoms = war.get_attacking_kingdoms()
-            if user_kingdom not in attacking_kingdoms:
-                attacking_kingdoms.append(user_kingdom)
-                war.set_attacking_kingdoms(attacking_kingdoms)
-            
-            # Create participation record
             participation = WarParticipation(
                 war_id=war.id,
                 user_id=user_id,
@@ -109,19 +89,17 @@ class EnhancedKingdomWarService:
             )
             
             # Store player stats
-            player_stats = {
-                'strength': user.strength,
-                'armor': user.armor,
-                'hp': user.hp,
-                'agility': user.agility,
-                'mana': user.mana,
-                'level': user.level
-            }
-            participation.set_player_stats(player_stats)
+            participation.set_player_stats(user.effective_stats)
             
             session.add(participation)
+            await self.squad_service.add_member_to_stats(
+                war.id, user_kingdom, 'attacker', user.effective_stats, session
+            )
             await session.commit()
             
+            # Block user from other actions
+            self._set_user_war_mode(user_id, war.id)
+            
             logger.info(f"User {user_id} joined enhanced attack on {target_kingdom}")
             return True, f"Вы заявлены на атаку {target_kingdom}! Дождитесь начала войны. Другие действия заблокированы."
     
@@ -137,28 +115,12 @@ class EnhancedKingdomWarService:
                 return False, "Вы уже заявлены на участие в войне королевств!"
             
             # Find the war for user's kingdom
-            war = await session.scalar(
-                select(KingdomWar).where(
-                    and_(
-                        KingdomWar.defending_kingdom == user.kingdom.value,
-                        KingdomWar.scheduled_time == war_time,
-                        KingdomWar.status == WarStatusEnum.scheduled
-                    )
-                )
-            )
+            war = await self._get_slot_war(war_time, user.kingdom.value, session)
             
             if not war:
                 return False, "Война не найдена"
             
-            # Block user from other actions
-            await self._set_user_war_mode(user_id, war.id, 'defender', session)
-            
-            # Add to defense squad
-            defense_squad = war.get_defense_squad()
-            defense_squad.append(user_id)
-            war.set_defense_squad(defense_squad)
-            
-            # Create participation record
+            # The participation record is the squad membership
             participation = WarParticipation(
                 war_id=war.id,
                 user_id=user_id,
@@ -167,27 +129,34 @@ class EnhancedKingdomWarService:
             )
             
             # Store player stats
-            player_stats = {
-                'strength': user.strength,
-                'armor': user.armor,
-                'hp': user.hp,
-                'agility': user.agility,
-                'mana': user.mana,
-                'level': user.level
-            }
-            participation.set_player_stats(player_stats)
+            participation.set_player_stats(user.effective_stats)
             
             session.add(participation)
+            await self.squad_service.add_member_to_stats(
+                war.id, user.kingdom.value, 'defender', user.effective_stats, session
+            )
             await session.commit()
             
+            # Block user from other actions
+            self._set_user_war_mode(user_id, war.id)
+            
             logger.info(f"User {user_id} joined enhanced defense of {user.kingdom.value}")
             return True, "Вы заявлены на защиту королевства! Дождитесь начала войны. Другие действия заблокированы."
     
-    async def _set_user_war_mode(self, user_id: int, war_id: int, role: str, session: AsyncSession):
+    async def _get_slot_war(self, war_time: datetime, defending_kingdom: str, session: AsyncSession) -> Optional[KingdomWar]:
+        """Scheduled war against a kingdom at a war time"""
+        war_id = await war_calendar.get_war_id(WarSlot.from_time(war_time), defending_kingdom, session)
+        if war_id is None:
+            return None
+        
+        war = await session.get(KingdomWar, war_id)
+        if not war or war.status != WarStatusEnum.scheduled:
+            return None
+        return war
+    
+    def _set_user_war_mode(self, user_id: int, war_id: int):
         """Set user in war mode (block other actions)"""
-        # This could be implemented as a separate table or user field
-        # For now, we'll use the participation record as the indicator
-        pass
+        war_registry.lock(user_id, war_id)
     
     async def _is_user_in_war_mode(self, user_id: int, session: AsyncSession) -> bool:
         """Check if user is currently in war mode"""
@@ -206,32 +175,59 @@ class EnhancedKingdomWarService:
         )
         return result is not None
     
-    async def check_user_war_block(self, user_id: int) -> Tuple[bool, str]:
+    async def check_user_war_block(self, user_id: int, session: Optional[AsyncSession] = None) -> Tuple[bool, str]:
         """Check if user is blocked from actions due to war participation"""
-        async with AsyncSessionLocal() as session:
-            if await self._is_user_in_war_mode(user_id, session):
-                return True, "Вы заявлены на участие в Атаке Королевств. Дождитесь окончания битвы."
-            return False, ""
+        if war_registry.is_locked(user_id):
+            return True, WAR_BLOCK_MESSAGE
+        return False, ""
+    
+    async def get_live_squad_stats(self, defending_kingdom: str, session: Optional[AsyncSession] = None) -> Optional[Dict]:
+        """Current squad totals of the next scheduled war against a kingdom"""
+        async with session_scope(session) as session:
+            war = await session.scalar(
+                select(KingdomWar).where(
+                    and_(
+                        KingdomWar.status == WarStatusEnum.scheduled,
+                        KingdomWar.scheduled_time >= datetime.utcnow(),
+                        KingdomWar.defending_kingdom == defending_kingdom
+                    )
+                ).order_by(KingdomWar.scheduled_time).limit(1)
+            )
+            if not war:
+                return None
+            
+            attack_stats, defense_stats = await self.squad_service.get_squad_stats(war.id, session)
+            return {
+                'war_id': war.id,
+                'scheduled_time': war.scheduled_time,
+                'attack_stats': attack_stats,
+                'defense_stats': defense_stats
+            }
     
     async def start_enhanced_war(self, war_id: int) -> bool:
         """Start enhanced war with full mechanics"""
+        # Online defenders are picked by last_active, write buffered activity first
+        await activity_buffer.flush()
+        
         async with AsyncSessionLocal() as session:
             war = await session.get(KingdomWar, war_id)
             if not war or war.status != WarStatusEnum.scheduled:
                 return False
             
-            attacking_kingdoms = war.get_attacking_kingdoms()
-            defense_squad = war.get_defense_squad()
+            attacking_kingdoms = await self.squad_service.get_attacking_kingdoms(war.id, session)
             
             # Include online non-participating players in defense
-            await self._add_online_defenders(war, session)
+            auto_defenders = await self._add_online_defenders(war, session)
+            logger.info(f"War {war.id}: enrolled {auto_defenders} online defenders of {war.defending_kingdom}")
             
             if not attacking_kingdoms:
                 # No attackers, cancel war
                 war.status = WarStatusEnum.finished
                 war.finished_at = datetime.utcnow()
-                await self._release_war_participants(war, session)
+                war.pipeline_stage = WarStageEnum.finished
+                await self.summary_service.write_war_summary(war, [], {}, session)
                 await session.commit()
+                await self._release_war_participants(war, session)
                 return False
             
             war.status = WarStatusEnum.active
@@ -247,129 +243,104 @@ class EnhancedKingdomWarService:
             else:
                 war.defense_buff = 1.0
             
+            war.pipeline_stage = WarStageEnum.enrolled
             await session.commit()
+        
+        # Process the war
+        await self._run_war_pipeline(war_id)
+        
+        return True
+    
+    async def _run_war_pipeline(self, war_id: int):
+        """Run the remaining stages of an active war.
+        
+        Every step is its own short transaction that commits its work together
+        with the checkpoint (pipeline_stage, pipeline_cursor), so the write lock
+        is released between steps and an interrupted war resumes where it
+        stopped without applying a step twice.
+        """
+        steps = {
+            WarStageEnum.enrolled: self._process_enhanced_war_battles,
+            WarStageEnum.battles: self._settle_next_money_transfer,
+            WarStageEnum.settled: self._apply_enhanced_war_rewards,
+            WarStageEnum.rewarded: self._finish_enhanced_war
+        }
+        
+        while True:
+            async with AsyncSessionLocal() as session:
+                war = await session.get(KingdomWar, war_id)
+                if not war or war.pipeline_stage not in steps:
+                    return
+                
+                await steps[war.pipeline_stage](war, session)
+                await session.commit()
             
-            # Process the war
-            await self._process_enhanced_war_battles(war, session)
-            
-            return True
+            if war.pipeline_stage == WarStageEnum.finished:
+                # Unlock players only once the finished war is committed
+                await self._release_war_participants(war, session)
+                return
+    
+    async def get_unfinished_wars(self) -> List[KingdomWar]:
+        """Active wars interrupted by a restart"""
+        async with AsyncSessionLocal() as session:
+            result = await session.scalars(
+                select(KingdomWar).where(KingdomWar.status == WarStatusEnum.active).order_by(KingdomWar.id)
+            )
+            return list(result)
+    
+    async def resume_war(self, war_id: int) -> bool:
+        """Continue an active war from its checkpoint"""
+        logger.info(f"Resuming interrupted war {war_id}")
+        await self._run_war_pipeline(war_id)
+        return True
     
-    async def _add_online_defenders(self, war: KingdomWar, session: AsyncSession):
-        """Add online non-participating players to defense"""
+    async def _add_online_defenders(self, war: KingdomWar, session: AsyncSession) -> int:
+        """Add online non-participating players to defense, returns the number enrolled"""
         # Get online players from defending kingdom who aren't already participating
         current_time = datetime.utcnow()
         online_threshold = current_time - timedelta(minutes=30)  # Active in last 30 minutes
         
-        online_players = await session.execute(
-            select(User).where(
-                and_(
-                    User.kingdom == war.defending_kingdom,
-                    User.last_active >= online_threshold,
-                    User.id.not_in(
-                        select(WarParticipation.user_id).where(
-                            WarParticipation.war_id == war.id
-                        )
+        online_players = select(
+            literal(war.id),
+            User.id,
+            literal(war.defending_kingdom),
+            literal('defender'),
+            User.strength + func.coalesce(User.bonus_strength, 0),
+            User.armor + func.coalesce(User.bonus_armor, 0),
+            User.hp + func.coalesce(User.bonus_hp, 0),
+            User.agility + func.coalesce(User.bonus_agility, 0),
+            User.mana + func.coalesce(User.bonus_mana, 0),
+            User.level,
+            true()
+        ).where(
+            and_(
+                User.kingdom == war.defending_kingdom,
+                User.last_active >= online_threshold,
+                User.id.not_in(
+                    select(WarParticipation.user_id).where(
+                        WarParticipation.war_id == war.id
                     )
                 )
             )
         )
         
-        defense_squad = war.get_defense_squad()
-        
-        for player in online_players.scalars():
-            defense_squad.append(player.id)
-            
-            # Create participation record for auto-defenders
-            participation = WarParticipation(
-                war_id=war.id,
-                user_id=player.id,
-                kingdom=player.kingdom.value,
-                role='defender'
+        # Create participation records for auto-defenders in one INSERT ... SELECT
+        result = await session.execute(
+            insert(WarParticipation).from_select(
+                ['war_id', 'user_id', 'kingdom', 'role',
+                 'stat_strength', 'stat_armor', 'stat_hp', 'stat_agility', 'stat_mana', 'stat_level',
+                 'is_auto_defender'],
+                online_players
             )
-            
-            player_stats = {
-                'strength': player.strength,
-                'armor': player.armor,
-                'hp': player.hp,
-                'agility': player.agility,
-                'mana': player.mana,
-                'level': player.level
-            }
-            participation.set_player_stats(player_stats)
-            session.add(participation)
-        
-        war.set_defense_squad(defense_squad)
+        )
+        await self.squad_service.add_auto_defenders_to_stats(war.id, session)
+        return result.rowcount
     
     async def _calculate_enhanced_kingdom_stats(self, war: KingdomWar, session: AsyncSession):
         """Calculate enhanced kingdom stats including all defenders"""
-        attack_squads = war.get_attack_squads()
-        total_attack_stats = {}
-        
-        # Calculate attack stats for each kingdom
-        for kingdom, player_ids in attack_squads.items():
-            kingdom_stats = {
-                'total_strength': 0,
-                'total_armor': 0,
-                'total_hp': 0,
-                'total_agility': 0,
-                'total_mana': 0,
-                'player_count': len(player_ids)
-            }
-            
-            participations = await session.execute(
-                select(WarParticipation).where(
-                    and_(
-                        WarParticipation.war_id == war.id,
-                        WarParticipation.user_id.in_(player_ids),
-                        WarParticipation.role == 'attacker'
-                    )
-                )
-            )
-            
-            for participation in participations.scalars():
-                stats = participation.get_player_stats()
-                kingdom_stats['total_strength'] += stats.get('strength', 0)
-                kingdom_stats['total_armor'] += stats.get('armor', 0)
-                kingdom_stats['total_hp'] += stats.get('hp', 0)
-                kingdom_stats['total_agility'] += stats.get('agility', 0)
-                kingdom_stats['total_mana'] += stats.get('mana', 0)
-            
-            total_attack_stats[kingdom] = kingdom_stats
-        
+        # Squad totals are maintained on join and auto-defender enrollment
+        total_attack_stats, defense_stats = await self.squad_service.get_squad_stats(war.id, session)
         war.set_total_attack_stats(total_attack_stats)
-        
-        # Calculate defense stats (including online auto-defenders)
-        defense_squad = war.get_defense_squad()
-        defense_stats = {
-            'total_strength': 0,
-            'total_armor': 0,
-            'total_hp': 0,
-            'total_agility': 0,
-            'total_mana': 0,
-            'player_count': len(defense_squad),
-            'voluntary_defenders': 0,
-            'auto_defenders': 0
-        }
-        
-        if defense_squad:
-            defense_participations = await session.execute(
-                select(WarParticipation).where(
-                    and_(
-                        WarParticipation.war_id == war.id,
-                        WarParticipation.user_id.in_(defense_squad),
-                        WarParticipation.role == 'defender'
-                    )
-                )
-            )
-            
-            for participation in defense_participations.scalars():
-                stats = participation.get_player_stats()
-                defense_stats['total_strength'] += stats.get('strength', 0)
-                defense_stats['total_armor'] += stats.get('armor', 0)
-                defense_stats['total_hp'] += stats.get('hp', 0)
-                defense_stats['total_agility'] += stats.get('agility', 0)
-                defense_stats['total_mana'] += stats.get('mana', 0)
-        
         war.set_defense_stats(defense_stats)
     
     async def _process_enhanced_war_battles(self, war: KingdomWar, session: AsyncSession):
@@ -387,10 +358,9 @@ class EnhancedKingdomWarService:
         buffed_defense_stats = defense_stats.copy()
         buffed_defense_stats['total_armor'] = int(defense_stats['total_armor'] * war.defense_buff)
         
-        money_transfers = {}
         battle_results = []
         current_defense_hp = buffed_defense_stats['total_hp']
-        successful_attacker = None
+        successful_attackers = []
         
         # Process attacks in order (weakest to strongest)
         for kingdom, kingdom_stats in sorted_attackers:
@@ -416,7 +386,7 @@ class EnhancedKingdomWarService:
             
             if current_defense_hp <= 0:
                 # Attacker breaks through defense
-                successful_attacker = kingdom
+                successful_attackers.append(kingdom)
                 battle_results.append({
                     'attacker': kingdom,
                     'defender': war.defending_kingdom,
@@ -424,11 +394,7 @@ class EnhancedKingdomWarService:
                     'damage_dealt': damage_to_defense,
                     'message': f'{kingdom} сломало защиту {war.defending_kingdom}!'
                 })
-                
-                # Calculate money transfer (40% of defenders' money)
-                money_to_transfer = await self._calculate_enhanced_money_transfer(war, kingdom, session)
-                money_transfers[kingdom] = money_to_transfer
-                
+            
             else:
                 # Defense holds
                 battle_results.append({
@@ -443,143 +409,191 @@ class EnhancedKingdomWarService:
             # Restore defense HP to full for next wave
             current_defense_hp = buffed_defense_stats['total_hp']
         
-        # Apply enhanced penalties and rewards
-        await self._apply_enhanced_war_consequences(war, successful_attacker, session)
-        
         # Store results
         war.battle_results = json.dumps(battle_results)
-        war.set_money_transferred(money_transfers)
-        
-        # Apply money transfers and experience
-        await self._apply_enhanced_war_rewards(war, session)
+        war.pipeline_stage = WarStageEnum.battles
+        war.pipeline_cursor = 0
         
-        # Finish war and restore participants
-        war.status = WarStatusEnum.finished
-        war.finished_at = datetime.utcnow()
-        await self._release_war_participants(war, session)
-        await self._restore_participants_after_war(war, session)
+        logger.info(f"Enhanced war {war.id}: {len(battle_results)} battles, {len(successful_attackers)} breakthroughs")
+    
+    @staticmethod
+    def _successful_attackers(war: KingdomWar) -> List[str]:
+        """Kingdoms that broke the defense, in battle order"""
+        return [result['attacker'] for result in war.get_battle_results() if result['result'] == 'victory']
+    
+    async def _settle_next_money_transfer(self, war: KingdomWar, session: AsyncSession):
+        """Apply the money transfer of the next successful attacker"""
+        # Each breakthrough takes 40% of the defenders' money, the last one also
+        # applies the penalty for non-participants (total 80% loss)
+        successful_attackers = self._successful_attackers(war)
+        index = war.pipeline_cursor or 0
         
-        await session.commit()
+        if index < len(successful_attackers):
+            kingdom = successful_attackers[index]
+            money_transfers = war.get_money_transferred()
+            money_transfers[kingdom] = await self._calculate_enhanced_money_transfer(
+                war, kingdom, session,
+                penalize_non_participants=(index == len(successful_attackers) - 1)
+            )
+            war.set_money_transferred(money_transfers)
+            index += 1
         
-        logger.info(f"Enhanced war {war.id} finished with results: {len(battle_results)} battles")
+        if index >= len(successful_attackers):
+            war.pipeline_stage = WarStageEnum.settled
+            war.pipeline_cursor = 0
+        else:
+            war.pipeline_cursor = index
     
-    async def _calculate_enhanced_money_transfer(self, war: KingdomWar, winning_kingdom: str, session: AsyncSession) -> int:
-        """Calculate enhanced money transfer from all kingdom players"""
-        # Get ALL players from defending kingdom (participating and non-participating)
-        defending_players = await session.execute(
-            select(User).where(User.kingdom == war.defending_kingdom)
+    @staticmethod
+    def _money_after_loss(money):
+        """SQL expression for a balance after losing 40% of it"""
+        return func.max(0, money - cast(money * 0.4, Integer))
+    
+    async def _calculate_enhanced_money_transfer(self, war: KingdomWar, winning_kingdom: str, session: AsyncSession,
+                                                 penalize_non_participants: bool = False) -> int:
+        """Take 40% of the money of all defending kingdom players (participating and non-participating)"""
+        in_defending_kingdom = User.kingdom == war.defending_kingdom
+        money_lost = cast(User.money * 0.4, Integer)
+        
+        total_money_taken = await session.scalar(
+            select(func.coalesce(func.sum(money_lost), 0)).where(in_defending_kingdom)
         )
         
-        total_money_taken = 0
+        # Mark money loss in participations, before balances change
+        await session.execute(
+            update(WarParticipation).where(
+                and_(
+                    WarParticipation.war_id == war.id,
+                    WarParticipation.user_id.in_(select(User.id).where(in_defending_kingdom))
+                )
+            ).values(
+                money_lost=select(money_lost).where(User.id == WarParticipation.user_id).scalar_subquery()
+            ).execution_options(synchronize_session=False)
+        )
         
-        for user in defending_players.scalars():
-            money_lost = int(user.money * 0.4)
-            user.money = max(0, user.money - money_lost)
-            total_money_taken += money_lost
-            
-            # Mark money loss in participation if exists
-            participation = await session.scalar(
-                select(WarParticipation).where(
-                    and_(
-                        WarParticipation.war_id == war.id,
-                        WarParticipation.user_id == user.id
-                    )
+        new_money = self._money_after_loss(User.money)
+        if penalize_non_participants:
+            # Non-participant penalty: additional 40% of what is left
+            defense_squad = select(WarParticipation.user_id).where(
+                and_(
+                    WarParticipation.war_id == war.id,
+                    WarParticipation.role == 'defender'
                 )
             )
-            if participation:
-                participation.money_lost = money_lost
+            new_money = case(
+                (User.id.in_(defense_squad), new_money),
+                else_=self._money_after_loss(new_money)
+            )
         
+        result = await session.execute(
+            update(User).where(in_defending_kingdom).values(money=new_money)
+            .execution_options(synchronize_session=False)
+        )
+        invalidate_after_commit(session)
+        
+        logger.info(
+            f"War {war.id}: {winning_kingdom} took {total_money_taken} gold from "
+            f"{result.rowcount} players of {war.defending_kingdom}"
+            f"{' (non-participants penalized)' if penalize_non_participants else ''}"
+        )
         return total_money_taken
     
-    async def _apply_enhanced_war_consequences(self, war: KingdomWar, successful_attacker: str, session: AsyncSession):
-        """Apply enhanced consequences including penalties for non-participants"""
-        if successful_attacker:
-            # Defense was broken - apply penalties to non-participating defenders
-            defense_squad = war.get_defense_squad()
-            
-            # Get all players from defending kingdom
-            all_defenders = await session.execute(
-                select(User).where(User.kingdom == war.defending_kingdom)
-            )
-            
-            for user in all_defenders.scalars():
-                if user.id not in defense_squad:
-                    # Non-participant penalty: additional 40% loss (total 80% loss)
-                    additional_penalty = int(user.money * 0.4)
-                    user.money = max(0, user.money - additional_penalty)
-                    logger.info(f"Non-participant penalty applied to user {user.id}: -{additional_penalty}")
-    
     async def _apply_enhanced_war_rewards(self, war: KingdomWar, session: AsyncSession):
-        """Apply enhanced money and experience rewards"""
+        """Apply enhanced money and experience rewards to the next chunk of attackers"""
         money_transfers = war.get_money_transferred()
         attack_stats = war.get_total_attack_stats()
         
-        exp_distribution = {}
+        # Attackers of successful kingdoms after the cursor, in participation order
+        participations = list(await session.scalars(
+            select(WarParticipation).where(
+                and_(
+                    WarParticipation.war_id == war.id,
+                    WarParticipation.role == 'attacker',
+                    WarParticipation.kingdom.in_(list(money_transfers)),
+                    WarParticipation.id > (war.pipeline_cursor or 0)
+                )
+            ).order_by(WarParticipation.id).limit(settings.WAR_REWARD_CHUNK_SIZE)
+        ))
         
-        for kingdom, money_gained in money_transfers.items():
-            if kingdom not in attack_stats:
+        if not participations:
+            war.pipeline_stage = WarStageEnum.rewarded
+            war.pipeline_cursor = 0
+            return
+        
+        users = await session.scalars(
+            select(User).where(User.id.in_([participation.user_id for participation in participations]))
+        )
+        users_by_id = {user.id: user for user in users}
+        
+        for participation in participations:
+            kingdom_stats = attack_stats.get(participation.kingdom)
+            if not kingdom_stats:
                 continue
             
-            kingdom_stats = attack_stats[kingdom]
-            squad = war.get_attack_squads().get(kingdom, [])
-            
-            if not squad:
-                continue
+            money_gained = money_transfers[participation.kingdom]
             
             # Calculate total stats for distribution
             total_kingdom_stats = (kingdom_stats['total_strength'] + 
                                  kingdom_stats['total_armor'] + 
                                  kingdom_stats['total_agility'])
             
-            # Distribute money and exp based on individual stats
-            for user_id in squad:
-                participation = await session.scalar(
-                    select(WarParticipation).where(
-                        and_(
-                            WarParticipation.war_id == war.id,
-                            WarParticipation.user_id == user_id,
-                            WarParticipation.role == 'attacker'
-                        )
-                    )
+            user_stats = participation.get_player_stats()
+            user_total_stats = (user_stats['strength'] + 
+                               user_stats['armor'] + 
+                               user_stats['agility'])
+            
+            # Calculate share based on stats
+            if total_kingdom_stats > 0:
+                share = user_total_stats / total_kingdom_stats
+            else:
+                share = 1.0 / kingdom_stats['player_count']
+            
+            # Calculate enhanced rewards
+            money_reward = int(money_gained * share)
+            exp_reward = int(75 * share * user_stats['level'])  # Increased base exp
+            
+            # Apply rewards to user
+            user = users_by_id.get(participation.user_id)
+            if user:
+                user.money += money_reward
+                self.user_service.apply_experience(user, exp_reward)
+            
+            # Store in participation record
+            participation.money_gained = money_reward
+            participation.exp_gained = exp_reward
+        
+        war.pipeline_cursor = participations[-1].id
+    
+    async def _finish_enhanced_war(self, war: KingdomWar, session: AsyncSession):
+        """Record distributed experience and the war summary, mark the war finished"""
+        successful_attackers = self._successful_attackers(war)
+        money_transfers = war.get_money_transferred()
+        
+        result = await session.execute(
+            select(WarParticipation.kingdom, WarParticipation.user_id, WarParticipation.exp_gained).where(
+                and_(
+                    WarParticipation.war_id == war.id,
+                    WarParticipation.role == 'attacker',
+                    WarParticipation.kingdom.in_(successful_attackers)
                 )
-                
-                if not participation:
-                    continue
-                
-                user_stats = participation.get_player_stats()
-                user_total_stats = (user_stats['strength'] + 
-                                   user_stats['armor'] + 
-                                   user_stats['agility'])
-                
-                # Calculate share based on stats
-                if total_kingdom_stats > 0:
-                    share = user_total_stats / total_kingdom_stats
-                else:
-                    share = 1.0 / len(squad)
-                
-                # Calculate enhanced rewards
-                money_reward = int(money_gained * share)
-                exp_reward = int(75 * share * user_stats['level'])  # Increased base exp
-                
-                # Apply rewards to user
-                user = await session.get(User, user_id)
-                if user:
-                    user.money += money_reward
-                    await self.user_service.add_experience(user_id, exp_reward)
-                
-                # Store in participation record
-                participation.money_gained = money_reward
-                participation.exp_gained = exp_reward
-                
-                exp_distribution[str(user_id)] = exp_reward
+            ).order_by(WarParticipation.id)
+        )
+        rewarded = sorted(result.all(), key=lambda row: successful_attackers.index(row.kingdom))
+        war.set_exp_distributed({str(row.user_id): row.exp_gained for row in rewarded})
         
-        war.set_exp_distributed(exp_distribution)
+        # Finish war and restore participants
+        war.status = WarStatusEnum.finished
+        war.finished_at = datetime.utcnow()
+        war.pipeline_stage = WarStageEnum.finished
+        await self.summary_service.write_war_summary(war, war.get_battle_results(), money_transfers, session)
+        await self._restore_participants_after_war(war, session)
+        
+        logger.info(f"Enhanced war {war.id} finished, {len(rewarded)} attackers rewarded")
     
     async def _release_war_participants(self, war: KingdomWar, session: AsyncSession):
         """Release participants from war mode"""
-        # This would remove the war mode block from all participants
-        # Implementation depends on how war mode blocking is implemented
-        pass
+        released = war_registry.release_war(war.id)
+        logger.info(f"War {war.id}: released {released} players from war mode")
     
     async def _restore_participants_after_war(self, war: KingdomWar, session: AsyncSession):
         """Restore HP/MP of all participants after 5 minutes"""
@@ -587,9 +601,74 @@ class EnhancedKingdomWarService:
         # For now, we'll just log it
         logger.info(f"War {war.id} participants will be restored in 5 minutes")
     
+    async def restore_finished_war_participants(self, session: Optional[AsyncSession] = None) -> Tuple[int, int]:
+        """Restore HP/MP of participants of finished wars not restored yet, returns (wars, players)"""
+        async with session_scope(session) as session:
+            war_ids = list(await session.scalars(
+                select(KingdomWar.id).where(
+                    and_(
+                        KingdomWar.status == WarStatusEnum.finished,
+                        KingdomWar.participants_restored == False
+                    )
+                )
+            ))
+            if not war_ids:
+                return 0, 0
+            
+            result = await session.execute(
+                update(User).where(
+                    User.id.in_(
+                        select(WarParticipation.user_id).where(WarParticipation.war_id.in_(war_ids))
+                    )
+                ).values(
+                    current_hp=User.hp + func.coalesce(User.bonus_hp, 0),
+                    current_mana=User.mana + func.coalesce(User.bonus_mana, 0)
+                ).execution_options(synchronize_session=False)
+            )
+            restored = result.rowcount
+            
+            await session.execute(
+                update(KingdomWar).where(KingdomWar.id.in_(war_ids)).values(participants_restored=True)
+                .execution_options(synchronize_session=False)
+            )
+            invalidate_after_commit(session)
+            await commit_session(session)
+            
+            logger.info(f"Restored HP/MP of {restored} participants of wars {war_ids}")
+            return len(war_ids), restored
+    
     async def get_enhanced_user_war_results(self, user_id: int, war_id: int) -> Optional[Dict]:
         """Get enhanced war results for specific user"""
         async with AsyncSessionLocal() as session:
+            # Finished wars have their results stored at completion
+            stored = await self.summary_service.get_user_result(user_id, war_id, session)
+            if stored:
+                user_result, summary = stored
+                kingdom_results = await self.summary_service.get_kingdom_results(war_id, session)
+                
+                return {
+                    'role': user_result.role,
+                    'kingdom': user_result.kingdom,
+                    'result': user_result.result,
+                    'money_gained': user_result.money_gained,
+                    'money_lost': user_result.money_lost,
+                    'exp_gained': user_result.exp_gained,
+                    'war_status': WarStatusEnum.finished.value,
+                    'battle_results': [
+                        {
+                            'attacker': kingdom_result.kingdom,
+                            'defender': summary.defending_kingdom,
+                            'result': kingdom_result.result,
+                            'damage_dealt': kingdom_result.damage_dealt
+                        }
+                        for kingdom_result in kingdom_results if kingdom_result.role == 'attacker'
+                    ],
+                    'attackers_count': summary.attackers_count,
+                    'defenders_count': summary.defenders_count,
+                    'total_participants': summary.attackers_count + summary.defenders_count,
+                    'defense_buff_applied': (summary.defense_buff or 1.0) > 1.0
+                }
+            
             participation = await session.scalar(
                 select(WarParticipation).where(
                     and_(
@@ -606,6 +685,8 @@ class EnhancedKingdomWarService:
             if not war:
                 return None
             
+            participant_counts = await self.squad_service.count_participants(war_id, session)
+            
             return {
                 'role': participation.role.value,
                 'kingdom': participation.kingdom,
@@ -614,51 +695,26 @@ class EnhancedKingdomWarService:
                 'exp_gained': participation.exp_gained,
                 'war_status': war.status.value,
                 'battle_results': war.get_battle_results(),
-                'total_participants': len(war.get_defense_squad()) + sum(
-                    len(squad) for squad in war.get_attack_squads().values()
-                ),
+                'attackers_count': participant_counts['attacker'],
+                'defenders_count': participant_counts['defender'],
+                'total_participants': sum(participant_counts.values()),
                 'defense_buff_applied': war.defense_buff > 1.0
             }
     
     async def get_war_summary_for_channel(self, war_ids: List[int]) -> str:
         """Generate war summary for war channel"""
-        async with AsyncSessionLocal() as session:
-            summaries = []
-            
-            for war_id in war_ids:
-                war = await session.get(KingdomWar, war_id)
-                if not war:
-                    continue
-                
-                battle_results = war.get_battle_results()
-                money_transfers = war.get_money_transferred()
-                
-                summary = f"🏰 **{war.defending_kingdom.upper()}** - Война завершена\n"
-                
-                if battle_results:
-                    for result in battle_results:
-                        if result['result'] == 'victory':
-                            money = money_transfers.get(result['attacker'], 0)
-                            summary += f"✅ {result['attacker']} → ПОБЕДА (захвачено {money} золота)\n"
-                        elif result['result'] == 'defeat':
-                            summary += f"❌ {result['attacker']} → Поражение\n"
-                        elif result['result'] == 'too_late':
-                            summary += f"⏰ {result['attacker']} → Опоздало\n"
-                else:
-                    summary += "🕊️ Никто не атаковал\n"
-                
-                summaries.append(summary)
-            
-            return "\n".join(summaries)
+        # Written by write_war_summary when each war finished
+        return await self.summary_service.get_channel_summary(war_ids)
     
     async def get_scheduled_wars(self, date: datetime = None) -> List[KingdomWar]:
-        """Get scheduled wars for a date"""
+        """Get scheduled wars for a Tashkent calendar date"""
         if date is None:
-            date = datetime.utcnow()
+            date = war_calendar.now()
+        elif date.tzinfo is not None:
+            date = date.astimezone(self.tashkent_tz)
         
-        # Get wars for the date
-        start_of_day = datetime.combine(date.date(), datetime.min.time())
-        end_of_day = start_of_day + timedelta(days=1)
+        # Day boundaries in UTC, as scheduled_time is stored
+        start_of_day, end_of_day = war_calendar.day_bounds(date.date())
         
         async with AsyncSessionLocal() as session:
             result = await session.execute(
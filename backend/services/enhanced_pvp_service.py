@@ -3,7 +3,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from config.database import AsyncSessionLocal
 from models.interactive_battle import InteractiveBattle, BattleModeEnum, BattlePhaseEnum
 from models.user import User
-from models.skill import UserSkill, SkillTypeEnum
+from models.skill import SkillTypeEnum
+from services.battle_state_store import battle_state_store
+from services.round_timer import round_timer
+from services.skill_loadout import SkillLoadout, get_loadouts, flush_skill_usage
 from utils.formulas import GameFormulas
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Tuple, List
@@ -28,7 +31,7 @@ class EnhancedPvPService:
                 return None
             
             # Check HP requirements
-            if challenger.current_hp < challenger.hp * 0.3 or defender.current_hp < defender.hp * 0.3:
+            if challenger.current_hp < challenger.max_hp * 0.3 or defender.current_hp < defender.max_hp * 0.3:
                 return None
             
             # Create interactive battle
@@ -47,13 +50,14 @@ class EnhancedPvPService:
             await session.commit()
             await session.refresh(battle)
             
+            battle_state_store.add(battle)
             logger.info(f"Interactive PvP created: {challenger_id} vs {defender_id}")
             return battle
     
     async def accept_interactive_pvp_battle(self, battle_id: int, defender_id: int) -> bool:
         """Accept interactive PvP battle"""
-        async with AsyncSessionLocal() as session:
-            battle = await session.get(InteractiveBattle, battle_id)
+        async with battle_state_store.lock(battle_id):
+            battle = await battle_state_store.get(battle_id)
             if not battle or battle.player2_id != defender_id:
                 return False
             
@@ -61,16 +65,17 @@ class EnhancedPvPService:
                 return False
             
             # Start first round
-            battle.phase = BattlePhaseEnum.attack_selection
-            battle.reset_round_choices()
+            async with battle_state_store.persist(battle):
+                battle.phase = BattlePhaseEnum.attack_selection
+                battle.reset_round_choices()
             
-            await session.commit()
+            round_timer.arm(battle, self.check_pvp_timeout)
             return True
     
     async def make_pvp_attack_choice(self, battle_id: int, player_id: int, attack_type: str) -> bool:
         """Make attack choice in PvP"""
-        async with AsyncSessionLocal() as session:
-            battle = await session.get(InteractiveBattle, battle_id)
+        async with battle_state_store.lock(battle_id):
+            battle = await battle_state_store.get(battle_id)
             if not battle or battle.phase != BattlePhaseEnum.attack_selection:
                 return False
             
@@ -89,13 +94,14 @@ class EnhancedPvPService:
             if battle.player1_attack_choice and battle.player2_attack_choice:
                 battle.phase = BattlePhaseEnum.dodge_selection
             
-            await session.commit()
+            # Choices stay in memory until the round resolves
+            battle_state_store.mark_dirty(battle)
             return True
     
     async def make_pvp_dodge_choice(self, battle_id: int, player_id: int, direction: str) -> bool:
         """Make dodge choice in PvP"""
-        async with AsyncSessionLocal() as session:
-            battle = await session.get(InteractiveBattle, battle_id)
+        async with battle_state_store.lock(battle_id):
+            battle = await battle_state_store.get(battle_id)
             if not battle or battle.phase != BattlePhaseEnum.dodge_selection:
                 return False
             
@@ -110,11 +116,15 @@ class EnhancedPvPService:
             else:
                 return False
             
-            # Check if both players are ready
+            # Check if both players are ready, the resolved round is written with the battle
             if battle.both_players_ready():
-                await self._calculate_pvp_round(battle, session)
+                async with battle_state_store.persist(battle) as session:
+                    await self._calculate_pvp_round(battle, session)
+                # Next round's deadline, or none once the battle is over
+                round_timer.arm(battle, self.check_pvp_timeout)
+            else:
+                battle_state_store.mark_dirty(battle)
             
-            await session.commit()
             return True
     
     async def _calculate_pvp_round(self, battle: InteractiveBattle, session: AsyncSession):
@@ -135,9 +145,10 @@ class EnhancedPvPService:
             'skills_used': []
         }
         
-        # Auto-cast skills for both players
-        p1_skills = await self._auto_cast_pvp_skills(player1, battle, 'player1', session)
-        p2_skills = await self._auto_cast_pvp_skills(player2, battle, 'player2', session)
+        # Auto-cast skills for both players, loadouts are loaded once per battle
+        loadouts = await get_loadouts(battle, [player1.id, player2.id], session)
+        p1_skills = self._auto_cast_pvp_skills(player1, loadouts[player1.id], battle, 'player1')
+        p2_skills = self._auto_cast_pvp_skills(player2, loadouts[player2.id], battle, 'player2')
         
         round_log['skills_used'] = {
             'player1': p1_skills,
@@ -188,34 +199,24 @@ class EnhancedPvPService:
             battle.phase = BattlePhaseEnum.attack_selection
             battle.reset_round_choices()
     
-    async def _auto_cast_pvp_skills(self, player: User, battle: InteractiveBattle, 
-                                   player_key: str, session: AsyncSession) -> List[dict]:
+    def _auto_cast_pvp_skills(self, player: User, loadout: SkillLoadout, battle: InteractiveBattle, 
+                              player_key: str) -> List[dict]:
         """Auto-cast skills for PvP player"""
-        # Get player's skills
-        user_skills_result = await session.execute(
-            select(UserSkill).where(UserSkill.user_id == player.id)
-        )
-        user_skills = user_skills_result.scalars().all()
-        
-        if not user_skills:
+        if not loadout:
             return []
         
         skills_used = []
         current_mana = battle.player1_mana if player_key == 'player1' else battle.player2_mana
         current_hp = battle.player1_hp if player_key == 'player1' else battle.player2_hp
         
-        # Sort skills by priority
-        sorted_skills = sorted(user_skills, key=lambda x: x.skill.priority)
-        
-        for user_skill in sorted_skills:
-            skill = user_skill.skill
-            
+        # Loadout skills are already in priority order
+        for skill in loadout.skills:
             if current_mana < skill.mana_cost:
                 continue
             
             should_use = False
             
-            if skill.skill_type == SkillTypeEnum.heal and current_hp < player.hp * 0.5:
+            if skill.skill_type == SkillTypeEnum.heal and current_hp < player.max_hp * 0.5:
                 should_use = True
             elif skill.skill_type == SkillTypeEnum.buff and battle.current_round <= 2:
                 should_use = True
@@ -234,7 +235,7 @@ class EnhancedPvPService:
                 if skill.skill_type == SkillTypeEnum.heal:
                     heal_amount = skill.heal_amount
                     old_hp = current_hp
-                    current_hp = min(current_hp + heal_amount, player.hp)
+                    current_hp = min(current_hp + heal_amount, player.max_hp)
                     actual_heal = current_hp - old_hp
                     
                     if player_key == 'player1':
@@ -249,8 +250,7 @@ class EnhancedPvPService:
                     })
                 
                 # Update usage stats
-                user_skill.times_used += 1
-                user_skill.last_used = datetime.utcnow()
+                loadout.record_use(skill)
         
         return skills_used
     
@@ -274,7 +274,7 @@ class EnhancedPvPService:
         
         if direction_hit and random.random() < hit_chance:
             # Calculate damage
-            base_damage = attacker.strength + int(attacker.agility * 0.5)
+            base_damage = attacker.effective_strength + int(attacker.effective_agility * 0.5)
             
             # Apply attack type modifiers
             if attack_type == 'power':
@@ -282,11 +282,11 @@ class EnhancedPvPService:
             elif attack_type == 'precise':
                 base_damage = int(base_damage * 1.1)
             
-            defense = int(defender.armor * 0.8)
+            defense = int(defender.effective_armor * 0.8)
             damage = max(base_damage - defense, int(base_damage * 0.1))
             
             # Check for critical hit
-            crit_chance = GameFormulas.critical_hit_chance(attacker.agility)
+            crit_chance = GameFormulas.critical_hit_chance(attacker.effective_agility)
             if attack_type == 'precise':
                 crit_chance *= 1.5
             
@@ -295,7 +295,7 @@ class EnhancedPvPService:
                 result['events'].append(f"🔥 Критический {attack_type} удар!")
             
             # Check for perfect dodge (defender's last chance)
-            perfect_dodge_chance = min(defender.agility / 500.0, 0.07)
+            perfect_dodge_chance = min(defender.effective_agility / 500.0, 0.07)
             if random.random() < perfect_dodge_chance:
                 damage = 0
                 result['events'].append("💨 Мастерское уклонение!")
@@ -305,7 +305,7 @@ class EnhancedPvPService:
         
         else:
             # Missed, check for glancing hit
-            if GameFormulas.is_critical_hit(attacker.agility) and random.random() < 0.15:
+            if GameFormulas.is_critical_hit(attacker.effective_agility) and random.random() < 0.15:
                 result['damage'] = 2
                 result['events'].append("✨ Промах, но мастерство позволило нанести 2 урона!")
             else:
@@ -319,6 +319,9 @@ class EnhancedPvPService:
         battle.phase = BattlePhaseEnum.finished
         battle.finished_at = datetime.utcnow()
         
+        # Cast counters are written once, with the finished battle
+        await flush_skill_usage(battle, session)
+        
         # Determine winner
         if battle.player1_hp <= 0:
             winner = player2
@@ -331,18 +334,18 @@ class EnhancedPvPService:
         
         # Calculate rewards
         winner_stats = {
-            'strength': winner.strength,
-            'armor': winner.armor,
-            'agility': winner.agility,
-            'hp': winner.hp,
-            'mana': winner.mana
+            'strength': winner.effective_strength,
+            'armor': winner.effective_armor,
+            'agility': winner.effective_agility,
+            'hp': winner.max_hp,
+            'mana': winner.max_mana
         }
         loser_stats = {
-            'strength': loser.strength,
-            'armor': loser.armor,
-            'agility': loser.agility,
-            'hp': loser.hp,
-            'mana': loser.mana
+            'strength': loser.effective_strength,
+            'armor': loser.effective_armor,
+            'agility': loser.effective_agility,
+            'hp': loser.max_hp,
+            'mana': loser.max_mana
         }
         
         rewards = GameFormulas.calculate_battle_rewards(winner_stats, loser_stats)
@@ -369,7 +372,7 @@ class EnhancedPvPService:
         # Add experience
         from services.user_service import UserService
         user_service = UserService()
-        await user_service.add_experience(winner.id, battle.exp_gained)
+        await user_service.add_experience(winner.id, battle.exp_gained, session=session)
         
         battle.add_to_battle_log({
             'round': battle.current_round,
@@ -384,6 +387,9 @@ class EnhancedPvPService:
         battle.phase = BattlePhaseEnum.finished
         battle.finished_at = datetime.utcnow()
         
+        # Cast counters are written once, with the finished battle
+        await flush_skill_usage(battle, session)
+        
         # Winner is player with higher HP
         if battle.player1_hp > battle.player2_hp:
             winner = player1
@@ -418,7 +424,7 @@ class EnhancedPvPService:
         
         from services.user_service import UserService
         user_service = UserService()
-        await user_service.add_experience(winner.id, battle.exp_gained)
+        await user_service.add_experience(winner.id, battle.exp_gained, session=session)
         
         battle.add_to_battle_log({
             'round': battle.current_round,
@@ -429,8 +435,8 @@ class EnhancedPvPService:
     
     async def check_pvp_timeout(self, battle_id: int) -> bool:
         """Check and handle PvP battle timeout"""
-        async with AsyncSessionLocal() as session:
-            battle = await session.get(InteractiveBattle, battle_id)
+        async with battle_state_store.lock(battle_id):
+            battle = await battle_state_store.get(battle_id)
             if not battle or not battle.round_start_time:
                 return False
             
@@ -443,6 +449,7 @@ class EnhancedPvPService:
                     if not battle.player2_attack_choice:
                         battle.player2_attack_choice = 'normal'
                     battle.phase = BattlePhaseEnum.dodge_selection
+                    battle_state_store.mark_dirty(battle)
                 
                 elif battle.phase == BattlePhaseEnum.dodge_selection:
                     if not battle.player1_dodge_choice:
@@ -451,14 +458,16 @@ class EnhancedPvPService:
                         battle.player2_dodge_choice = 'center'
                     
                     # Calculate round with timeout choices
-                    await self._calculate_pvp_round(battle, session)
+                    async with battle_state_store.persist(battle) as session:
+                        await self._calculate_pvp_round(battle, session)
                 
-                await session.commit()
+                round_timer.arm(battle, self.check_pvp_timeout)
                 return True
             
+            # Woken early, wait for the actual deadline
+            round_timer.arm(battle, self.check_pvp_timeout)
             return False
     
     async def get_battle(self, battle_id: int) -> Optional[InteractiveBattle]:
         """Get PvP battle by ID"""
-        async with AsyncSessionLocal() as session:
-            return await session.get(InteractiveBattle, battle_id)
\ No newline at end of file
+        return await battle_state_store.get(battle_id)
\ No newline at end of file
@@ -4,6 +4,7 @@ from config.database import AsyncSessionLocal
 from models.interactive_battle import InteractiveBattle, BattleModeEnum, BattlePhaseEnum
 from models.monster import Monster
 from models.user import User
+from services.round_timer import round_timer
 from utils.formulas import GameFormulas
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Tuple
@@ -26,7 +27,7 @@ class InteractiveBattleService:
                 return None
             
             # Check if player has enough HP
-            if player.current_hp < player.hp * 0.3:
+            if player.current_hp < player.max_hp * 0.3:
                 return None
             
             # Generate random monster
@@ -62,6 +63,7 @@ class InteractiveBattleService:
             battle.reset_round_choices()
             
             await session.commit()
+            round_timer.arm(battle, self.check_battle_timeout)
             return True
     
     async def flee_from_battle(self, battle_id: int, player_id: int) -> bool:
@@ -81,6 +83,7 @@ class InteractiveBattleService:
             })
             
             await session.commit()
+            round_timer.cancel(battle_id)
             logger.info(f"Player {player_id} fled from battle {battle_id}")
             return True
     
@@ -128,11 +131,15 @@ class InteractiveBattleService:
                 return False
             
             # Check if all players made dodge choice
-            if battle.both_players_ready():
+            resolved = battle.both_players_ready()
+            if resolved:
                 # Calculate round results
                 await self._calculate_round_results(battle, session)
             
             await session.commit()
+            if resolved:
+                # Next round's deadline, or none once the battle is over
+                round_timer.arm(battle, self.check_battle_timeout)
             return True
     
     async def _calculate_round_results(self, battle: InteractiveBattle, session: AsyncSession):
@@ -172,19 +179,19 @@ class InteractiveBattleService:
         player_damage = 0
         if battle.player1_attack_choice == monster_dodge:
             # Direct hit
-            base_damage = player.strength + int(player.agility * 0.5)
+            base_damage = player.effective_strength + int(player.effective_agility * 0.5)
             defense = int(monster_data['armor'] * 0.8)
             player_damage = max(base_damage - defense, int(base_damage * 0.1))
             
             # Check for critical hit
-            if GameFormulas.is_critical_hit(player.agility):
+            if GameFormulas.is_critical_hit(player.effective_agility):
                 player_damage = int(player_damage * 1.5)
                 round_log['events'].append("🔥 Критический удар игрока!")
             
             round_log['events'].append(f"⚔️ Игрок нанёс {player_damage} урона")
         else:
             # Missed, but check for crit chance to still hit
-            if GameFormulas.is_critical_hit(player.agility):
+            if GameFormulas.is_critical_hit(player.effective_agility):
                 player_damage = 2  # Minimal damage from crit
                 round_log['events'].append("✨ Промах, но критический навык позволил нанести 2 урона!")
             else:
@@ -203,11 +210,11 @@ class InteractiveBattleService:
         if monster_attack == battle.player1_dodge_choice:
             # Monster hit
             base_damage = monster_data['strength'] + int(monster_data['agility'] * 0.5)
-            defense = int(player.armor * 0.8)
+            defense = int(player.effective_armor * 0.8)
             monster_damage = max(base_damage - defense, int(base_damage * 0.1))
             
             # Check if player can dodge with agility
-            if GameFormulas.is_dodge(player.agility):
+            if GameFormulas.is_dodge(player.effective_agility):
                 monster_damage = 0
                 round_log['events'].append("💨 Игрок уклонился от атаки!")
             else:
@@ -277,7 +284,7 @@ class InteractiveBattleService:
         # Add experience
         from services.user_service import UserService
         user_service = UserService()
-        await user_service.add_experience(player.id, battle.exp_gained)
+        await user_service.add_experience(player.id, battle.exp_gained, session=session)
     
     def _all_attack_choices_made(self, battle: InteractiveBattle) -> bool:
         """Check if all players made attack choices"""
@@ -1,9 +1,10 @@
 from sqlalchemy import select, and_, update, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from config.database import AsyncSessionLocal
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
+from config.database import session_scope, commit_session
 from models.item import Item, UserItem, ItemTypeEnum
 from models.user import User
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,45 +13,84 @@ class InventoryService:
     def __init__(self):
         pass
     
-    async def get_user_inventory(self, user_id: int) -> List[UserItem]:
-        """Get user's inventory"""
-        async with AsyncSessionLocal() as session:
+    async def get_user_inventory(self, user_id: int, session: Optional[AsyncSession] = None) -> List[UserItem]:
+        """Get user's inventory with items loaded"""
+        async with session_scope(session) as session:
             result = await session.execute(
                 select(UserItem).where(UserItem.user_id == user_id)
+                .options(selectinload(UserItem.item))
                 .order_by(UserItem.is_equipped.desc(), UserItem.obtained_at.desc())
             )
             return result.scalars().all()
     
-    async def get_equipped_items(self, user_id: int) -> Dict[str, UserItem]:
+    async def get_inventory_page(self, user_id: int, item_types: Optional[List[ItemTypeEnum]] = None,
+                                 is_equipped: Optional[bool] = None, after_id: Optional[int] = None,
+                                 limit: int = 10, session: Optional[AsyncSession] = None) -> Tuple[List[UserItem], Optional[int]]:
+        """Get a page of inventory filtered by item type and equipped state.
+        
+        Pages are keyed by UserItem.id (newest first): pass the returned cursor
+        as after_id to get the next page. The cursor is None on the last page.
+        """
+        async with session_scope(session) as session:
+            query = select(UserItem).join(Item, UserItem.item_id == Item.id).where(
+                UserItem.user_id == user_id
+            )
+            
+            if item_types is not None:
+                query = query.where(Item.item_type.in_(item_types))
+            if is_equipped is not None:
+                query = query.where(UserItem.is_equipped == is_equipped)
+            if after_id is not None:
+                query = query.where(UserItem.id < after_id)
+            
+            result = await session.execute(
+                query.options(contains_eager(UserItem.item))
+                .order_by(UserItem.id.desc()).limit(limit + 1)
+            )
+            user_items = result.scalars().all()
+            
+            if len(user_items) > limit:
+                user_items = user_items[:limit]
+                return user_items, user_items[-1].id
+            return user_items, None
+    
+    async def get_inventory_summary(self, user_id: int, session: Optional[AsyncSession] = None) -> Dict[Tuple[ItemTypeEnum, bool], int]:
+        """Count user's items per (item type, equipped) pair"""
+        async with session_scope(session) as session:
+            result = await session.execute(
+                select(Item.item_type, UserItem.is_equipped, func.count(UserItem.id))
+                .join(Item, UserItem.item_id == Item.id)
+                .where(UserItem.user_id == user_id)
+                .group_by(Item.item_type, UserItem.is_equipped)
+            )
+            return {(item_type, bool(is_equipped)): count for item_type, is_equipped, count in result}
+    
+    async def get_equipped_items(self, user_id: int, session: Optional[AsyncSession] = None) -> Dict[str, UserItem]:
         """Get equipped items by type"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             result = await session.execute(
                 select(UserItem).where(
                     and_(
                         UserItem.user_id == user_id,
                         UserItem.is_equipped == True
                     )
-                )
+                ).options(joinedload(UserItem.item))
             )
-            equipped_items = result.scalars().all()
             
             # Group by item type
-            equipped_by_type = {}
-            for user_item in equipped_items:
-                await session.refresh(user_item, ['item'])
-                equipped_by_type[user_item.item.item_type.value] = user_item
-            
-            return equipped_by_type
+            return {
+                user_item.item.item_type.value: user_item
+                for user_item in result.scalars().all()
+            }
     
-    async def equip_item(self, user_id: int, user_item_id: int) -> tuple[bool, str]:
+    async def equip_item(self, user_id: int, user_item_id: int, session: Optional[AsyncSession] = None) -> tuple[bool, str]:
         """Equip an item"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             # Get the item to equip
-            user_item = await session.get(UserItem, user_item_id)
+            user_item = await session.get(UserItem, user_item_id, options=[joinedload(UserItem.item)])
             if not user_item or user_item.user_id != user_id:
                 return False, "Предмет не найден"
             
-            await session.refresh(user_item, ['item'])
             item = user_item.item
             
             # Check if item can be equipped
@@ -68,7 +108,10 @@ class InventoryService:
                     and_(
                         UserItem.user_id == user_id,
                         UserItem.is_equipped == True,
-                        UserItem.id != user_item_id
+                        UserItem.id != user_item_id,
+                        UserItem.item_id.in_(
+                            select(Item.id).where(Item.item_type == item.item_type)
+                        )
                     )
                 ).values(is_equipped=False)
                 .execution_options(synchronize_session="fetch")
@@ -78,41 +121,41 @@ class InventoryService:
             user_item.is_equipped = True
             
             # Update user stats
-            await self._update_user_stats(user_id, session)
+            await self._update_equipment_bonuses(user, session)
             
-            await session.commit()
+            await commit_session(session)
             
             logger.info(f"User {user_id} equipped {item.name}")
             return True, f"Экипировано: {item.name}"
     
-    async def unequip_item(self, user_id: int, user_item_id: int) -> tuple[bool, str]:
+    async def unequip_item(self, user_id: int, user_item_id: int, session: Optional[AsyncSession] = None) -> tuple[bool, str]:
         """Unequip an item"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             # Get the item to unequip
-            user_item = await session.get(UserItem, user_item_id)
+            user_item = await session.get(UserItem, user_item_id, options=[joinedload(UserItem.item)])
             if not user_item or user_item.user_id != user_id:
                 return False, "Предмет не найден"
             
             if not user_item.is_equipped:
                 return False, "Предмет не экипирован"
             
-            await session.refresh(user_item, ['item'])
             item = user_item.item
+            user = await session.get(User, user_id)
             
             # Unequip the item
             user_item.is_equipped = False
             
             # Update user stats
-            await self._update_user_stats(user_id, session)
+            await self._update_equipment_bonuses(user, session)
             
-            await session.commit()
+            await commit_session(session)
             
             logger.info(f"User {user_id} unequipped {item.name}")
             return True, f"Снято: {item.name}"
     
-    async def sell_item(self, user_id: int, user_item_id: int, quantity: int = 1) -> tuple[bool, str]:
+    async def sell_item(self, user_id: int, user_item_id: int, quantity: int = 1, session: Optional[AsyncSession] = None) -> tuple[bool, str]:
         """Sell an item"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             user_item = await session.get(UserItem, user_item_id)
             if not user_item or user_item.user_id != user_id:
                 return False, "Предмет не найден"
@@ -139,14 +182,14 @@ class InventoryService:
             else:
                 user_item.quantity -= quantity
             
-            await session.commit()
+            await commit_session(session)
             
             logger.info(f"User {user_id} sold {quantity}x {item.name} for {sell_price} gold")
             return True, f"Продано: {quantity}x {item.name} за {sell_price} золота"
     
-    async def use_item(self, user_id: int, user_item_id: int) -> tuple[bool, str]:
+    async def use_item(self, user_id: int, user_item_id: int, session: Optional[AsyncSession] = None) -> tuple[bool, str]:
         """Use a consumable item"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             user_item = await session.get(UserItem, user_item_id)
             if not user_item or user_item.user_id != user_id:
                 return False, "Предмет не найден"
@@ -166,7 +209,7 @@ class InventoryService:
             if "зелье здоровья" in item.name.lower() or "health" in item.name.lower():
                 heal_amount = item.hp_bonus or 30
                 old_hp = user.current_hp
-                user.current_hp = min(user.current_hp + heal_amount, user.hp)
+                user.current_hp = min(user.current_hp + heal_amount, user.max_hp)
                 actual_heal = user.current_hp - old_hp
                 effect_text = f"Восстановлено {actual_heal} HP"
                 effect_applied = True
@@ -174,7 +217,7 @@ class InventoryService:
             elif "зелье маны" in item.name.lower() or "mana" in item.name.lower():
                 mana_amount = item.mana_bonus or 25
                 old_mana = user.current_mana
-                user.current_mana = min(user.current_mana + mana_amount, user.mana)
+                user.current_mana = min(user.current_mana + mana_amount, user.max_mana)
                 actual_mana = user.current_mana - old_mana
                 effect_text = f"Восстановлено {actual_mana} маны"
                 effect_applied = True
@@ -188,89 +231,40 @@ class InventoryService:
             else:
                 user_item.quantity -= 1
             
-            await session.commit()
+            await commit_session(session)
             
             logger.info(f"User {user_id} used {item.name}")
             return True, f"Использовано: {item.name}. {effect_text}"
     
-    async def _update_user_stats(self, user_id: int, session: AsyncSession):
-        """Update user stats based on equipped items"""
-        user = await session.get(User, user_id)
-        
-        # Get all equipped items
+    async def _update_equipment_bonuses(self, user: User, session: AsyncSession):
+        """Recalculate cached equipment bonuses with one joined query"""
         result = await session.execute(
-            select(UserItem).where(
+            select(
+                func.coalesce(func.sum(Item.strength_bonus), 0),
+                func.coalesce(func.sum(Item.armor_bonus), 0),
+                func.coalesce(func.sum(Item.hp_bonus), 0),
+                func.coalesce(func.sum(Item.agility_bonus), 0),
+                func.coalesce(func.sum(Item.mana_bonus), 0)
+            ).select_from(UserItem).join(Item, UserItem.item_id == Item.id).where(
                 and_(
-                    UserItem.user_id == user_id,
+                    UserItem.user_id == user.id,
                     UserItem.is_equipped == True
                 )
             )
         )
-        equipped_items = result.scalars().all()
         
-        # Calculate total bonuses from equipped items
-        total_strength_bonus = 0
-        total_armor_bonus = 0
-        total_hp_bonus = 0
-        total_agility_bonus = 0
-        total_mana_bonus = 0
+        (user.bonus_strength, user.bonus_armor, user.bonus_hp,
+         user.bonus_agility, user.bonus_mana) = result.one()
         
-        for user_item in equipped_items:
-            await session.refresh(user_item, ['item'])
-            item = user_item.item
-            
-            total_strength_bonus += item.strength_bonus or 0
-            total_armor_bonus += item.armor_bonus or 0
-            total_hp_bonus += item.hp_bonus or 0
-            total_agility_bonus += item.agility_bonus or 0
-            total_mana_bonus += item.mana_bonus or 0
+        # Unequipping can lower the maximums
+        user.current_hp = min(user.current_hp, user.max_hp)
+        user.current_mana = min(user.current_mana, user.max_mana)
         
-        # For now, we need to extend the User model to store base stats and equipment bonuses
-        # Since this is a complex change, let's implement a simple solution:
-        # We'll store the current total stats (base + equipment) in the existing fields
-        
-        # Get base stats from level and distributed points
-        from config.settings import GameConstants
-        from utils.formulas import GameFormulas
-        
-        base_stats = GameConstants.BASE_STATS.copy()
-        stat_points = GameFormulas.stat_points_for_level(user.level)
-        
-        # This is simplified - in a real system you'd track base stats separately
-        # For now, we just ensure minimum stats with equipment bonuses
-        min_strength = base_stats['strength'] + total_strength_bonus
-        min_armor = base_stats['armor'] + total_armor_bonus
-        min_hp = base_stats['hp'] + total_hp_bonus
-        min_agility = base_stats['agility'] + total_agility_bonus
-        min_mana = base_stats['mana'] + total_mana_bonus
-        
-        # Apply bonuses if they would increase stats
-        if user.strength < min_strength:
-            user.strength = min_strength
-        if user.armor < min_armor:
-            user.armor = min_armor
-        if user.hp < min_hp:
-            old_max_hp = user.hp
-            user.hp = min_hp
-            # Proportionally adjust current HP
-            if old_max_hp > 0:
-                hp_ratio = user.current_hp / old_max_hp
-                user.current_hp = int(user.hp * hp_ratio)
-        if user.agility < min_agility:
-            user.agility = min_agility
-        if user.mana < min_mana:
-            old_max_mana = user.mana
-            user.mana = min_mana
-            # Proportionally adjust current mana
-            if old_max_mana > 0:
-                mana_ratio = user.current_mana / old_max_mana
-                user.current_mana = int(user.mana * mana_ratio)
-        
-        logger.info(f"Updated stats for user {user_id}: STR+{total_strength_bonus}, ARM+{total_armor_bonus}, HP+{total_hp_bonus}, AGI+{total_agility_bonus}, MANA+{total_mana_bonus}")
-        
-    async def get_inventory_stats(self, user_id: int) -> dict:
+        logger.info(f"Updated stats for user {user.id}: STR+{user.bonus_strength}, ARM+{user.bonus_armor}, HP+{user.bonus_hp}, AGI+{user.bonus_agility}, MANA+{user.bonus_mana}")
+    
+    async def get_inventory_stats(self, user_id: int, session: Optional[AsyncSession] = None) -> dict:
         """Get inventory statistics"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             total_items = await session.scalar(
                 select(func.count(UserItem.id)).where(UserItem.user_id == user_id)
             )
@@ -4,6 +4,7 @@ from config.database import AsyncSessionLocal
 from models.kingdom_war import KingdomWar, WarParticipation, WarStatusEnum, WarTypeEnum
 from models.user import User, KingdomEnum
 from services.user_service import UserService
+from services.war_squad_service import WarSquadService
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 import logging
@@ -15,6 +16,7 @@ logger = logging.getLogger(__name__)
 class KingdomWarService:
     def __init__(self):
         self.user_service = UserService()
+        self.squad_service = WarSquadService()
         # Ташкентский timezone
         self.tashkent_tz = pytz.timezone('Asia/Tashkent')
         # Время войн: 8:00, 13:00, 18:00 по Ташкентскому времени
@@ -92,23 +94,8 @@ class KingdomWarService:
             if existing:
                 return False, "Вы уже участвуете в этой войне"
             
-            # Add to attack squad
-            attack_squads = war.get_attack_squads()
+            # The participation record is the squad membership
             user_kingdom = user.kingdom.value
-            
-            if user_kingdom not in attack_squads:
-                attack_squads[user_kingdom] = []
-            
-            attack_squads[user_kingdom].append(user_id)
-            war.set_attack_squads(attack_squads)
-            
-            # Add attacking kingdom to list
-            attacking_kingdoms = war.get_attacking_kingdoms()
-            if user_kingdom not in attacking_kingdoms:
-                attacking_kingdoms.append(user_kingdom)
-                war.set_attacking_kingdoms(attacking_kingdoms)
-            
-            # Create participation record
             participation = WarParticipation(
                 war_id=war.id,
                 user_id=user_id,
@@ -117,15 +104,7 @@ class KingdomWarService:
             )
             
             # Store player stats
-            player_stats = {
-                'strength': user.strength,
-                'armor': user.armor,
-                'hp': user.hp,
-                'agility': user.agility,
-                'mana': user.mana,
-                'level': user.level
-            }
-            participation.set_player_stats(player_stats)
+            participation.set_player_stats(user.effective_stats)
             
             session.add(participation)
             await session.commit()
@@ -168,12 +147,7 @@ class KingdomWarService:
             if existing:
                 return False, "Вы уже участвуете в защите"
             
-            # Add to defense squad
-            defense_squad = war.get_defense_squad()
-            defense_squad.append(user_id)
-            war.set_defense_squad(defense_squad)
-            
-            # Create participation record
+            # The participation record is the squad membership
             participation = WarParticipation(
                 war_id=war.id,
                 user_id=user_id,
@@ -182,15 +156,7 @@ class KingdomWarService:
             )
             
             # Store player stats
-            player_stats = {
-                'strength': user.strength,
-                'armor': user.armor,
-                'hp': user.hp,
-                'agility': user.agility,
-                'mana': user.mana,
-                'level': user.level
-            }
-            participation.set_player_stats(player_stats)
+            participation.set_player_stats(user.effective_stats)
             
             session.add(participation)
             await session.commit()
@@ -206,7 +172,7 @@ class KingdomWarService:
                 return False
             
             # Check if there are attackers
-            attacking_kingdoms = war.get_attacking_kingdoms()
+            attacking_kingdoms = await self.squad_service.get_attacking_kingdoms(war.id, session)
             if not attacking_kingdoms:
                 # No attackers, cancel war
                 war.status = WarStatusEnum.finished
@@ -236,7 +202,7 @@ class KingdomWarService:
     
     async def _calculate_kingdom_stats(self, war: KingdomWar, session: AsyncSession):
         """Calculate total stats for each kingdom"""
-        attack_squads = war.get_attack_squads()
+        attack_squads = await self.squad_service.get_attack_squads(war.id, session)
         total_attack_stats = {}
         
         # Calculate attack stats for each kingdom
@@ -274,7 +240,7 @@ class KingdomWarService:
         war.set_total_attack_stats(total_attack_stats)
         
         # Calculate defense stats
-        defense_squad = war.get_defense_squad()
+        defense_squad = await self.squad_service.get_defense_squad(war.id, session)
         defense_stats = {
             'total_strength': 0,
             'total_armor': 0,
@@ -391,7 +357,7 @@ class KingdomWarService:
     async def _calculate_money_transfer(self, war: KingdomWar, winning_kingdom: str, session: AsyncSession) -> int:
         """Calculate money to transfer from defenders to attackers"""
         # Get all defenders
-        defense_squad = war.get_defense_squad()
+        defense_squad = await self.squad_service.get_defense_squad(war.id, session)
         
         if not defense_squad:
             return 0
@@ -412,6 +378,7 @@ class KingdomWarService:
         """Apply money and experience rewards to participants"""
         money_transfers = war.get_money_transferred()
         attack_stats = war.get_total_attack_stats()
+        attack_squads = await self.squad_service.get_attack_squads(war.id, session)
         
         exp_distribution = {}
         
@@ -420,7 +387,7 @@ class KingdomWarService:
                 continue
             
             kingdom_stats = attack_stats[kingdom]
-            squad = war.get_attack_squads().get(kingdom, [])
+            squad = attack_squads.get(kingdom, [])
             
             if not squad:
                 continue
@@ -464,7 +431,7 @@ class KingdomWarService:
                 user = await session.get(User, user_id)
                 if user:
                     user.money += money_reward
-                    await self.user_service.add_experience(user_id, exp_reward)
+                    await self.user_service.add_experience(user_id, exp_reward, session=session)
                 
                 # Store in participation record
                 participation.money_gained = money_reward
@@ -0,0 +1,166 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import session_scope
+from models.interactive_battle import InteractiveBattle, BattleModeEnum, BattlePhaseEnum
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Phases in which a round waits for player choices
+SELECTION_PHASES = (BattlePhaseEnum.attack_selection, BattlePhaseEnum.dodge_selection)
+
+TimeoutCallback = Callable[[int], Awaitable]
+
+def round_deadline(battle: InteractiveBattle) -> datetime:
+    """Naive UTC time at which the current round times out"""
+    return battle.round_start_time + timedelta(seconds=battle.round_timeout or 50)
+
+class RoundTimer:
+    """Round deadlines of interactive battles, served by a single task.
+    
+    Each battle has at most one pending deadline. Entries sit in a heap;
+    rescheduling or cancelling marks the old entry dead in O(1) and dead
+    entries are skipped when they reach the top, or compacted away once they
+    outnumber the live ones. The task sleeps until the earliest deadline and
+    calls the entry's callback with the battle id.
+    """
+    
+    def __init__(self):
+        self._heap: List[list] = []
+        self._entries: Dict[int, list] = {}
+        self._dead = 0
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def __contains__(self, battle_id: int) -> bool:
+        return battle_id in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def schedule(self, battle_id: int, deadline: datetime, callback: TimeoutCallback):
+        """Call callback(battle_id) at deadline (naive UTC), replacing a pending deadline"""
+        self.cancel(battle_id)
+        
+        delay = (deadline - datetime.utcnow()).total_seconds()
+        entry = [time.monotonic() + delay, next(self._counter), battle_id, callback]
+        self._entries[battle_id] = entry
+        heapq.heappush(self._heap, entry)
+        
+        # The task may be sleeping towards a later deadline
+        if self._heap[0] is entry:
+            self._wakeup.set()
+    
+    def cancel(self, battle_id: int) -> bool:
+        """Drop the pending deadline of a battle"""
+        entry = self._entries.pop(battle_id, None)
+        if entry is None:
+            return False
+        
+        entry[-1] = None
+        self._dead += 1
+        if self._dead > len(self._entries):
+            self._heap = [entry for entry in self._heap if entry[-1] is not None]
+            heapq.heapify(self._heap)
+            self._dead = 0
+        return True
+    
+    def arm(self, battle: InteractiveBattle, callback: TimeoutCallback, deadline: datetime = None):
+        """Time out the battle's current round, or cancel once it no longer waits for choices"""
+        if battle.phase in SELECTION_PHASES and battle.round_start_time:
+            self.schedule(battle.id, deadline or round_deadline(battle), callback)
+        else:
+            self.cancel(battle.id)
+    
+    async def rebuild(self, callbacks: Dict[BattleModeEnum, TimeoutCallback],
+                      session: Optional[AsyncSession] = None) -> int:
+        """Schedule the rounds left waiting by the last shutdown, callbacks by battle mode"""
+        async with session_scope(session) as session:
+            result = await session.execute(
+                select(
+                    InteractiveBattle.id,
+                    InteractiveBattle.mode,
+                    InteractiveBattle.round_start_time,
+                    InteractiveBattle.round_timeout
+                ).where(
+                    InteractiveBattle.phase.in_(SELECTION_PHASES),
+                    InteractiveBattle.round_start_time.isnot(None)
+                )
+            )
+            rows = result.all()
+        
+        scheduled = 0
+        for battle_id, mode, round_start_time, round_timeout in rows:
+            callback = callbacks.get(mode)
+            if callback is None:
+                continue
+            self.schedule(battle_id, round_start_time + timedelta(seconds=round_timeout or 50), callback)
+            scheduled += 1
+        
+        logger.info(f"Round timer rebuilt: {scheduled} pending round deadlines")
+        return scheduled
+    
+    def _pop_due(self) -> List[list]:
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if entry[-1] is None:
+                self._dead -= 1
+                continue
+            del self._entries[entry[2]]
+            due.append(entry)
+        return due
+    
+    def _next_delay(self) -> Optional[float]:
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+            self._dead -= 1
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+    
+    async def _fire(self, due: List[list]):
+        results = await asyncio.gather(
+            *[callback(battle_id) for _, _, battle_id, callback in due],
+            return_exceptions=True
+        )
+        for (_, _, battle_id, _), result in zip(due, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error handling round timeout of battle {battle_id}: {result}")
+    
+    async def _run(self):
+        while True:
+            due = self._pop_due()
+            if due:
+                await self._fire(due)
+                continue
+            
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self):
+        """Start serving deadlines"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Round timer started ({len(self._entries)} pending deadlines)")
+    
+    def stop(self):
+        """Stop serving deadlines, pending ones are rebuilt on the next start"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        logger.info("Round timer stopped")
+
+# Global round timer instance
+round_timer = RoundTimer()
@@ -0,0 +1,108 @@
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import session_scope
+from config.settings import settings
+from models.item import Item, ItemTypeEnum
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CatalogSnapshot:
+    """Immutable view of the item catalog at one catalog version.
+    
+    Items are detached transient copies. Shop items are indexed per category
+    and sorted by price, then level, so a page is a tuple slice.
+    """
+    
+    def __init__(self, version: int, items: Tuple[Item, ...]):
+        self.version = version
+        self.items_by_id: Dict[int, Item] = {item.id: item for item in items}
+        
+        shop_items = sorted(
+            (item for item in items if item.is_available_in_shop),
+            key=lambda item: (item.price, item.level_required, item.id)
+        )
+        self.categories: Dict[str, Tuple[Item, ...]] = {
+            item_type.value: tuple(item for item in shop_items if item.item_type == item_type)
+            for item_type in ItemTypeEnum
+        }
+        self.categories['all'] = tuple(shop_items)
+        self.counts: Dict[str, int] = {
+            item_type.value: len(self.categories[item_type.value]) for item_type in ItemTypeEnum
+        }
+    
+    def get_item(self, item_id: int) -> Optional[Item]:
+        return self.items_by_id.get(item_id)
+    
+    def get_page(self, category: str, page: int, per_page: int) -> Tuple[Tuple[Item, ...], bool]:
+        """Items of the page and whether a next page exists"""
+        items = self.categories.get(category or 'all', ())
+        offset = (max(page, 1) - 1) * per_page
+        return items[offset:offset + per_page], offset + per_page < len(items)
+
+class ShopCatalog:
+    """Process-wide catalog snapshot, reloaded when catalog_meta.version changes.
+    
+    The version is bumped by triggers on the items table (see migration 5) and
+    is checked at most once per check interval, so browsing the shop between
+    checks does no database I/O.
+    """
+    
+    def __init__(self, check_interval: int = None):
+        self.check_interval = check_interval if check_interval is not None else settings.SHOP_CATALOG_CHECK_INTERVAL
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+    
+    @staticmethod
+    async def _read_version(session: AsyncSession) -> int:
+        return await session.scalar(text("SELECT version FROM catalog_meta WHERE id = 1")) or 0
+    
+    @staticmethod
+    def _copy(item: Item) -> Item:
+        """Copy column values into a new transient Item"""
+        return Item(**{column.key: getattr(item, column.key) for column in Item.__table__.columns})
+    
+    async def load(self, session: Optional[AsyncSession] = None) -> CatalogSnapshot:
+        """Build a new snapshot from the items table"""
+        async with session_scope(session) as session:
+            version = await self._read_version(session)
+            result = await session.scalars(select(Item).order_by(Item.id))
+            items = tuple(self._copy(item) for item in result)
+        
+        self._snapshot = CatalogSnapshot(version, items)
+        self._checked_at = time.monotonic()
+        logger.info(f"Shop catalog loaded: {len(items)} items, version {version}")
+        return self._snapshot
+    
+    async def get(self, session: Optional[AsyncSession] = None) -> CatalogSnapshot:
+        """Current snapshot, reloaded if the catalog version changed"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+        
+        async with self._lock:
+            if self._snapshot is not snapshot:
+                # Reloaded by a concurrent caller
+                return self._snapshot
+            
+            async with session_scope(session) as session:
+                if snapshot is None or await self._read_version(session) != snapshot.version:
+                    return await self.load(session)
+            
+            self._checked_at = time.monotonic()
+            return snapshot
+    
+    def invalidate(self):
+        """Force a version check on the next access"""
+        self._checked_at = 0.0
+
+# Global shop catalog instance
+shop_catalog = ShopCatalog()
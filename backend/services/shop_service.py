@@ -1,10 +1,11 @@
 from sqlalchemy import select, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from config.database import AsyncSessionLocal
+from config.database import session_scope, commit_session
 from models.item import Item, UserItem, ItemTypeEnum, RarityEnum
 from models.user import User
 from services.user_service import UserService
-from typing import List, Optional
+from services.shop_catalog import shop_catalog
+from typing import List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,45 +14,28 @@ class ShopService:
     def __init__(self):
         self.user_service = UserService()
     
-    async def get_shop_items(self, item_type: str = None, page: int = 1, items_per_page: int = 8) -> List[Item]:
+    async def get_shop_items(self, item_type: str = None, page: int = 1, items_per_page: int = 8, session: Optional[AsyncSession] = None) -> List[Item]:
         """Get items available in shop"""
-        async with AsyncSessionLocal() as session:
-            query = select(Item).where(Item.is_available_in_shop == True)
-            
-            if item_type and item_type != "all":
-                query = query.where(Item.item_type == item_type)
-            
-            # Add pagination
-            offset = (page - 1) * items_per_page
-            query = query.offset(offset).limit(items_per_page)
-            
-            result = await session.execute(query)
-            return result.scalars().all()
+        items, _ = await self.get_shop_page(item_type, page, items_per_page, session=session)
+        return items
+    
+    async def get_shop_page(self, item_type: str = None, page: int = 1, items_per_page: int = 8, session: Optional[AsyncSession] = None) -> Tuple[List[Item], bool]:
+        """Get a page of shop items sorted by price and level, and whether more pages follow"""
+        catalog = await shop_catalog.get(session)
+        items, has_next = catalog.get_page(item_type or 'all', page, items_per_page)
+        return list(items), has_next
     
-    async def get_shop_categories(self) -> dict:
+    async def get_shop_categories(self, session: Optional[AsyncSession] = None) -> dict:
         """Get shop categories with item counts"""
-        async with AsyncSessionLocal() as session:
-            categories = {}
-            
-            for item_type in ItemTypeEnum:
-                count = await session.scalar(
-                    select(func.count(Item.id)).where(
-                        and_(
-                            Item.is_available_in_shop == True,
-                            Item.item_type == item_type
-                        )
-                    )
-                )
-                categories[item_type.value] = count or 0
-            
-            return categories
+        catalog = await shop_catalog.get(session)
+        return dict(catalog.counts)
     
-    async def buy_item(self, user_id: int, item_id: int, quantity: int = 1) -> tuple[bool, str]:
+    async def buy_item(self, user_id: int, item_id: int, quantity: int = 1, session: Optional[AsyncSession] = None) -> tuple[bool, str]:
         """Buy item from shop"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             # Get user and item
             user = await session.get(User, user_id)
-            item = await session.get(Item, item_id)
+            item = (await shop_catalog.get(session)).get_item(item_id)
             
             if not user:
                 return False, "Пользователь не найден"
@@ -107,12 +91,12 @@ class ShopService:
             # Deduct money
             user.money -= total_cost
             
-            await session.commit()
+            await commit_session(session)
             
             logger.info(f"User {user.name} bought {quantity}x {item.name} for {total_cost} gold")
             return True, f"Куплено: {quantity}x {item.name}"
     
-    async def get_item_info(self, item_id: int) -> Optional[Item]:
+    async def get_item_info(self, item_id: int, session: Optional[AsyncSession] = None) -> Optional[Item]:
         """Get detailed item information"""
-        async with AsyncSessionLocal() as session:
-            return await session.get(Item, item_id)
\ No newline at end of file
+        catalog = await shop_catalog.get(session)
+        return catalog.get_item(item_id)
\ No newline at end of file
@@ -0,0 +1,97 @@
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from models.interactive_battle import InteractiveBattle
+from models.skill import UserSkill, SkillTypeEnum
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LoadoutSkill(NamedTuple):
+    """What auto-casting needs of one learned skill"""
+    user_skill_id: int
+    name: str
+    skill_type: SkillTypeEnum
+    priority: int
+    mana_cost: int
+    heal_amount: int
+    status_effect: Optional[str]
+
+class SkillLoadout:
+    """A player's skills for one battle, in auto-cast priority order.
+    
+    Casts are counted in memory and written once by flush_skill_usage when
+    the battle finishes.
+    """
+    
+    def __init__(self, user_id: int, skills: List[LoadoutSkill]):
+        self.user_id = user_id
+        self.skills = sorted(skills, key=lambda skill: skill.priority)
+        self.uses: Dict[int, int] = {}
+        self.last_used: Dict[int, datetime] = {}
+    
+    def __bool__(self) -> bool:
+        return bool(self.skills)
+    
+    def record_use(self, skill: LoadoutSkill):
+        self.uses[skill.user_skill_id] = self.uses.get(skill.user_skill_id, 0) + 1
+        self.last_used[skill.user_skill_id] = datetime.utcnow()
+
+async def get_loadouts(battle: InteractiveBattle, user_ids: Iterable[int],
+                       session: AsyncSession) -> Dict[int, SkillLoadout]:
+    """Loadouts of the battle's players, loaded on first use and kept on the live battle"""
+    loadouts = battle.skill_loadouts
+    missing = [user_id for user_id in user_ids if user_id not in loadouts]
+    
+    if missing:
+        result = await session.scalars(
+            select(UserSkill).options(selectinload(UserSkill.skill)).where(
+                UserSkill.user_id.in_(missing)
+            )
+        )
+        skills: Dict[int, List[LoadoutSkill]] = {user_id: [] for user_id in missing}
+        for user_skill in result:
+            skill = user_skill.skill
+            skills[user_skill.user_id].append(LoadoutSkill(
+                user_skill_id=user_skill.id,
+                name=skill.name,
+                skill_type=skill.skill_type,
+                priority=skill.priority,
+                mana_cost=skill.mana_cost,
+                heal_amount=skill.heal_amount or 0,
+                status_effect=skill.status_effect
+            ))
+        
+        for user_id, user_skills in skills.items():
+            loadouts[user_id] = SkillLoadout(user_id, user_skills)
+    
+    return {user_id: loadouts[user_id] for user_id in user_ids}
+
+async def flush_skill_usage(battle: InteractiveBattle, session: AsyncSession) -> int:
+    """Write the battle's cast counters in one batch, returns skills updated"""
+    rows = [
+        {'b_id': user_skill_id, 'b_uses': uses, 'b_last_used': loadout.last_used[user_skill_id]}
+        for loadout in battle.skill_loadouts.values()
+        for user_skill_id, uses in loadout.uses.items()
+    ]
+    if not rows:
+        return 0
+    
+    table = UserSkill.__table__
+    await session.execute(
+        update(table).where(table.c.id == bindparam('b_id')).values(
+            times_used=func.coalesce(table.c.times_used, 0) + bindparam('b_uses'),
+            last_used=bindparam('b_last_used')
+        ),
+        rows
+    )
+    
+    # Counted once, a flushed battle starts over
+    for loadout in battle.skill_loadouts.values():
+        loadout.uses.clear()
+        loadout.last_used.clear()
+    
+    logger.debug(f"Battle {battle.id}: flushed usage of {len(rows)} skills")
+    return len(rows)
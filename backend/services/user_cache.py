@@ -0,0 +1,134 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from config.settings import settings
+from models.user import User
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """Bounded in-process LRU cache of detached User snapshots with a TTL.
+    
+    Snapshots are transient User objects that belong to no session, so they
+    can be handed to any request. Writes invalidate entries through the
+    session events registered below.
+    """
+    
+    def __init__(self, max_size: int = None, ttl: int = None):
+        self.max_size = max_size or settings.USER_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else settings.USER_CACHE_TTL
+        self._entries: "OrderedDict[int, Tuple[float, User]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_id: int) -> Optional[User]:
+        """Get cached snapshot or None if missing/expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return snapshot
+    
+    def put(self, user: User) -> Optional[User]:
+        """Store a detached snapshot of user, returns the snapshot"""
+        snapshot = self._snapshot(user)
+        if snapshot is None:
+            return None
+        
+        self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+        self._entries.move_to_end(snapshot.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return snapshot
+    
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+    
+    def invalidate_many(self, user_ids: Iterable[int]):
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Cache hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+    
+    @staticmethod
+    def _snapshot(user: User) -> Optional[User]:
+        """Copy loaded column values into a new transient User"""
+        loaded = inspect(user).dict
+        values = {}
+        for column in User.__table__.columns:
+            if column.key not in loaded:
+                # Partially loaded/expired instance, don't cache it
+                return None
+            values[column.key] = loaded[column.key]
+        return User(**values)
+
+# Global user cache instance
+user_cache = UserCache()
+
+def _collect_user_ids(session: Session) -> set:
+    return {
+        obj.id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+
+@event.listens_for(Session, "before_flush")
+def _track_user_writes(session, flush_context, instances):
+    """Remember users written in this transaction and drop their entries"""
+    user_ids = _collect_user_ids(session)
+    if user_ids:
+        session.info.setdefault('stale_user_ids', set()).update(user_ids)
+        user_cache.invalidate_many(user_ids)
+
+def invalidate_after_commit(session, user_ids: Optional[Iterable[int]] = None):
+    """Invalidate users changed by a bulk UPDATE that bypasses the flush events.
+    
+    Without user_ids the whole cache is cleared, now and again after commit.
+    """
+    if user_ids is None:
+        session.info['clear_user_cache'] = True
+        user_cache.clear()
+        return
+    
+    user_ids = set(user_ids)
+    session.info.setdefault('stale_user_ids', set()).update(user_ids)
+    user_cache.invalidate_many(user_ids)
+
+def _drop_stale_entries(session):
+    if session.info.pop('clear_user_cache', False):
+        user_cache.clear()
+    user_ids = session.info.pop('stale_user_ids', None)
+    if user_ids:
+        user_cache.invalidate_many(user_ids)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    """Drop entries again once the write is visible to other connections"""
+    _drop_stale_entries(session)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _invalidate_after_rollback(session, previous_transaction):
+    _drop_stale_entries(session)
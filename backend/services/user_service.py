@@ -1,7 +1,8 @@
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from config.database import AsyncSessionLocal
+from config.database import session_scope, commit_session
 from models.user import User
+from services.user_cache import user_cache
 from utils.formulas import GameFormulas
 from config.settings import settings
 from typing import Optional
@@ -13,17 +14,25 @@ class UserService:
     def __init__(self):
         pass
     
-    async def get_user(self, telegram_id: int) -> Optional[User]:
-        """Get user by Telegram ID"""
-        async with AsyncSessionLocal() as session:
+    async def get_user(self, telegram_id: int, session: Optional[AsyncSession] = None) -> Optional[User]:
+        """Get user by Telegram ID (read-through cache)"""
+        cached = user_cache.get(telegram_id)
+        if cached is not None:
+            return cached
+        
+        async with session_scope(session) as session:
             result = await session.execute(
                 select(User).where(User.id == telegram_id)
             )
-            return result.scalar_one_or_none()
+            user = result.scalar_one_or_none()
+            if user:
+                user_cache.put(user)
+            return user
     
-    async def create_user(self, telegram_id: int, name: str, gender: str, kingdom: str) -> User:
+    async def create_user(self, telegram_id: int, name: str, gender: str, kingdom: str,
+                          session: Optional[AsyncSession] = None) -> User:
         """Create new user"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             user = User(
                 id=telegram_id,
                 name=name,
@@ -33,42 +42,48 @@ class UserService:
                 inventory_size=settings.STARTING_INVENTORY_SIZE
             )
             session.add(user)
-            await session.commit()
+            await commit_session(session)
             await session.refresh(user)
             logger.info(f"Created new user: {user.name} (ID: {telegram_id})")
             return user
     
-    async def update_user(self, telegram_id: int, **kwargs) -> bool:
+    async def update_user(self, telegram_id: int, session: Optional[AsyncSession] = None, **kwargs) -> bool:
         """Update user fields"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             result = await session.execute(
                 update(User).where(User.id == telegram_id).values(**kwargs)
             )
-            await session.commit()
+            await commit_session(session)
+            # Bulk UPDATE bypasses the flush events, invalidate explicitly
+            user_cache.invalidate(telegram_id)
             return result.rowcount > 0
     
-    async def add_experience(self, user_id: int, exp: int) -> bool:
+    async def add_experience(self, user_id: int, exp: int, session: Optional[AsyncSession] = None) -> bool:
         """Add experience and check for level up"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             user = await session.get(User, user_id)
             if not user:
                 return False
             
-            user.experience += exp
-            
-            # Check for level up
-            while user.experience >= GameFormulas.experience_for_level(user.level + 1):
-                user.experience -= GameFormulas.experience_for_level(user.level + 1)
-                user.level += 1
-                user.free_stat_points += settings.STAT_POINTS_PER_LEVEL
-                logger.info(f"User {user.name} leveled up to {user.level}")
+            self.apply_experience(user, exp)
             
-            await session.commit()
+            await commit_session(session)
             return True
     
-    async def distribute_stat_points(self, user_id: int, stats: dict) -> bool:
+    def apply_experience(self, user: User, exp: int):
+        """Add experience to a loaded user and level up, without flushing"""
+        user.experience += exp
+        
+        # Check for level up
+        while user.experience >= GameFormulas.experience_for_level(user.level + 1):
+            user.experience -= GameFormulas.experience_for_level(user.level + 1)
+            user.level += 1
+            user.free_stat_points += settings.STAT_POINTS_PER_LEVEL
+            logger.info(f"User {user.name} leveled up to {user.level}")
+    
+    async def distribute_stat_points(self, user_id: int, stats: dict, session: Optional[AsyncSession] = None) -> bool:
         """Distribute stat points"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             user = await session.get(User, user_id)
             if not user:
                 return False
@@ -83,12 +98,13 @@ class UserService:
                     setattr(user, stat, getattr(user, stat) + points)
             
             user.free_stat_points -= total_points
-            await session.commit()
+            await commit_session(session)
             return True
     
-    async def restore_hp_mana(self, user_id: int, hp: int = None, mana: int = None) -> bool:
+    async def restore_hp_mana(self, user_id: int, hp: int = None, mana: int = None,
+                              session: Optional[AsyncSession] = None) -> bool:
         """Restore HP and/or mana"""
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             user = await session.get(User, user_id)
             if not user:
                 return False
@@ -99,15 +115,15 @@ class UserService:
             if mana is not None:
                 user.current_mana = min(user.current_mana + mana, user.max_mana)
             
-            await session.commit()
+            await commit_session(session)
             return True
     
-    async def update_last_active(self, user_id: int) -> bool:
+    async def update_last_active(self, user_id: int, session: Optional[AsyncSession] = None) -> bool:
         """Update last active timestamp"""
         from sqlalchemy import func
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             result = await session.execute(
                 update(User).where(User.id == user_id).values(last_active=func.now())
             )
-            await session.commit()
-            return result.rowcount > 0
\ No newline at end of file
+            await commit_session(session)
+            return result.rowcount > 0
@@ -0,0 +1,141 @@
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import session_scope
+from models.kingdom_war import KingdomWar, WarStatusEnum
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import pytz
+import logging
+
+logger = logging.getLogger(__name__)
+
+WAR_TIMEZONE = pytz.timezone('Asia/Tashkent')
+WAR_HOURS = (8, 13, 18)
+
+class WarSlot(NamedTuple):
+    """One war time: a Tashkent calendar date and hour"""
+    date: date
+    hour: int
+    
+    @property
+    def local_time(self) -> datetime:
+        return WAR_TIMEZONE.localize(datetime.combine(self.date, datetime.min.time().replace(hour=self.hour)))
+    
+    @property
+    def utc_time(self) -> datetime:
+        """Naive UTC, as kingdom_wars.scheduled_time is stored"""
+        return self.local_time.astimezone(pytz.UTC).replace(tzinfo=None)
+    
+    @property
+    def key(self) -> str:
+        """Callback data form, YYYYMMDD_HH"""
+        return self.local_time.strftime('%Y%m%d_%H')
+    
+    @classmethod
+    def from_key(cls, key: str) -> Optional['WarSlot']:
+        try:
+            parsed = datetime.strptime(key, "%Y%m%d_%H")
+        except ValueError:
+            return None
+        return cls(parsed.date(), parsed.hour)
+    
+    @classmethod
+    def from_time(cls, moment: datetime) -> 'WarSlot':
+        """Slot of a war time, naive values are UTC"""
+        if moment.tzinfo is None:
+            moment = pytz.UTC.localize(moment)
+        local = moment.astimezone(WAR_TIMEZONE)
+        return cls(local.date(), local.hour)
+
+class WarCalendar:
+    """War slots and the scheduled wars in them.
+    
+    Wars of a slot share one scheduled_time, so a slot is an equality lookup on
+    the (status, scheduled_time) index. War ids of upcoming slots are cached
+    per defending kingdom, joins resolve their war without a query.
+    """
+    
+    def __init__(self, hours: Tuple[int, ...] = WAR_HOURS):
+        self.hours = tuple(sorted(hours))
+        self._war_ids: Dict[WarSlot, Dict[str, int]] = {}
+    
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(WAR_TIMEZONE)
+    
+    def slots_for_date(self, day: date) -> List[WarSlot]:
+        return [WarSlot(day, hour) for hour in self.hours]
+    
+    def upcoming_slots(self, count: int = 3, now: datetime = None) -> List[WarSlot]:
+        """Next war slots strictly after now, in order"""
+        now = now or self.now()
+        if now.tzinfo is None:
+            now = pytz.UTC.localize(now)
+        
+        slots = []
+        day = now.astimezone(WAR_TIMEZONE).date()
+        while len(slots) < count:
+            slots.extend(slot for slot in self.slots_for_date(day) if slot.local_time > now)
+            day += timedelta(days=1)
+        return slots[:count]
+    
+    def next_slot(self, now: datetime = None) -> WarSlot:
+        return self.upcoming_slots(1, now)[0]
+    
+    @staticmethod
+    def day_bounds(day: date) -> Tuple[datetime, datetime]:
+        """Naive UTC range of a Tashkent calendar day"""
+        start = WAR_TIMEZONE.localize(datetime.combine(day, datetime.min.time()))
+        end = WAR_TIMEZONE.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+        return (
+            start.astimezone(pytz.UTC).replace(tzinfo=None),
+            end.astimezone(pytz.UTC).replace(tzinfo=None)
+        )
+    
+    async def get_slot_wars(self, slot: WarSlot, session: Optional[AsyncSession] = None) -> List[KingdomWar]:
+        """Scheduled wars of a slot"""
+        async with session_scope(session) as session:
+            result = await session.scalars(
+                select(KingdomWar).where(
+                    and_(
+                        KingdomWar.status == WarStatusEnum.scheduled,
+                        KingdomWar.scheduled_time == slot.utc_time
+                    )
+                ).order_by(KingdomWar.id)
+            )
+            return list(result)
+    
+    async def get_war_id(self, slot: WarSlot, defending_kingdom: str,
+                         session: Optional[AsyncSession] = None) -> Optional[int]:
+        """Id of the war against a kingdom in a slot, cached per slot"""
+        war_ids = self._war_ids.get(slot)
+        if war_ids is None:
+            async with session_scope(session) as session:
+                result = await session.execute(
+                    select(KingdomWar.defending_kingdom, KingdomWar.id).where(
+                        and_(
+                            KingdomWar.status == WarStatusEnum.scheduled,
+                            KingdomWar.scheduled_time == slot.utc_time
+                        )
+                    )
+                )
+                war_ids = dict(result.all())
+            
+            # Slots that are not scheduled yet are looked up again next time
+            if war_ids:
+                self._drop_past_slots()
+                self._war_ids[slot] = war_ids
+        
+        return war_ids.get(defending_kingdom)
+    
+    def forget(self, slot: WarSlot):
+        """Drop cached war ids of a slot, e.g. after scheduling it"""
+        self._war_ids.pop(slot, None)
+    
+    def _drop_past_slots(self):
+        now = self.now()
+        for slot in [slot for slot in self._war_ids if slot.local_time < now]:
+            del self._war_ids[slot]
+
+# Global war calendar instance
+war_calendar = WarCalendar()
@@ -0,0 +1,115 @@
+from config.database import AsyncSessionLocal
+from config.settings import settings
+from models.kingdom_war import KingdomWar
+from services.war_squad_service import WarSquadService
+from services.war_registry import war_registry
+from typing import Awaitable, Callable, Dict, List
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WarExecutor:
+    """Runs the wars of one time slot concurrently.
+    
+    A war touches its defending kingdom and every attacking kingdom: settlement
+    rewrites the defenders' balances and rewards credit the attackers. Wars
+    sharing a kingdom are serialized with per-kingdom locks, taken in sorted
+    order so they cannot deadlock; wars on disjoint kingdoms overlap, bounded
+    by max_concurrency.
+    """
+    
+    def __init__(self, war_service, max_concurrency: int = None):
+        self.war_service = war_service
+        self.squad_service = WarSquadService()
+        self.max_concurrency = max_concurrency or settings.WAR_MAX_CONCURRENCY
+        self._kingdom_locks: Dict[str, asyncio.Lock] = {}
+    
+    def _lock_for(self, kingdom: str) -> asyncio.Lock:
+        lock = self._kingdom_locks.get(kingdom)
+        if lock is None:
+            lock = self._kingdom_locks[kingdom] = asyncio.Lock()
+        return lock
+    
+    async def run(self, wars: List[KingdomWar]) -> List[Dict]:
+        """Start all wars, returns one result dict per war in input order"""
+        return await self._run_all(wars, self.war_service.start_enhanced_war, release_on_error=True)
+    
+    async def resume(self, wars: List[KingdomWar]) -> List[Dict]:
+        """Continue interrupted active wars under the same kingdom locks as new ones.
+        
+        A failed resume keeps its players war-locked, the war is still active
+        and is resumed again on the next start.
+        """
+        return await self._run_all(wars, self.war_service.resume_war, release_on_error=False)
+    
+    async def _run_all(self, wars: List[KingdomWar], action: Callable[[int], Awaitable[bool]],
+                       release_on_error: bool) -> List[Dict]:
+        if not wars:
+            return []
+        
+        async with AsyncSessionLocal() as session:
+            attackers = await self.squad_service.get_attacking_kingdoms_by_war(
+                [war.id for war in wars], session
+            )
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        window_start = time.perf_counter()
+        
+        results = await asyncio.gather(*[
+            self._run_war(war, {war.defending_kingdom, *attackers.get(war.id, [])}, semaphore,
+                          action, release_on_error)
+            for war in wars
+        ])
+        
+        elapsed = time.perf_counter() - window_start
+        slowest = max(result['seconds'] for result in results)
+        logger.info(
+            f"Processed {len(wars)} wars in {elapsed:.2f}s "
+            f"(slowest {slowest:.2f}s, concurrency {self.max_concurrency})"
+        )
+        return results
+    
+    async def _run_war(self, war: KingdomWar, kingdoms: set, semaphore: asyncio.Semaphore,
+                       action: Callable[[int], Awaitable[bool]], release_on_error: bool) -> Dict:
+        result = {
+            'war_id': war.id,
+            'defending_kingdom': war.defending_kingdom,
+            'kingdoms': sorted(kingdoms),
+            'started': False,
+            'seconds': 0.0,
+            'waited': 0.0,
+            'error': None
+        }
+        
+        locks = [self._lock_for(kingdom) for kingdom in sorted(kingdoms)]
+        queued_at = time.perf_counter()
+        
+        acquired = []
+        try:
+            for lock in locks:
+                await lock.acquire()
+                acquired.append(lock)
+            
+            async with semaphore:
+                started_at = time.perf_counter()
+                result['waited'] = started_at - queued_at
+                try:
+                    result['started'] = await action(war.id)
+                except Exception as e:
+                    result['error'] = str(e)
+                    logger.error(f"Error processing war {war.id}: {e}")
+                    if release_on_error:
+                        # Don't keep players locked behind a failed war
+                        war_registry.release_war(war.id)
+                result['seconds'] = time.perf_counter() - started_at
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+        
+        logger.info(
+            f"War {war.id} ({war.defending_kingdom}) took {result['seconds']:.2f}s "
+            f"after waiting {result['waited']:.2f}s for {', '.join(result['kingdoms'])}"
+        )
+        return result
@@ -0,0 +1,66 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import session_scope
+from models.kingdom_war import KingdomWar, WarParticipation, WarStatusEnum
+from typing import Dict, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WarRegistry:
+    """In-memory map of war-locked users.
+    
+    A user is locked from joining a war until that war is released
+    (cancelled or finished). Rebuilt from war_participations at startup and
+    kept current by the war service, so lookups need no I/O.
+    """
+    
+    def __init__(self):
+        self._war_by_user: Dict[int, int] = {}
+        self._users_by_war: Dict[int, Set[int]] = {}
+    
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._war_by_user
+    
+    def __len__(self) -> int:
+        return len(self._war_by_user)
+    
+    def is_locked(self, user_id: int) -> bool:
+        return user_id in self._war_by_user
+    
+    def get_war_id(self, user_id: int) -> Optional[int]:
+        return self._war_by_user.get(user_id)
+    
+    def lock(self, user_id: int, war_id: int):
+        """Lock user for war"""
+        self._war_by_user[user_id] = war_id
+        self._users_by_war.setdefault(war_id, set()).add(user_id)
+    
+    def release_war(self, war_id: int) -> int:
+        """Unlock all players of a war, returns how many were released"""
+        user_ids = self._users_by_war.pop(war_id, set())
+        for user_id in user_ids:
+            if self._war_by_user.get(user_id) == war_id:
+                del self._war_by_user[user_id]
+        return len(user_ids)
+    
+    async def rebuild(self, session: Optional[AsyncSession] = None) -> int:
+        """Reload locks from participations in scheduled and unfinished wars"""
+        async with session_scope(session) as session:
+            result = await session.execute(
+                select(WarParticipation.user_id, WarParticipation.war_id).join(
+                    KingdomWar, KingdomWar.id == WarParticipation.war_id
+                ).where(KingdomWar.status.in_([WarStatusEnum.scheduled, WarStatusEnum.active]))
+            )
+            rows = result.all()
+        
+        self._war_by_user.clear()
+        self._users_by_war.clear()
+        for user_id, war_id in rows:
+            self.lock(user_id, war_id)
+        
+        logger.info(f"War registry rebuilt: {len(self._war_by_user)} users locked in {len(self._users_by_war)} wars")
+        return len(self._war_by_user)
+
+# Global war registry instance
+war_registry = WarRegistry()
@@ -0,0 +1,169 @@
+from sqlalchemy import select, and_, func, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.kingdom_war import WarParticipation, WarSquadStats
+from typing import List, Dict, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns of war_squad_stats that accumulate on every join
+SUMMED_COLUMNS = [
+    'player_count', 'auto_defenders',
+    'total_strength', 'total_armor', 'total_hp', 'total_agility', 'total_mana'
+]
+
+def _upsert_squad_stats(stmt):
+    """Add the inserted totals to an existing squad row"""
+    return stmt.on_conflict_do_update(
+        index_elements=['war_id', 'kingdom', 'role'],
+        set_={column: getattr(WarSquadStats, column) + getattr(stmt.excluded, column) for column in SUMMED_COLUMNS}
+    )
+
+class WarSquadService:
+    """Squad membership of a war, read from war_participations"""
+    
+    def __init__(self):
+        pass
+    
+    async def get_attack_squads(self, war_id: int, session: AsyncSession) -> Dict[str, List[int]]:
+        """Attacking kingdom -> list of player ids"""
+        result = await session.execute(
+            select(WarParticipation.kingdom, WarParticipation.user_id).where(
+                and_(
+                    WarParticipation.war_id == war_id,
+                    WarParticipation.role == 'attacker'
+                )
+            ).order_by(WarParticipation.id)
+        )
+        
+        squads = {}
+        for kingdom, user_id in result:
+            squads.setdefault(kingdom, []).append(user_id)
+        return squads
+    
+    async def get_defense_squad(self, war_id: int, session: AsyncSession) -> List[int]:
+        """Player ids defending in the war"""
+        result = await session.scalars(
+            select(WarParticipation.user_id).where(
+                and_(
+                    WarParticipation.war_id == war_id,
+                    WarParticipation.role == 'defender'
+                )
+            ).order_by(WarParticipation.id)
+        )
+        return list(result)
+    
+    async def get_attacking_kingdoms(self, war_id: int, session: AsyncSession) -> List[str]:
+        """Kingdoms with at least one attacker, in order of first join"""
+        result = await session.scalars(
+            select(WarParticipation.kingdom).where(
+                and_(
+                    WarParticipation.war_id == war_id,
+                    WarParticipation.role == 'attacker'
+                )
+            ).group_by(WarParticipation.kingdom).order_by(func.min(WarParticipation.id))
+        )
+        return list(result)
+    
+    async def get_attacking_kingdoms_by_war(self, war_ids: List[int], session: AsyncSession) -> Dict[int, List[str]]:
+        """War id -> kingdoms with at least one attacker"""
+        result = await session.execute(
+            select(WarParticipation.war_id, WarParticipation.kingdom).where(
+                and_(
+                    WarParticipation.war_id.in_(war_ids),
+                    WarParticipation.role == 'attacker'
+                )
+            ).distinct()
+        )
+        
+        kingdoms = {war_id: [] for war_id in war_ids}
+        for war_id, kingdom in result:
+            kingdoms[war_id].append(kingdom)
+        return kingdoms
+    
+    async def count_participants(self, war_id: int, session: AsyncSession) -> Dict[str, int]:
+        """Participant count per role"""
+        result = await session.execute(
+            select(WarParticipation.role, func.count(WarParticipation.id)).where(
+                WarParticipation.war_id == war_id
+            ).group_by(WarParticipation.role)
+        )
+        
+        counts = {'attacker': 0, 'defender': 0}
+        for role, count in result:
+            counts[role.name] = count
+        return counts
+    
+    async def add_member_to_stats(self, war_id: int, kingdom: str, role: str, stats: dict, session: AsyncSession):
+        """Add one joined player's stats to the squad totals"""
+        await session.execute(_upsert_squad_stats(
+            sqlite_insert(WarSquadStats).values(
+                war_id=war_id,
+                kingdom=kingdom,
+                role=role,
+                player_count=1,
+                auto_defenders=0,
+                total_strength=stats.get('strength', 0),
+                total_armor=stats.get('armor', 0),
+                total_hp=stats.get('hp', 0),
+                total_agility=stats.get('agility', 0),
+                total_mana=stats.get('mana', 0)
+            )
+        ))
+    
+    async def add_auto_defenders_to_stats(self, war_id: int, session: AsyncSession):
+        """Add the enrolled auto-defenders of a war to the defense totals"""
+        auto_defenders = select(
+            WarParticipation.war_id,
+            WarParticipation.kingdom,
+            literal('defender'),
+            func.count(WarParticipation.id),
+            func.count(WarParticipation.id),
+            func.sum(WarParticipation.stat_strength),
+            func.sum(WarParticipation.stat_armor),
+            func.sum(WarParticipation.stat_hp),
+            func.sum(WarParticipation.stat_agility),
+            func.sum(WarParticipation.stat_mana)
+        ).where(
+            and_(
+                WarParticipation.war_id == war_id,
+                WarParticipation.is_auto_defender == True
+            )
+        ).group_by(WarParticipation.war_id, WarParticipation.kingdom)
+        
+        await session.execute(_upsert_squad_stats(
+            sqlite_insert(WarSquadStats).from_select(
+                ['war_id', 'kingdom', 'role'] + SUMMED_COLUMNS, auto_defenders
+            )
+        ))
+    
+    async def get_squad_stats(self, war_id: int, session: AsyncSession) -> Tuple[Dict[str, dict], dict]:
+        """Attack totals per kingdom (in order of first join) and defense totals"""
+        result = await session.scalars(
+            select(WarSquadStats).where(WarSquadStats.war_id == war_id).order_by(WarSquadStats.id)
+        )
+        
+        attack_stats = {}
+        defense_stats = None
+        for squad in result:
+            if squad.role == 'attacker':
+                attack_stats[squad.kingdom] = squad.get_stats()
+            else:
+                defense_stats = squad.get_stats()
+                defense_stats['voluntary_defenders'] = squad.player_count - squad.auto_defenders
+                defense_stats['auto_defenders'] = squad.auto_defenders
+        
+        if defense_stats is None:
+            defense_stats = {
+                'total_strength': 0,
+                'total_armor': 0,
+                'total_hp': 0,
+                'total_agility': 0,
+                'total_mana': 0,
+                'player_count': 0,
+                'voluntary_defenders': 0,
+                'auto_defenders': 0
+            }
+        
+        return attack_stats, defense_stats
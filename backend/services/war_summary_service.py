@@ -0,0 +1,208 @@
+from sqlalchemy import select, insert, func, case, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import session_scope
+from models.kingdom_war import KingdomWar, WarParticipation, WarSummary, WarKingdomResult, WarUserResult
+from typing import List, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Result of the defending side by war outcome
+DEFENSE_RESULTS = {
+    'no_attack': 'no_attack',
+    'held': 'defense_held',
+    'broken': 'defense_broken'
+}
+
+class WarSummaryService:
+    """Results of finished wars, written once when the war completes.
+    
+    Channel posts and player result views read these rows instead of
+    re-parsing the war JSON and re-joining participations.
+    """
+    
+    def __init__(self):
+        pass
+    
+    @staticmethod
+    def format_channel_summary(war: KingdomWar, battle_results: List[dict], money_transfers: Dict[str, int]) -> str:
+        """Channel post for one war"""
+        summary = f"🏰 **{war.defending_kingdom.upper()}** - Война завершена\n"
+        
+        if battle_results:
+            for result in battle_results:
+                if result['result'] == 'victory':
+                    money = money_transfers.get(result['attacker'], 0)
+                    summary += f"✅ {result['attacker']} → ПОБЕДА (захвачено {money} золота)\n"
+                elif result['result'] == 'defeat':
+                    summary += f"❌ {result['attacker']} → Поражение\n"
+                elif result['result'] == 'too_late':
+                    summary += f"⏰ {result['attacker']} → Опоздало\n"
+        else:
+            summary += "🕊️ Никто не атаковал\n"
+        
+        return summary
+    
+    async def write_war_summary(self, war: KingdomWar, battle_results: List[dict],
+                                money_transfers: Dict[str, int], session: AsyncSession):
+        """Store outcome, per-kingdom totals and per-player results of a finished war"""
+        if not battle_results:
+            outcome = 'no_attack'
+        elif any(result['result'] == 'victory' for result in battle_results):
+            outcome = 'broken'
+        else:
+            outcome = 'held'
+        defense_result = DEFENSE_RESULTS[outcome]
+        total_money_taken = sum(money_transfers.values())
+        
+        # Participation totals per side, money and exp are already settled
+        result = await session.execute(
+            select(
+                WarParticipation.kingdom,
+                WarParticipation.role,
+                func.count(),
+                func.coalesce(func.sum(WarParticipation.exp_gained), 0)
+            ).where(WarParticipation.war_id == war.id).group_by(
+                WarParticipation.kingdom, WarParticipation.role
+            )
+        )
+        totals = {(kingdom, role.name): (players, exp) for kingdom, role, players, exp in result}
+        
+        attackers_count = sum(players for (_, role), (players, _) in totals.items() if role == 'attacker')
+        defenders_count = sum(players for (_, role), (players, _) in totals.items() if role == 'defender')
+        
+        session.add(WarSummary(
+            war_id=war.id,
+            defending_kingdom=war.defending_kingdom,
+            scheduled_time=war.scheduled_time,
+            started_at=war.started_at,
+            finished_at=war.finished_at,
+            outcome=outcome,
+            defense_buff=war.defense_buff,
+            attackers_count=attackers_count,
+            defenders_count=defenders_count,
+            total_money_taken=total_money_taken,
+            summary_text=self.format_channel_summary(war, battle_results, money_transfers)
+        ))
+        
+        kingdom_rows = []
+        for battle in battle_results:
+            players, exp = totals.get((battle['attacker'], 'attacker'), (0, 0))
+            kingdom_rows.append({
+                'war_id': war.id,
+                'kingdom': battle['attacker'],
+                'role': 'attacker',
+                'result': battle['result'],
+                'player_count': players,
+                'damage_dealt': battle.get('damage_dealt', 0),
+                'money': money_transfers.get(battle['attacker'], 0),
+                'exp_gained': exp
+            })
+        players, exp = totals.get((war.defending_kingdom, 'defender'), (0, 0))
+        kingdom_rows.append({
+            'war_id': war.id,
+            'kingdom': war.defending_kingdom,
+            'role': 'defender',
+            'result': defense_result,
+            'player_count': players,
+            'damage_dealt': 0,
+            'money': total_money_taken,
+            'exp_gained': exp
+        })
+        await session.execute(insert(WarKingdomResult), kingdom_rows)
+        
+        # One row per participant, attackers take their kingdom's battle result
+        attacker_results = {battle['attacker']: battle['result'] for battle in battle_results}
+        if attacker_results:
+            attacker_result = case(attacker_results, value=WarParticipation.kingdom, else_='no_attack')
+        else:
+            attacker_result = literal('no_attack')
+        
+        inserted = await session.execute(
+            insert(WarUserResult).from_select(
+                [
+                    'war_id', 'user_id', 'kingdom', 'role', 'result',
+                    'money_gained', 'money_lost', 'exp_gained',
+                    'stat_strength', 'stat_armor', 'stat_hp', 'stat_agility', 'stat_mana'
+                ],
+                select(
+                    WarParticipation.war_id,
+                    WarParticipation.user_id,
+                    WarParticipation.kingdom,
+                    WarParticipation.role,
+                    case(
+                        (WarParticipation.role == 'defender', literal(defense_result)),
+                        else_=attacker_result
+                    ),
+                    WarParticipation.money_gained,
+                    WarParticipation.money_lost,
+                    WarParticipation.exp_gained,
+                    WarParticipation.stat_strength,
+                    WarParticipation.stat_armor,
+                    WarParticipation.stat_hp,
+                    WarParticipation.stat_agility,
+                    WarParticipation.stat_mana
+                ).where(WarParticipation.war_id == war.id).order_by(WarParticipation.id)
+            )
+        )
+        
+        logger.info(f"War {war.id} summary stored: {outcome}, {inserted.rowcount} player results")
+    
+    async def get_channel_summary(self, war_ids: List[int], session: Optional[AsyncSession] = None) -> str:
+        """Stored channel posts of the given wars"""
+        async with session_scope(session) as session:
+            result = await session.scalars(
+                select(WarSummary.summary_text).where(
+                    WarSummary.war_id.in_(war_ids)
+                ).order_by(WarSummary.war_id)
+            )
+            return "\n".join(text for text in result if text)
+    
+    async def get_user_result(self, user_id: int, war_id: int = None,
+                              session: Optional[AsyncSession] = None) -> Optional[Tuple[WarUserResult, WarSummary]]:
+        """Player result with its war summary, the latest war if war_id is not given"""
+        async with session_scope(session) as session:
+            query = select(WarUserResult, WarSummary).join(
+                WarSummary, WarSummary.war_id == WarUserResult.war_id
+            ).where(WarUserResult.user_id == user_id)
+            
+            if war_id is not None:
+                query = query.where(WarUserResult.war_id == war_id)
+            
+            result = await session.execute(query.order_by(WarUserResult.war_id.desc()).limit(1))
+            row = result.first()
+            return tuple(row) if row else None
+    
+    async def get_user_results(self, user_id: int, limit: int = 5,
+                               session: Optional[AsyncSession] = None) -> List[Tuple[WarUserResult, WarSummary]]:
+        """Latest war results of a player"""
+        async with session_scope(session) as session:
+            result = await session.execute(
+                select(WarUserResult, WarSummary).join(
+                    WarSummary, WarSummary.war_id == WarUserResult.war_id
+                ).where(
+                    WarUserResult.user_id == user_id
+                ).order_by(WarUserResult.war_id.desc()).limit(limit)
+            )
+            return [tuple(row) for row in result]
+    
+    async def get_recent_summaries(self, limit: int = 6,
+                                   session: Optional[AsyncSession] = None) -> List[WarSummary]:
+        """Summaries of the latest wars that were fought"""
+        async with session_scope(session) as session:
+            result = await session.scalars(
+                select(WarSummary).where(
+                    WarSummary.outcome != 'no_attack'
+                ).order_by(WarSummary.war_id.desc()).limit(limit)
+            )
+            return list(result)
+    
+    async def get_kingdom_results(self, war_id: int, session: Optional[AsyncSession] = None) -> List[WarKingdomResult]:
+        """Per-kingdom totals of a war"""
+        async with session_scope(session) as session:
+            result = await session.scalars(
+                select(WarKingdomResult).where(
+                    WarKingdomResult.war_id == war_id
+                ).order_by(WarKingdomResult.id)
+            )
+            return list(result)
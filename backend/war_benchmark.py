@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Offline kingdom war benchmark.
+
+Generates a synthetic population into a temporary database, then runs the real
+EnhancedKingdomWarService.start_enhanced_war pipeline against it and reports
+wall time and query count per phase plus peak RSS.
+
+    python war_benchmark.py --users-per-kingdom 250000 --attackers 0.2 --defenders 0.1
+
+The database given by --db (a temporary file by default) is recreated, the
+configured game database is never touched.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Phases of the war pipeline, timed inclusively
+PHASES = [
+    '_add_online_defenders',
+    '_calculate_enhanced_kingdom_stats',
+    '_process_enhanced_war_battles',
+    '_settle_next_money_transfer',
+    '_calculate_enhanced_money_transfer',
+    '_apply_enhanced_war_rewards',
+    '_finish_enhanced_war',
+]
+
+BATCH_SIZE = 10000
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kingdom war load benchmark")
+    parser.add_argument('--users-per-kingdom', type=int, default=10000)
+    parser.add_argument('--attackers', type=float, default=0.1,
+                        help="share of each attacking kingdom joining the attack")
+    parser.add_argument('--defenders', type=float, default=0.1,
+                        help="share of the defending kingdom joining the defense")
+    parser.add_argument('--online', type=float, default=0.3,
+                        help="share of the defending kingdom active in the last 30 minutes")
+    parser.add_argument('--attack-power', type=float, default=25.0,
+                        help="strength/agility multiplier for attackers, the default breaks the defense "
+                             "so settlement and rewards are exercised")
+    parser.add_argument('--defending-kingdom', default='north')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', help="database file (default: temporary file)")
+    parser.add_argument('--keep', action='store_true', help="keep the database file")
+    return parser.parse_args()
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+class PhaseStats:
+    """Inclusive wall time and query count per pipeline phase"""
+    
+    def __init__(self):
+        self.active = []
+        self.seconds = {}
+        self.queries = {}
+        self.calls = {}
+        self.total_queries = 0
+    
+    def on_query(self, *args):
+        self.total_queries += 1
+        for phase in self.active:
+            self.queries[phase] = self.queries.get(phase, 0) + 1
+    
+    def wrap(self, name, method):
+        async def timed(*args, **kwargs):
+            self.active.append(name)
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.active.remove(name)
+        return timed
+
+async def populate(args, engine):
+    """Insert users, one scheduled war and its squads, returns the war id"""
+    from sqlalchemy import insert, text
+    from models.user import User, KingdomEnum, GenderEnum
+    from models.kingdom_war import KingdomWar, WarParticipation, WarStatusEnum
+    
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    kingdoms = [kingdom.value for kingdom in KingdomEnum]
+    
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            insert(KingdomWar.__table__).values(
+                scheduled_time=now,
+                defending_kingdom=args.defending_kingdom,
+                status=WarStatusEnum.scheduled
+            )
+        )
+        war_id = result.inserted_primary_key[0]
+    
+    user_id = 0
+    for kingdom in kingdoms:
+        defending = kingdom == args.defending_kingdom
+        for batch_start in range(0, args.users_per_kingdom, BATCH_SIZE):
+            users = []
+            participations = []
+            for _ in range(min(BATCH_SIZE, args.users_per_kingdom - batch_start)):
+                user_id += 1
+                stats = {
+                    'strength': rng.randint(10, 60),
+                    'armor': rng.randint(10, 60),
+                    'hp': rng.randint(100, 400),
+                    'agility': rng.randint(10, 60),
+                    'mana': rng.randint(50, 150),
+                    'level': rng.randint(1, 30)
+                }
+                if not defending:
+                    stats['strength'] = int(stats['strength'] * args.attack_power)
+                    stats['agility'] = int(stats['agility'] * args.attack_power)
+                online = defending and rng.random() < args.online
+                users.append({
+                    'id': user_id,
+                    'name': f"bench{user_id}",
+                    'gender': GenderEnum.male,
+                    'kingdom': KingdomEnum(kingdom),
+                    'level': stats['level'],
+                    'money': rng.randint(0, 5000),
+                    'strength': stats['strength'],
+                    'armor': stats['armor'],
+                    'hp': stats['hp'],
+                    'current_hp': stats['hp'],
+                    'agility': stats['agility'],
+                    'mana': stats['mana'],
+                    'current_mana': stats['mana'],
+                    'last_active': now - (timedelta(minutes=5) if online else timedelta(days=1))
+                })
+                
+                share = args.defenders if defending else args.attackers
+                if rng.random() < share:
+                    participations.append({
+                        'war_id': war_id,
+                        'user_id': user_id,
+                        'kingdom': kingdom,
+                        'role': 'defender' if defending else 'attacker',
+                        'stat_strength': stats['strength'],
+                        'stat_armor': stats['armor'],
+                        'stat_hp': stats['hp'],
+                        'stat_agility': stats['agility'],
+                        'stat_mana': stats['mana'],
+                        'stat_level': stats['level']
+                    })
+            
+            async with engine.begin() as conn:
+                await conn.execute(insert(User.__table__), users)
+                if participations:
+                    await conn.execute(insert(WarParticipation.__table__), participations)
+    
+    # Squad totals as the join methods would have left them
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "INSERT INTO war_squad_stats "
+            "(war_id, kingdom, role, player_count, auto_defenders, "
+            "total_strength, total_armor, total_hp, total_agility, total_mana) "
+            "SELECT war_id, kingdom, role, COUNT(*), 0, "
+            "SUM(stat_strength), SUM(stat_armor), SUM(stat_hp), SUM(stat_agility), SUM(stat_mana) "
+            "FROM war_participations WHERE war_id = :war_id GROUP BY kingdom, role ORDER BY MIN(id)"
+        ), {'war_id': war_id})
+        await conn.execute(text("ANALYZE"))
+    
+    return war_id
+
+async def run(args):
+    from sqlalchemy import event, select, func
+    from config.database import engine, init_db
+    from models.kingdom_war import WarParticipation
+    from services.enhanced_kingdom_war_service import EnhancedKingdomWarService
+    
+    await init_db()
+    
+    started = time.perf_counter()
+    war_id = await populate(args, engine)
+    populate_seconds = time.perf_counter() - started
+    
+    async with engine.connect() as conn:
+        participants = (await conn.execute(
+            select(WarParticipation.role, func.count()).where(
+                WarParticipation.war_id == war_id
+            ).group_by(WarParticipation.role)
+        )).all()
+    
+    war_service = EnhancedKingdomWarService()
+    stats = PhaseStats()
+    for name in PHASES:
+        setattr(war_service, name, stats.wrap(name, getattr(war_service, name)))
+    event.listen(engine.sync_engine, "before_cursor_execute", stats.on_query)
+    
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    war_started = await war_service.start_enhanced_war(war_id)
+    war_seconds = time.perf_counter() - started
+    
+    event.remove(engine.sync_engine, "before_cursor_execute", stats.on_query)
+    await engine.dispose()
+    
+    total_users = args.users_per_kingdom * 4
+    print(f"\n⚔️ Kingdom war benchmark: {total_users} users, defending {args.defending_kingdom}")
+    print(f"📦 Population: {populate_seconds:.2f}s, participants: "
+          f"{', '.join(f'{role.name} {count}' for role, count in participants)}")
+    print(f"🏁 start_enhanced_war: {war_seconds:.3f}s, {stats.total_queries} queries"
+          f"{'' if war_started else ' (war was not started)'}\n")
+    
+    print(f"{'phase':<36}{'calls':>6}{'seconds':>10}{'queries':>10}")
+    for name in PHASES:
+        if name in stats.calls:
+            print(f"{name:<36}{stats.calls[name]:>6}{stats.seconds[name]:>10.3f}{stats.queries.get(name, 0):>10}")
+    
+    print(f"\n💾 Peak RSS: {rss_before:.1f} MB after population, {peak_rss_mb():.1f} MB after war")
+
+def main():
+    args = parse_args()
+    
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="war_benchmark_"), "war_benchmark.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    
+    # Settings read DB_PATH on import, set it before loading the app modules
+    os.environ['DB_PATH'] = db_path
+    sys.path.insert(0, str(Path(__file__).parent))
+    
+    try:
+        asyncio.run(run(args))
+    finally:
+        if args.keep:
+            print(f"📁 Database kept at {db_path}")
+        else:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+if __name__ == "__main__":
+    main()
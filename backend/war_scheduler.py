@@ -7,6 +7,8 @@ from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from services.enhanced_kingdom_war_service import EnhancedKingdomWarService
+from services.war_executor import WarExecutor
+from services.war_calendar import war_calendar, WarSlot
 import logging
 import pytz
 
@@ -16,6 +18,7 @@ class EnhancedKingdomWarScheduler:
     def __init__(self, bot=None):
         self.scheduler = AsyncIOScheduler()
         self.war_service = EnhancedKingdomWarService()
+        self.war_executor = WarExecutor(self.war_service)
         self.tashkent_tz = pytz.timezone('Asia/Tashkent')
         self.bot = bot  # For sending notifications
     
@@ -86,15 +89,8 @@ class EnhancedKingdomWarScheduler:
                 return
             
             # Get wars for this hour
-            from datetime import datetime
             now = datetime.now(self.tashkent_tz)
-            wars_today = await self.war_service.get_scheduled_wars(now)
-            
-            war_announcements = []
-            for war in wars_today:
-                war_time_tashkent = war.scheduled_time.astimezone(self.tashkent_tz)
-                if war_time_tashkent.hour == war_hour:
-                    war_announcements.append(war)
+            war_announcements = await war_calendar.get_slot_wars(WarSlot(now.date(), war_hour))
             
             if not war_announcements:
                 return
@@ -140,20 +136,15 @@ class EnhancedKingdomWarScheduler:
         try:
             # Получить все запланированные войны на этот час
             now = datetime.now(self.tashkent_tz)
-            wars = await self.war_service.get_scheduled_wars(now)
+            hour_wars = await war_calendar.get_slot_wars(WarSlot(now.date(), hour))
             
-            wars_started = 0
+            # Независимые войны идут параллельно
             war_results = []
-            
-            for war in wars:
-                # Проверить, что время войны соответствует текущему часу
-                war_time_tashkent = war.scheduled_time.astimezone(self.tashkent_tz)
-                if war_time_tashkent.hour == hour:
-                    success = await self.war_service.start_enhanced_war(war.id)
-                    if success:
-                        wars_started += 1
-                        war_results.append(war.id)
-                        logger.info(f"Started enhanced war {war.id} for kingdom {war.defending_kingdom}")
+            for result in await self.war_executor.run(hour_wars):
+                if result['started']:
+                    war_results.append(result['war_id'])
+                    logger.info(f"Started enhanced war {result['war_id']} for kingdom {result['defending_kingdom']}")
+            wars_started = len(war_results)
             
             # Send war results to channel
             if war_results and self.bot:
@@ -169,6 +160,20 @@ class EnhancedKingdomWarScheduler:
         except Exception as e:
             logger.error(f"Error processing enhanced wars at {hour}:00: {e}")
     
+    async def resume_interrupted_wars(self):
+        """Finish wars interrupted by the last shutdown from their checkpoint"""
+        try:
+            wars = await self.war_service.get_unfinished_wars()
+            if not wars:
+                return
+            
+            results = await self.war_executor.resume(wars)
+            resumed = sum(1 for result in results if result['started'])
+            logger.info(f"Resumed {resumed} of {len(wars)} interrupted wars")
+        
+        except Exception as e:
+            logger.error(f"Error resuming interrupted wars: {e}")
+    
     async def schedule_today_wars(self):
         """Планирование войн на сегодня (при запуске бота)"""
         try:
@@ -190,67 +195,26 @@ class EnhancedKingdomWarScheduler:
     async def restore_participants(self, war_hour: int):
         """Восстановить HP/MP участников через 5 минут после войны"""
         try:
-            from datetime import datetime, timedelta
-            
-            # Найти завершённые войны этого часа и восстановить участников
-            end_time = datetime.now(self.tashkent_tz).replace(hour=war_hour, minute=5, second=0)
-            
-            # Get recently finished wars
-            from config.database import AsyncSessionLocal
-            from models.kingdom_war import KingdomWar, WarParticipation, WarStatusEnum
-            from models.user import User
-            from sqlalchemy import select, and_
+            # Все завершённые и ещё не восстановленные войны, одним UPDATE
+            wars_restored, total_restored = await self.war_service.restore_finished_war_participants()
             
-            async with AsyncSessionLocal() as session:
-                # Find wars that finished around this time
-                search_time_start = end_time - timedelta(minutes=10)
-                search_time_end = end_time + timedelta(minutes=10)
+            if total_restored > 0:
+                logger.info(f"Restored HP/MP for {total_restored} war participants of {wars_restored} wars")
                 
-                finished_wars = await session.execute(
-                    select(KingdomWar).where(
-                        and_(
-                            KingdomWar.status == WarStatusEnum.finished,
-                            KingdomWar.finished_at >= search_time_start,
-                            KingdomWar.finished_at <= search_time_end
-                        )
+                # Send notification to war channel if configured
+                if self.bot and self.war_service.war_channel_id:
+                    end_time = datetime.now(self.tashkent_tz)
+                    restoration_message = (
+                        f"🩹 **ВОССТАНОВЛЕНИЕ УЧАСТНИКОВ**\n\n"
+                        f"⚡ Восстановлено здоровье и мана у {total_restored} участников войн\n"
+                        f"🕐 Время: {end_time.strftime('%H:%M')} (Ташкентское время)\n\n"
+                        f"Все участники готовы к новым сражениям!"
                     )
-                )
-                
-                wars_list = finished_wars.scalars().all()
-                total_restored = 0
-                
-                for war in wars_list:
-                    # Get all participants
-                    participants = await session.execute(
-                        select(WarParticipation).where(WarParticipation.war_id == war.id)
-                    )
-                    
-                    for participation in participants.scalars():
-                        # Restore HP and MP to full
-                        user = await session.get(User, participation.user_id)
-                        if user:
-                            user.current_hp = user.hp
-                            user.current_mana = user.mana
-                            total_restored += 1
-                
-                await session.commit()
-                
-                if total_restored > 0:
-                    logger.info(f"Restored HP/MP for {total_restored} war participants")
-                    
-                    # Send notification to war channel if configured
-                    if self.bot and self.war_service.war_channel_id:
-                        restoration_message = (
-                            f"🩹 **ВОССТАНОВЛЕНИЕ УЧАСТНИКОВ**\n\n"
-                            f"⚡ Восстановлено здоровье и мана у {total_restored} участников войн\n"
-                            f"🕐 Время: {end_time.strftime('%H:%M')} (Ташкентское время)\n\n"
-                            f"Все участники готовы к новым сражениям!"
-                        )
-                        try:
-                            await self.bot.send_message(self.war_service.war_channel_id, restoration_message)
-                        except Exception as e:
-                            logger.error(f"Error sending restoration notification: {e}")
-            
+                    try:
+                        await self.bot.send_message(self.war_service.war_channel_id, restoration_message)
+                    except Exception as e:
+                        logger.error(f"Error sending restoration notification: {e}")
+        
         except Exception as e:
             logger.error(f"Error restoring participants for {war_hour}:00 wars: {e}")
     
@@ -138,14 +138,15 @@ class KingdomWarsTester:
             # Check Kingdom Wars table structure
             self.check_table_structure(cursor, 'kingdom_wars', [
                 'id', 'war_type', 'status', 'scheduled_time', 'started_at', 'finished_at',
-                'attacking_kingdoms', 'defending_kingdom', 'attack_squads', 'defense_squad',
+                'defending_kingdom',
                 'total_attack_stats', 'defense_stats', 'defense_buff', 'battle_results',
                 'money_transferred', 'exp_distributed', 'created_at'
             ])
             
             # Check War Participations table structure
             self.check_table_structure(cursor, 'war_participations', [
-                'id', 'war_id', 'user_id', 'kingdom', 'role', 'player_stats',
+                'id', 'war_id', 'user_id', 'kingdom', 'role',
+                'stat_strength', 'stat_armor', 'stat_hp', 'stat_agility', 'stat_mana', 'stat_level',
                 'money_gained', 'money_lost', 'exp_gained', 'joined_at'
             ])
             
@@ -1,152 +1,95 @@
 #!/usr/bin/env python3
-import sqlite3
-import json
-from datetime import datetime, timedelta
-import pytz
 import asyncio
+import os
 import sys
+from pathlib import Path
 
-# Connect to the database
-conn = sqlite3.connect('/app/backend/rpg_game.db')
-cursor = conn.cursor()
+# Use the bot's own services, squads live in war_participations
+BACKEND_DIR = Path(__file__).parent / 'backend'
+os.environ.setdefault('DB_PATH', str(BACKEND_DIR / 'rpg_game.db'))
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import select
+from config.database import AsyncSessionLocal, engine
+from models.user import User
+from models.kingdom_war import KingdomWar, WarStatusEnum
+from services.enhanced_kingdom_war_service import EnhancedKingdomWarService
+from services.war_squad_service import WarSquadService
 
 async def simulate_war_registration():
     """Simulate a user registering for a war"""
     print("Simulating war registration...")
     
     # Get a test user
-    cursor.execute("SELECT id, name, kingdom FROM users LIMIT 1")
-    test_user = cursor.fetchone()
+    async with AsyncSessionLocal() as session:
+        test_user = (await session.execute(select(User).limit(1))).scalar_one_or_none()
     if not test_user:
         print("No users found in database")
-        return False
-    
-    test_user_id = test_user[0]
-    test_user_name = test_user[1]
-    test_user_kingdom = test_user[2]
+        return None
     
-    print(f"Using test user: {test_user_name} (ID: {test_user_id}, Kingdom: {test_user_kingdom})")
+    test_user_kingdom = test_user.kingdom.value
+    print(f"Using test user: {test_user.name} (ID: {test_user.id}, Kingdom: {test_user_kingdom})")
     
     # Get a target kingdom different from user's kingdom
     kingdoms = ['north', 'south', 'east', 'west']
     target_kingdoms = [k for k in kingdoms if k != test_user_kingdom]
     if not target_kingdoms:
         print("Could not find a target kingdom for attack")
-        return False
+        return None
     
     target_kingdom = target_kingdoms[0]
     print(f"Target kingdom for attack: {target_kingdom}")
     
     # Find a scheduled war for the target kingdom
-    cursor.execute(
-        "SELECT id, scheduled_time FROM kingdom_wars WHERE defending_kingdom = ? AND status = 'scheduled' LIMIT 1",
-        (target_kingdom,)
-    )
-    war = cursor.fetchone()
+    async with AsyncSessionLocal() as session:
+        war = (await session.execute(
+            select(KingdomWar).where(
+                KingdomWar.defending_kingdom == target_kingdom,
+                KingdomWar.status == WarStatusEnum.scheduled
+            ).limit(1)
+        )).scalar_one_or_none()
     if not war:
         print(f"No scheduled wars found for kingdom {target_kingdom}")
-        return False
-    
-    war_id = war[0]
-    war_time = war[1]
+        return None
     
-    print(f"Selected war ID: {war_id}, scheduled at: {war_time}")
+    print(f"Selected war ID: {war.id}, scheduled at: {war.scheduled_time}")
     
-    # Simulate joining attack squad
+    # Join the attack squad the way the bot does
     try:
-        # Create attack squad entry
-        cursor.execute(
-            "SELECT attack_squads FROM kingdom_wars WHERE id = ?",
-            (war_id,)
+        success, message = await EnhancedKingdomWarService().join_attack_squad(
+            test_user.id, target_kingdom, war.scheduled_time
         )
-        attack_squads_json = cursor.fetchone()[0]
-        attack_squads = json.loads(attack_squads_json) if attack_squads_json else {}
-        
-        if test_user_kingdom not in attack_squads:
-            attack_squads[test_user_kingdom] = []
-        
-        if test_user_id not in attack_squads[test_user_kingdom]:
-            attack_squads[test_user_kingdom].append(test_user_id)
-        
-        # Update attack squads
-        cursor.execute(
-            "UPDATE kingdom_wars SET attack_squads = ? WHERE id = ?",
-            (json.dumps(attack_squads), war_id)
-        )
-        
-        # Update attacking kingdoms
-        cursor.execute(
-            "SELECT attacking_kingdoms FROM kingdom_wars WHERE id = ?",
-            (war_id,)
-        )
-        attacking_kingdoms_json = cursor.fetchone()[0]
-        attacking_kingdoms = json.loads(attacking_kingdoms_json) if attacking_kingdoms_json else []
-        
-        if test_user_kingdom not in attacking_kingdoms:
-            attacking_kingdoms.append(test_user_kingdom)
-        
-        cursor.execute(
-            "UPDATE kingdom_wars SET attacking_kingdoms = ? WHERE id = ?",
-            (json.dumps(attacking_kingdoms), war_id)
-        )
-        
-        # Create participation record
-        cursor.execute(
-            "SELECT * FROM users WHERE id = ?",
-            (test_user_id,)
-        )
-        user = cursor.fetchone()
-        
-        # Get user stats (assuming column order from the schema)
-        player_stats = {
-            'strength': user[11],
-            'armor': user[12],
-            'hp': user[13],
-            'agility': user[15],
-            'mana': user[16],
-            'level': user[7]
-        }
-        
-        # Insert participation record
-        cursor.execute(
-            """
-            INSERT INTO war_participations 
-            (war_id, user_id, kingdom, role, player_stats) 
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (war_id, test_user_id, test_user_kingdom, 'attacker', json.dumps(player_stats))
-        )
-        
-        conn.commit()
-        print(f"✅ Successfully registered user {test_user_name} for attack on {target_kingdom}")
-        return True
-    
     except Exception as e:
         print(f"❌ Error simulating war registration: {e}")
-        conn.rollback()
-        return False
+        return None
+    
+    if not success:
+        print(f"❌ Registration refused: {message}")
+        return None
+    
+    print(f"✅ Successfully registered user {test_user.name} for attack on {target_kingdom}")
+    return war.id
 
 async def main():
-    success = await simulate_war_registration()
+    war_id = await simulate_war_registration()
     
     # Check if registration was successful
-    if success:
+    if war_id is not None:
         print("\nVerifying war participation...")
-        cursor.execute("SELECT COUNT(*) FROM war_participations")
-        participation_count = cursor.fetchone()[0]
-        print(f"Total participations after registration: {participation_count}")
+        squad_service = WarSquadService()
+        async with AsyncSessionLocal() as session:
+            attack_squads = await squad_service.get_attack_squads(war_id, session)
+            defense_squad = await squad_service.get_defense_squad(war_id, session)
+            counts = await squad_service.count_participants(war_id, session)
         
-        if participation_count > 0:
-            cursor.execute(
-                "SELECT war_id, user_id, kingdom, role FROM war_participations LIMIT 1"
-            )
-            participation = cursor.fetchone()
-            print(f"Participation: War ID {participation[0]}, User ID {participation[1]}, Kingdom {participation[2]}, Role {participation[3]}")
+        print(f"Participants of war {war_id}: {counts}")
+        for kingdom, player_ids in attack_squads.items():
+            print(f"Attack squad {kingdom}: {player_ids}")
+        print(f"Defense squad: {defense_squad}")
     
-    # Close connection
-    conn.close()
+    await engine.dispose()
     
-    return 0 if success else 1
+    return 0 if war_id is not None else 1
 
 if __name__ == "__main__":
     sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -6,19 +6,29 @@ import pytz
 import asyncio
 import sys
 import random
+import os
+from pathlib import Path
+
+# Squads live in war_participations, read them through the bot's WarSquadService
+BACKEND_DIR = Path(__file__).parent / 'backend'
+os.environ.setdefault('DB_PATH', str(BACKEND_DIR / 'rpg_game.db'))
+sys.path.insert(0, str(BACKEND_DIR))
+
+from config.database import AsyncSessionLocal, engine
+from services.war_squad_service import WarSquadService
 
 async def simulate_war_start():
     """Simulate starting a war"""
     print("Simulating war start...")
     
     # Connect to the database
-    conn = sqlite3.connect('/app/backend/rpg_game.db')
+    conn = sqlite3.connect(os.environ['DB_PATH'])
     cursor = conn.cursor()
     
     # Get a scheduled war with participants
     cursor.execute(
         """
-        SELECT kw.id, kw.defending_kingdom, kw.scheduled_time, kw.attacking_kingdoms
+        SELECT kw.id, kw.defending_kingdom, kw.scheduled_time
         FROM kingdom_wars kw
         JOIN war_participations wp ON kw.id = wp.war_id
         WHERE kw.status = 'scheduled'
@@ -35,30 +45,17 @@ async def simulate_war_start():
     war_id = war[0]
     defending_kingdom = war[1]
     scheduled_time = war[2]
-    attacking_kingdoms_json = war[3]
     
     print(f"Found war ID: {war_id}, defending kingdom: {defending_kingdom}, scheduled at: {scheduled_time}")
     
-    # Parse attacking kingdoms
-    attacking_kingdoms = json.loads(attacking_kingdoms_json) if attacking_kingdoms_json else []
+    # Get attacking kingdoms and squads
+    squad_service = WarSquadService()
+    async with AsyncSessionLocal() as session:
+        attacking_kingdoms = await squad_service.get_attacking_kingdoms(war_id, session)
+        attack_squads = await squad_service.get_attack_squads(war_id, session)
+        defense_squad = await squad_service.get_defense_squad(war_id, session)
     print(f"Attacking kingdoms: {attacking_kingdoms}")
     
-    # Get attack squads
-    cursor.execute(
-        "SELECT attack_squads FROM kingdom_wars WHERE id = ?",
-        (war_id,)
-    )
-    attack_squads_json = cursor.fetchone()[0]
-    attack_squads = json.loads(attack_squads_json) if attack_squads_json else {}
-    
-    # Get defense squad
-    cursor.execute(
-        "SELECT defense_squad FROM kingdom_wars WHERE id = ?",
-        (war_id,)
-    )
-    defense_squad_json = cursor.fetchone()[0]
-    defense_squad = json.loads(defense_squad_json) if defense_squad_json else []
-    
     print(f"Attack squads: {attack_squads}")
     print(f"Defense squad: {defense_squad}")
     
@@ -180,7 +177,7 @@ async def main():
     
     # Check war status after simulation
     if success:
-        conn = sqlite3.connect('/app/backend/rpg_game.db')
+        conn = sqlite3.connect(os.environ['DB_PATH'])
         cursor = conn.cursor()
         
         print("\nVerifying war status...")
@@ -228,6 +225,7 @@ async def main():
         
         conn.close()
     
+    await engine.dispose()
     return 0 if success else 1
 
 if __name__ == "__main__":
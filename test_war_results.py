@@ -4,13 +4,23 @@ import json
 from datetime import datetime
 import asyncio
 import sys
+import os
+from pathlib import Path
+
+# Squads live in war_participations, read them through the bot's WarSquadService
+BACKEND_DIR = Path(__file__).parent / 'backend'
+os.environ.setdefault('DB_PATH', str(BACKEND_DIR / 'rpg_game.db'))
+sys.path.insert(0, str(BACKEND_DIR))
+
+from config.database import AsyncSessionLocal, engine
+from services.war_squad_service import WarSquadService
 
 async def test_war_results():
     """Test war results functionality"""
     print("Testing war results functionality...")
     
     # Connect to the database
-    conn = sqlite3.connect('/app/backend/rpg_game.db')
+    conn = sqlite3.connect(os.environ['DB_PATH'])
     cursor = conn.cursor()
     
     # Check if there are finished wars
@@ -26,7 +36,7 @@ async def test_war_results():
     # Get details of a finished war
     cursor.execute(
         """
-        SELECT id, defending_kingdom, attacking_kingdoms, battle_results, money_transferred
+        SELECT id, defending_kingdom, battle_results, money_transferred
         FROM kingdom_wars 
         WHERE status = 'finished'
         LIMIT 1
@@ -36,11 +46,11 @@ async def test_war_results():
     
     war_id = war[0]
     defending_kingdom = war[1]
-    attacking_kingdoms_json = war[2]
-    battle_results_json = war[3]
-    money_transferred_json = war[4]
+    battle_results_json = war[2]
+    money_transferred_json = war[3]
     
-    attacking_kingdoms = json.loads(attacking_kingdoms_json) if attacking_kingdoms_json else []
+    async with AsyncSessionLocal() as session:
+        attacking_kingdoms = await WarSquadService().get_attacking_kingdoms(war_id, session)
     battle_results = json.loads(battle_results_json) if battle_results_json else []
     money_transferred = json.loads(money_transferred_json) if money_transferred_json else {}
     
@@ -98,6 +108,7 @@ async def test_war_results():
 
 async def main():
     success = await test_war_results()
+    await engine.dispose()
     return 0 if success else 1
 
 if __name__ == "__main__":